@@ -0,0 +1,122 @@
+"""
+Measure the time API calls spend in Python, building and compiling queries
+and converting results, next to the time spent in the database.
+
+Each filter is called repeatedly with values of different rows, like a
+service issuing the same query shape. Run it on two revisions of snowexsql
+to compare the overhead:
+
+    python benchmarks/api_overhead.py --calls 200
+
+--new-engine creates a new engine for every call, which discards the
+compiled statement cache like snowexsql did before engines were shared.
+The database connection is set up like for the API, with the
+SNOWEX_DB_CREDENTIALS or SNOWEX_DB_CONNECTION environment variables.
+"""
+import argparse
+import statistics
+from itertools import cycle
+
+from snowexsql import db, profile
+from snowexsql.api import LayerMeasurements, PointMeasurements
+from snowexsql.tables import LayerData, MeasurementType, PointData, Site
+
+
+def point_calls(session, count):
+    """
+    Filters for points of different types and dates
+    """
+    rows = (
+        session.query(MeasurementType.name, PointData.datetime)
+        .join(PointData.measurement_type)
+        .distinct()
+        .limit(count)
+        .all()
+    )
+    return [
+        {'type': name, 'date': datetime.date(), 'limit': 100}
+        for name, datetime in rows
+    ]
+
+
+def layer_calls(session, count):
+    """
+    Filters for layers of different sites and types
+    """
+    rows = (
+        session.query(Site.name, MeasurementType.name)
+        .select_from(LayerData)
+        .join(LayerData.site)
+        .join(LayerData.measurement_type)
+        .distinct()
+        .limit(count)
+        .all()
+    )
+    return [
+        {'site': site, 'type': name, 'limit': 100} for site, name in rows
+    ]
+
+
+DATASETS = {
+    'points': (PointMeasurements, point_calls),
+    'layers': (LayerMeasurements, layer_calls),
+}
+
+
+def measure(dataset, filters, calls, new_engine):
+    """
+    Python and database milliseconds per call
+    """
+    python = []
+    database = []
+    for _, kwargs in zip(range(calls), cycle(filters)):
+        if new_engine:
+            for engine in db._ENGINES.values():
+                engine.dispose()
+            db._ENGINES.clear()
+
+        with profile() as p:
+            dataset.from_filter(**kwargs)
+        total = p.calls[0].seconds
+        python.append((total - p.seconds) * 1000)
+        database.append(p.seconds * 1000)
+
+    return python, database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--calls', type=int, default=100, help='Calls per dataset'
+    )
+    parser.add_argument(
+        '--new-engine', action='store_true',
+        help='Create a new engine for every call'
+    )
+    args = parser.parse_args()
+
+    with db.db_session_with_credentials() as (_engine, session):
+        filters = {
+            name: sample(session, args.calls)
+            for name, (_dataset, sample) in DATASETS.items()
+        }
+
+    for name, (dataset, _sample) in DATASETS.items():
+        if not filters[name]:
+            print(f'{name}: no data')
+            continue
+        # Warm up the caches of the process
+        dataset.from_filter(**filters[name][0])
+
+        python, database = measure(
+            dataset, filters[name], args.calls, args.new_engine
+        )
+        print(
+            f'{name}: python {statistics.median(python):.2f} ms '
+            f'(p90 {statistics.quantiles(python, n=10)[-1]:.2f} ms), '
+            f'database {statistics.median(database):.2f} ms per call'
+        )
+
+
+if __name__ == '__main__':
+    main()
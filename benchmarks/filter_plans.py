@@ -0,0 +1,203 @@
+"""
+Record the query plan and timing of the API filters on a loaded database.
+
+Every combination of the filters in ALLOWED_QRY_KWARGS, up to a number of
+filters, is run with EXPLAIN (ANALYZE, BUFFERS) using values of one row of
+the table. Run it before and after a schema change and compare the results:
+
+    python benchmarks/filter_plans.py run before.json
+    python benchmarks/filter_plans.py run after.json
+    python benchmarks/filter_plans.py compare before.json after.json
+
+The database connection is set up like for the API, with the
+SNOWEX_DB_CREDENTIALS or SNOWEX_DB_CONNECTION environment variables.
+"""
+import argparse
+import json
+from itertools import combinations
+
+from sqlalchemy import text
+
+from snowexsql.api import LayerMeasurements, PointMeasurements
+from snowexsql.db import db_session_with_credentials
+from snowexsql.tables import LayerData, PointData
+
+# Filters without a value from a sample row
+SKIPPED_FILTERS = ['utm_zone']
+
+
+def point_filters(session):
+    """
+    Filter values of the first point
+    """
+    point = session.query(PointData).first()
+    observation = point.observation
+    return {
+        'campaign': observation.campaign.name,
+        'date': point.datetime.date(),
+        'instrument': observation.instrument.name,
+        'type': point.measurement_type.name,
+        'date_greater_equal': point.datetime.date(),
+        'date_less_equal': point.datetime.date(),
+        'value_greater_equal': point.value,
+        'value_less_equal': point.value,
+        'doi': observation.doi.doi,
+        'observer': observation.observer.name,
+    }
+
+
+def layer_filters(session):
+    """
+    Filter values of the first layer
+    """
+    layer = session.query(LayerData).first()
+    site = layer.site
+    filters = {
+        'campaign': site.campaign.name,
+        'site': site.name,
+        'date': site.datetime.date(),
+        'instrument': layer.instrument.name,
+        'observer': [observer.name for observer in site.observers],
+        'type': layer.measurement_type.name,
+        'date_greater_equal': site.datetime.date(),
+        'date_less_equal': site.datetime.date(),
+        'doi': site.doi.doi,
+    }
+    try:
+        filters['value_greater_equal'] = float(layer.value)
+        filters['value_less_equal'] = float(layer.value)
+    except ValueError:
+        pass
+    return filters
+
+
+DATASETS = {
+    'points': (PointMeasurements, point_filters),
+    'layers': (LayerMeasurements, layer_filters),
+}
+
+
+def _plan_summary(plan):
+    """
+    Node types and indexes of a JSON plan
+    """
+    nodes = set()
+    indexes = set()
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        nodes.add(node['Node Type'])
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        pending.extend(node.get('Plans', []))
+
+    return sorted(nodes), sorted(indexes)
+
+
+def explain(session, dataset, filters):
+    """
+    Run EXPLAIN ANALYZE for the query of the API with the filters
+    """
+    qry = session.query(*dataset._build_select_clause())
+    if hasattr(dataset, '_add_base_joins'):
+        qry = dataset._add_base_joins(qry)
+    qry = dataset.extend_qry(qry, check_size=False, **filters)
+    sql = str(
+        qry.statement.compile(
+            dialect=session.bind.dialect,
+            compile_kwargs={'literal_binds': True}
+        )
+    )
+
+    result = session.execute(
+        text(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}')
+    ).scalar()[0]
+    plan = result['Plan']
+    nodes, indexes = _plan_summary(plan)
+
+    return {
+        'sql': sql,
+        'planning_ms': result['Planning Time'],
+        'execution_ms': result['Execution Time'],
+        'rows': plan['Actual Rows'],
+        'shared_hit_blocks': plan['Shared Hit Blocks'],
+        'shared_read_blocks': plan['Shared Read Blocks'],
+        'nodes': nodes,
+        'indexes': indexes,
+    }
+
+
+def run(args):
+    results = []
+    with db_session_with_credentials(args.credentials) as (_engine, session):
+        for name, (dataset, sample) in DATASETS.items():
+            values = sample(session)
+            keys = [
+                key for key in dataset.ALLOWED_QRY_KWARGS
+                if key in values and key not in SKIPPED_FILTERS
+            ]
+            for size in range(1, args.max_filters + 1):
+                for combination in combinations(keys, size):
+                    filters = {key: values[key] for key in combination}
+                    result = explain(session, dataset, filters)
+                    result.update(dataset=name, filters=list(combination))
+                    results.append(result)
+                    print(
+                        f"{name} {', '.join(combination)}: "
+                        f"{result['execution_ms']:.1f} ms, "
+                        f"{result['rows']} rows, "
+                        f"indexes {', '.join(result['indexes']) or '-'}"
+                    )
+                    # Free the locks and snapshot of the last query
+                    session.rollback()
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2, default=str)
+
+
+def compare(args):
+    with open(args.before) as file:
+        before = {
+            (r['dataset'], tuple(r['filters'])): r for r in json.load(file)
+        }
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(f"{'filters':60} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+    for result in after:
+        key = (result['dataset'], tuple(result['filters']))
+        if key not in before:
+            continue
+        old = before[key]['execution_ms']
+        new = result['execution_ms']
+        label = f"{key[0]}: {', '.join(key[1])}"
+        ratio = old / new if new else float('inf')
+        print(f"{label:60} {old:10.1f} {new:10.1f} {ratio:7.1f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_run = commands.add_parser('run', help='Record plans and timings')
+    parser_run.add_argument('output', help='JSON file for the results')
+    parser_run.add_argument(
+        '--max-filters', type=int, default=2,
+        help='Largest number of combined filters (default: 2)'
+    )
+    parser_run.add_argument('--credentials', help='Path to a credentials file')
+    parser_run.set_defaults(func=run)
+
+    parser_compare = commands.add_parser(
+        'compare', help='Compare the timings of two runs'
+    )
+    parser_compare.add_argument('before', help='Results before the change')
+    parser_compare.add_argument('after', help='Results after the change')
+    parser_compare.set_defaults(func=compare)
+
+    return parser
+
+
+if __name__ == '__main__':
+    arguments = build_parser().parse_args()
+    arguments.func(arguments)
@@ -1,6 +1,7 @@
 """Top-level package for snowexsql."""
 
 from ._version import __version__ # noqa
+from .db import Database, profile # noqa
 
 __author__ = """SnowEx SQL Development Team"""
 __version__ = __version__
@@ -0,0 +1,174 @@
+"""
+Asynchronous variants of the measurement classes in snowexsql.api for
+asyncio applications, e.g. web services serving many concurrent requests.
+
+Queries run on a SQLAlchemy AsyncEngine with the asyncpg or psycopg 3
+driver. The statements are built with the filter logic of the synchronous
+classes, run through AsyncSession.run_sync, so both return the same data.
+
+Example:
+    >>> from snowexsql.aio import PointMeasurements
+    >>> df = await PointMeasurements.from_filter(type='depth', limit=10)
+
+Requires the async extra: ``pip install snowexsql[async]``
+"""
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from snowexsql import api
+from snowexsql.db import (
+    DB_CONNECTION_OPTIONS, DB_CONNECTION_PROTOCOL, db_connection_string
+)
+
+LOG = logging.getLogger(__name__)
+
+# Connection protocol and arguments for a session in UTC per driver
+ASYNC_DRIVERS = {
+    "asyncpg": (
+        "postgresql+asyncpg://", {"server_settings": {"timezone": "UTC"}}
+    ),
+    "psycopg": ("postgresql+psycopg://", DB_CONNECTION_OPTIONS),
+}
+DEFAULT_ASYNC_DRIVER = "asyncpg"
+
+# Engines shared by all sessions of the process, see get_async_engine
+_ENGINES = {}
+
+
+def get_async_engine(credentials_path=None, driver=None):
+    """
+    Async engine shared by all calls with the same connection information.
+    Connections of an engine belong to the event loop they were opened in,
+    use dispose_engines before switching to another loop.
+
+    Args:
+        credentials_path (string): Full path to credentials file (Optional)
+        driver: One of ASYNC_DRIVERS. Defaults to the
+                SNOWEX_DB_ASYNC_DRIVER environment variable or asyncpg
+
+    Returns:
+        sqlalchemy AsyncEngine object
+    """
+    driver = driver or os.getenv("SNOWEX_DB_ASYNC_DRIVER", DEFAULT_ASYNC_DRIVER)
+    if driver not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"Unknown async driver {driver}, use one of "
+            f"{', '.join(ASYNC_DRIVERS)}"
+        )
+    protocol, connect_args = ASYNC_DRIVERS[driver]
+    db_connection = db_connection_string(credentials_path).replace(
+        DB_CONNECTION_PROTOCOL, protocol, 1
+    )
+
+    key = (db_connection, driver)
+    if key not in _ENGINES:
+        _ENGINES[key] = create_async_engine(
+            db_connection, echo=False, connect_args=connect_args
+        )
+
+    return _ENGINES[key]
+
+
+async def dispose_engines():
+    """
+    Close the connections of all shared async engines
+    """
+    for engine in _ENGINES.values():
+        await engine.dispose()
+    _ENGINES.clear()
+
+
+@asynccontextmanager
+async def async_session_with_credentials(credentials_path=None):
+    """
+    Async counterpart of snowexsql.db.db_session_with_credentials
+
+    Args:
+        credentials_path (string): Full path to credentials file (Optional)
+    """
+    engine = get_async_engine(credentials_path)
+    session = async_sessionmaker(engine, expire_on_commit=False)()
+    try:
+        yield engine, session
+    finally:
+        await session.close()
+
+
+class AsyncDataset:
+    """
+    Base class for the async measurement classes. The statements and
+    filters come from the synchronous class in SYNC.
+    """
+    SYNC = None
+
+    @classmethod
+    async def _run(cls, function, *args, **kwargs):
+        """
+        Run a function that takes a synchronous session on an async session
+        """
+        async with async_session_with_credentials() as (_engine, session):
+            try:
+                return await session.run_sync(function, *args, **kwargs)
+            except Exception as e:
+                LOG.error(f"Failed async query for {cls.__name__}")
+                raise e
+
+    @classmethod
+    async def from_filter(cls, verbose=False, **kwargs):
+        """
+        See snowexsql.api.BaseDataset.from_filter
+        """
+        def query(session):
+            qry = cls.SYNC._filter_query(session, verbose, **kwargs)
+            return api.read_frame(qry, session.connection())
+
+        return await cls._run(query)
+
+    @classmethod
+    async def from_area(
+        cls, verbose=False, shp=None, pt=None, buffer=None, crs=26912, **kwargs
+    ):
+        """
+        See snowexsql.api.BaseDataset.from_area
+        """
+        def query(session):
+            qry = cls.SYNC._area_query(
+                session, verbose, shp, pt, buffer, crs, **kwargs
+            )
+            return api.read_frame(qry, session.connection())
+
+        return await cls._run(query)
+
+    @classmethod
+    async def from_unique_entries(cls, columns_to_search, **kwargs):
+        """
+        See snowexsql.api.BaseDataset.from_unique_entries
+        """
+        def query(session):
+            qry = cls.SYNC._unique_entries_query(
+                session, columns_to_search, **kwargs
+            )
+            return session.execute(qry).all()
+
+        results = await cls._run(query)
+        if len(columns_to_search) == 1:
+            results = cls.SYNC.retrieve_single_value_result(results)
+
+        return results
+
+
+class PointMeasurements(AsyncDataset):
+    """
+    Async API class for access to PointData
+    """
+    SYNC = api.PointMeasurements
+
+
+class LayerMeasurements(AsyncDataset):
+    """
+    Async API class for access to LayerData
+    """
+    SYNC = api.LayerMeasurements
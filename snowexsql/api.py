@@ -5,21 +5,38 @@ This module has the query logic for the Python API and the LambdaClient.
 See the lambda_handler.py for requirements on exposing an endpoint to the client.
 """
 
+import functools
+import inspect
 import logging
 import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
 
 import pandas as pd
-from sqlalchemy import Numeric, cast, exists, literal
-from sqlalchemy.dialects import postgresql
+from geoalchemy2 import Raster
+from geoalchemy2.types import SummaryStats
+from sqlalchemy import (
+    Date, Float, Integer, LargeBinary, Numeric, and_, bindparam, cast,
+    distinct, exists, false, literal, select, text, true
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array_agg
 from sqlalchemy.sql import func
 
-from snowexsql.db import db_session_with_credentials
+from snowexsql.cache import (
+    DEFAULT_MAX_BYTES, DEFAULT_VERSION_TTL, ResultCache
+)
+from snowexsql.db import db_session_with_credentials, profiled
+from snowexsql.lookups import LOOKUPS, LookupResolver
 from snowexsql.tables import (
     DOI,
     Campaign,
     CampaignObservation,
+    DataLoad,
     ImageData,
     ImageObservation,
+    ImageOverview,
     Instrument,
     LayerData,
     MeasurementType,
@@ -28,10 +45,48 @@ from snowexsql.tables import (
     PointObservation,
     Site,
 )
+from snowexsql.tables.site import SiteObservers
 
 # Initialize logger first
 LOG = logging.getLogger(__name__)
 
+# Lookup table ids shared by all queries of this process
+LOOKUP_RESOLVER = LookupResolver()
+
+# Cache of the query results, see enable_cache
+RESULT_CACHE = None
+# Engine and session of a cached call that the API methods use instead of
+# opening their own
+_SHARED_SESSION = ContextVar("snowexsql_shared_session", default=None)
+
+# Other transactions writing to a table, see BaseDataset.committed_token
+WRITERS_QUERY = text(
+    "SELECT count(*) FROM pg_locks "
+    "WHERE relation = CAST(:table AS regclass) "
+    "AND mode = 'RowExclusiveLock' AND pid <> pg_backend_pid()"
+)
+
+# Shapes of the geometry in query results, see BaseDataset._select
+GEOMETRY_OUTPUTS = ("wkb", "xy", "none")
+
+# Statistics of PointMeasurements.aggregate
+AGGREGATE_STATS = {
+    "count": func.count,
+    "mean": func.avg,
+    "std": func.stddev_samp,
+    "min": func.min,
+    "max": func.max,
+    "sum": func.sum,
+    "median": lambda column: func.percentile_cont(0.5).within_group(column),
+}
+
+
+def _statement(query):
+    """
+    The select() statement of a legacy Query, select() statements as is
+    """
+    return getattr(query, "statement", query)
+
 
 def query_to_geopandas(query, engine, **kwargs):
     """
@@ -43,8 +98,11 @@ def query_to_geopandas(query, engine, **kwargs):
       - DataFrame is serialized to JSON by lambda_handler
       - lambda_client receives JSON and converts to GeoDataFrame client-side
 
+    The statement is executed with bound parameters, so the engine reuses
+    the compiled SQL for queries of the same shape.
+
     Args:
-        query: SQLAlchemy Query object
+        query: SQLAlchemy select() or legacy Query object
         engine: SQLAlchemy engine
         **kwargs: Additional arguments passed to read_postgis or read_sql
 
@@ -52,27 +110,287 @@ def query_to_geopandas(query, engine, **kwargs):
         Local API: geopandas.GeoDataFrame
         Lambda client: pandas.DataFrame
     """
-    sql = query.statement.compile(dialect=postgresql.dialect())
+    with engine.connect() as connection:
+        return read_frame(_statement(query), connection, **kwargs)
+
+
+def read_frame(statement, connection, **kwargs):
+    """
+    Run a statement on a connection and return the result as GeoDataFrame
+    (if geopandas available) or DataFrame, see query_to_geopandas.
+    Statements without a geom column always return a DataFrame.
+    """
+    if "geom" not in statement.selected_columns.keys():
+        return pd.read_sql(statement, connection, **kwargs)
 
     try:
         import geopandas as gpd
 
-        return gpd.read_postgis(sql, engine.connect(), **kwargs)
+        return gpd.read_postgis(statement, connection, **kwargs)
     except ImportError:
         # Geopandas not available (e.g., Lambda environment)
         # Returns pandas DataFrame with geometry as WKB/WKT
         # lambda_client will convert to GeoDataFrame client-side
-        return pd.read_sql(sql, engine, **kwargs)
+        return pd.read_sql(statement, connection, **kwargs)
 
 
 def raster_to_rasterio(rasters):
-    """Raster functionality requires rasterio"""
-    raise ImportError(
-        "Raster functionality not available in Lambda environment. "
-        "Use local API for raster operations."
+    """
+    Rasterio datasets of the queried rasters, see
+    snowexsql.conversions.raster_to_rasterio. Raster functionality requires
+    rasterio, which the Lambda environment does not have.
+    """
+    try:
+        from snowexsql.conversions import raster_to_rasterio as to_rasterio
+    except ImportError as e:
+        raise ImportError(
+            "Raster functionality not available in Lambda environment. "
+            "Use local API for raster operations."
+        ) from e
+
+    return to_rasterio(rasters)
+
+
+def _canonical_filters(kwargs):
+    """
+    Turn filter keyword arguments into a hashable key that does not depend
+    on the order the filters were given in.
+    """
+    return tuple(
+        sorted(
+            (k, tuple(v) if isinstance(v, list) else v)
+            for k, v in kwargs.items()
+        )
     )
 
 
+def _as_date(value):
+    """
+    Date of a date filter value, None for anything that is not a single
+    date
+    """
+    if isinstance(value, datetime):
+        return None
+    elif isinstance(value, date):
+        return value
+    elif isinstance(value, str):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _datetime_filter(column, key, day):
+    """
+    Filter a timestamp column on a date with a range instead of casting each
+    row to a date, so indexes and partitions on the column are used. Dates
+    are in UTC like the database sessions.
+
+    Args:
+        column: Timestamp column
+        key: One of date, date_greater_equal or date_less_equal
+        day: Date to filter on
+    """
+    start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    end = start + timedelta(days=1)
+    if key == "date":
+        return and_(column >= start, column < end)
+    elif key == "date_greater_equal":
+        return column >= start
+    return column < end
+
+
+def _point_batch(xs, ys, crs, db_srid, name="points"):
+    """
+    Send many points to the database with one statement. The coordinates
+    are passed as two array parameters that are unnested into a derived
+    table next to their position in the input.
+
+    Args:
+        xs: Sequence of x coordinates
+        ys: Sequence of y coordinates
+        crs: integer SRID of the coordinates
+        db_srid: integer SRID to transform the points to
+        name: Name of the derived table
+
+    Returns:
+        Subquery with the columns ``batch_id`` and ``geom``
+    """
+    coordinates = func.unnest(
+        bindparam(
+            f"{name}_id", list(range(len(xs))), type_=ARRAY(Integer)
+        ),
+        bindparam(f"{name}_x", list(xs), type_=ARRAY(Float)),
+        bindparam(f"{name}_y", list(ys), type_=ARRAY(Float)),
+    ).table_valued("batch_id", "x", "y").render_derived(name=f"{name}_xy")
+
+    geom = func.ST_Transform(
+        func.ST_SetSRID(
+            func.ST_MakePoint(coordinates.c.x, coordinates.c.y), crs
+        ),
+        db_srid,
+    )
+    return select(
+        coordinates.c.batch_id, geom.label("geom")
+    ).subquery(name)
+
+
+def _geometry_batch(geometries, crs, db_srid, name="shapes"):
+    """
+    Send many geometries to the database with one statement. The geometries
+    are passed as an array of WKB that is unnested into a derived table
+    next to their position in the input.
+
+    Args:
+        geometries: Sequence of shapely geometries
+        crs: integer SRID of the geometries
+        db_srid: integer SRID to transform the geometries to
+        name: Name of the derived table
+
+    Returns:
+        Subquery with the columns ``batch_id`` and ``geom``
+    """
+    wkbs = [geometry.wkb for geometry in geometries]
+    shapes = func.unnest(
+        bindparam(
+            f"{name}_id", list(range(len(wkbs))), type_=ARRAY(Integer)
+        ),
+        bindparam(f"{name}_wkb", wkbs, type_=ARRAY(LargeBinary)),
+    ).table_valued("batch_id", "wkb").render_derived(name=f"{name}_wkb")
+
+    geom = func.ST_Transform(func.ST_GeomFromWKB(shapes.c.wkb, crs), db_srid)
+    return select(shapes.c.batch_id, geom.label("geom")).subquery(name)
+
+
+def _table_name(expression):
+    """
+    Name of the table of a column, mapped attribute or labeled column.
+    None for other expressions.
+    """
+    if hasattr(expression, "__clause_element__"):
+        expression = expression.__clause_element__()
+    expression = getattr(expression, "element", expression)
+    table = getattr(expression, "table", None)
+    return getattr(table, "name", None)
+
+
+def _point_wkt(pt):
+    """
+    WKT of a shapely point, WKT string or (x, y) tuple. None for anything
+    else.
+    """
+    if pt is None:
+        return None
+    elif hasattr(pt, "wkt"):
+        return pt.wkt
+    elif isinstance(pt, str):
+        return pt
+    elif isinstance(pt, (tuple, list)) and len(pt) == 2:
+        # Handle (x, y) tuple format
+        return f"POINT ({pt[0]} {pt[1]})"
+    return None
+
+
+def enable_cache(max_bytes=DEFAULT_MAX_BYTES, directory=None,
+                 version_ttl=DEFAULT_VERSION_TTL):
+    """
+    Cache the results of from_filter and from_area of the point and layer
+    classes. Repeated calls with the same arguments return a copy of the
+    cached frame until data is loaded into the database.
+
+    Args:
+        max_bytes: Memory used by the cached frames
+        directory: Optional directory to keep the results as Parquet files
+        version_ttl: Seconds between checks for newly loaded data
+
+    Returns:
+        snowexsql.cache.ResultCache
+    """
+    global RESULT_CACHE
+    RESULT_CACHE = ResultCache(max_bytes, directory, version_ttl)
+    return RESULT_CACHE
+
+
+def disable_cache():
+    """
+    Stop caching query results and drop the cached frames in memory
+    """
+    global RESULT_CACHE
+    RESULT_CACHE = None
+
+
+def _cache_value(value):
+    """
+    Hashable form of an argument for the cache key. Geometries are keyed
+    by their WKT.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_value(v) for v in value)
+    if hasattr(value, "wkt"):
+        return value.wkt
+    return value
+
+
+def cached(function):
+    """
+    Decorator returning the results of an API method from RESULT_CACHE
+    when it is enabled. Calls with arguments that can not be hashed are
+    not cached.
+    """
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(cls, *args, **kwargs):
+        cache = RESULT_CACHE
+        if cache is None:
+            return function(cls, *args, **kwargs)
+
+        arguments = signature.bind(cls, *args, **kwargs)
+        arguments.apply_defaults()
+        arguments = dict(arguments.arguments)
+        arguments.pop("cls")
+        arguments.update(arguments.pop("kwargs", {}))
+        key = (
+            cls.__name__, function.__name__,
+            _canonical_filters(
+                {k: _cache_value(v) for k, v in arguments.items()}
+            )
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return function(cls, *args, **kwargs)
+
+        source = cls._cache_source()
+        known = cache.current_version(source)
+        if known is not None:
+            result = cache.get(source, key, known)
+            if result is not None:
+                return result
+
+        # The version is read again on the connection of the query, so a
+        # replica behind the last version read can not fill the cache
+        with cls._session() as (engine, session):
+            token = _SHARED_SESSION.set((engine, session))
+            try:
+                version = cache.version(
+                    source, lambda: cls._data_version(session), refresh=True
+                )
+                result = None
+                if version != known:
+                    result = cache.get(source, key, version)
+                if result is None:
+                    result = function(cls, *args, **kwargs)
+                    cache.put(source, key, version, result)
+            finally:
+                _SHARED_SESSION.reset(token)
+
+        return result
+
+    return wrapper
+
+
 class LargeQueryCheckException(RuntimeError):
     pass
 
@@ -81,7 +399,7 @@ def get_points():
     """
     Get a single row from the points table
     """
-    with db_session_with_credentials() as (_engine, session):
+    with db_session_with_credentials(read_only=True) as (_engine, session):
         qry = session.query(PointData).limit(1)
         # Execute that query!
         result = qry.all()
@@ -117,6 +435,91 @@ class BaseDataset:
     SPECIAL_KWARGS = ["limit"]
     # Default max record count
     MAX_RECORD_COUNT = 1000
+    # snowexsql.db.Database to query, see bind. Without one the database
+    # of the environment is used.
+    DATABASE = None
+
+    @classmethod
+    def bind(cls, database):
+        """
+        This class bound to a database, for processes that query
+        several databases.
+
+        Args:
+            database: snowexsql.db.Database
+
+        Returns:
+            Subclass of this class that queries the database
+
+        Example:
+            >>> points = PointMeasurements.bind(Database(credentials_path))
+            >>> points.from_filter(type="depth", limit=10)
+        """
+        return type(cls.__name__, (cls,), {
+            "DATABASE": database,
+            "__doc__": cls.__doc__,
+            "__module__": cls.__module__,
+        })
+
+    @classmethod
+    def _session(cls):
+        """
+        Read only session on the bound database
+        """
+        shared = _SHARED_SESSION.get()
+        if shared is not None:
+            return nullcontext(shared)
+        if cls.DATABASE is None:
+            return db_session_with_credentials(read_only=True)
+        return cls.DATABASE.session(read_only=True)
+
+    @classmethod
+    def _cache_source(cls):
+        """
+        Identity of the database for the result cache
+        """
+        if cls.DATABASE is None:
+            return (
+                os.getenv("SNOWEX_DB_CONNECTION"),
+                os.getenv("SNOWEX_DB_CREDENTIALS"),
+            )
+        return cls.DATABASE.url
+
+    @staticmethod
+    def _data_version(session):
+        """
+        Number of entries in the data_loads table per table and the highest
+        ids of the tables data is loaded into. Every write of
+        snowexsql.ingest adds an entry, including updates in place. The ids
+        cover rows added by other means.
+        """
+        ids = session.execute(
+            select(*[
+                select(func.max(model.id)).scalar_subquery()
+                for model in [
+                    PointData, LayerData, Site, CampaignObservation, ImageData
+                ]
+            ])
+        ).one()
+        loads = session.execute(
+            select(DataLoad.table_name, func.count(), func.max(DataLoad.id))
+            .group_by(DataLoad.table_name)
+            .order_by(DataLoad.table_name)
+        ).all()
+        return tuple(ids) + tuple(tuple(row) for row in loads)
+
+    @classmethod
+    def _fetch_data_version(cls):
+        """
+        Data version of the database of the class
+        """
+        with cls._session() as (_engine, session):
+            try:
+                return cls._data_version(session)
+            except Exception as e:
+                session.close()
+                LOG.error("Failed to read the data version")
+                raise e
 
     @staticmethod
     def retrieve_single_value_result(result):
@@ -148,11 +551,15 @@ class BaseDataset:
         return [cls.MODEL]
 
     @classmethod
-    def _check_size(cls, qry, kwargs):
+    def _check_size(cls, qry, kwargs, session):
         """
         Safeguard against accidental giant requests
         """
-        count = qry.count()
+        count = session.scalar(
+            select(func.count()).select_from(
+                _statement(qry).order_by(None).subquery()
+            )
+        )
         if count > cls.MAX_RECORD_COUNT and "limit" not in kwargs:
             raise LargeQueryCheckException(
                 f"Query will return {count} number of records,"
@@ -161,46 +568,120 @@ class BaseDataset:
                 f" to the desired number of records."
             )
 
-    @classmethod
-    def _filter_campaign(cls, qry, v):
-        qry = qry.filter(Site.campaign.has(Campaign.name == v))
-        return qry
+    @staticmethod
+    def _ids(session, statement):
+        """
+        Run a query for ids against one of the small tables
+        """
+        return session.execute(statement).scalars().all()
 
     @classmethod
-    def _filter_observers(cls, qry, v):
-        qry = qry.join(cls.MODEL.observers).filter(Observer.name == v)
-        return qry
+    def _observation_filter(cls, session, lookup, ids):
+        """
+        Filter on the observation_id column for lookups stored with the
+        campaign observation
+        """
+        column = {
+            "campaign": CampaignObservation.campaign_id,
+            "doi": CampaignObservation.doi_id,
+            "instrument": CampaignObservation.instrument_id,
+            "observer": CampaignObservation.observers_id,
+        }[lookup]
+        observation_ids = cls._ids(
+            session, select(CampaignObservation.id).where(column.in_(ids))
+        )
+        return cls.MODEL.observation_id.in_(observation_ids)
 
     @classmethod
-    def _filter_instrument(cls, qry, value):
-        return qry.filter(cls.MODEL.instrument.has(name=value))
+    def _lookup_filter(cls, session, lookup, ids):
+        """
+        Filter expression on the foreign key columns of cls.MODEL for the
+        resolved ids of a lookup.
+
+        Args:
+            session: SQLAlchemy session
+            lookup: Name of the lookup, one of snowexsql.lookups.LOOKUPS
+            ids: Non-empty list of ids of the lookup table
+        """
+        if lookup == "type":
+            return cls.MODEL.measurement_type_id.in_(ids)
+        return cls._observation_filter(session, lookup, ids)
 
     @classmethod
-    def _filter_measurement_type(cls, qry, value):
-        return qry.join(cls.MODEL.measurement_type).filter(
-            MeasurementType.name == value
+    def _filter_lookup(cls, qry, session, lookup, value):
+        """
+        Filter on a name of a lookup table. The data table is filtered on
+        its foreign key columns by the cached ids of all entries with the
+        names, without joining the lookup tables. Unknown names give an
+        empty result without a query.
+        """
+        values = value if isinstance(value, list) else [value]
+        resolver = (
+            LOOKUP_RESOLVER if cls.DATABASE is None else cls.DATABASE.lookups
         )
+        ids = resolver.all_ids(session.connection(), lookup, values)
+        if not ids:
+            LOG.debug(f"No {lookup} found for {value}")
+            return qry.filter(false())
+
+        return qry.filter(cls._lookup_filter(session, lookup, ids))
 
     @classmethod
-    def _filter_doi(cls, qry, value):
-        return qry.join(cls.MODEL.doi).filter(DOI.doi == value)
+    def _date_filter(cls, session, key, day):
+        """
+        Filter expression for a date filter on the measurement datetime
+        """
+        return _datetime_filter(cls.MODEL.datetime, key, day)
 
     @classmethod
-    def extend_qry(cls, qry, check_size=True, **kwargs):
+    def extend_qry(cls, qry, check_size=True, session=None, **kwargs):
+        """
+        Add the filters to a query
+
+        Args:
+            qry: SQLAlchemy select() or legacy Query
+            check_size: Raise a LargeQueryCheckException for results larger
+                        than MAX_RECORD_COUNT without a limit
+            session: SQLAlchemy session to resolve filter values with,
+                     defaults to the session of a legacy Query
+            kwargs: Filter arguments from ALLOWED_QRY_KWARGS
+
+        Returns:
+            The filtered query of the same type as qry
+        """
         if cls.MODEL is None:
             raise ValueError("You must use a class with a MODEL.")
+        if session is None:
+            session = qry.session
 
         # use the default kwargs
         for k, v in kwargs.items():
             # Handle special operations
-            if k in cls.ALLOWED_QRY_KWARGS:
+            if k in cls.ALLOWED_QRY_KWARGS and k in LOOKUPS:
+                qry = cls._filter_lookup(qry, session, k, v)
+                LOG.debug(f"Filtering {k} to {v}")
+
+            elif (
+                k in cls.ALLOWED_QRY_KWARGS and "date" in k
+                and cls.MODEL in (PointData, LayerData)
+                and _as_date(v) is not None
+            ):
+                qry = qry.filter(cls._date_filter(session, k, _as_date(v)))
+                LOG.debug(f"Filtering {k} to {v}")
+
+            elif k in cls.ALLOWED_QRY_KWARGS:
                 qry_model = cls.MODEL
-                # Logic for filtering on date with LayerData
+                # Logic for filtering on other date values with LayerData
                 if "date" in k and cls.MODEL == LayerData:
                     qry = qry.join(LayerData.site)
                     qry_model = Site
-                elif cls.MODEL == PointData:
-                    qry = qry.join(PointData.observation)
+                # Dates and descriptions of rasters are stored with the
+                # observation
+                elif cls.MODEL == ImageData and (
+                    "date" in k or k == "description"
+                ):
+                    qry = qry.join(ImageData.observation)
+                    qry_model = ImageObservation
 
                 # standard filtering using qry.filter
                 if isinstance(v, list):
@@ -236,10 +717,6 @@ class BaseDataset:
                         else:
                             qry = qry.filter(getattr(qry_model, key) <= v)
                     # Filter linked columns
-                    elif k == "instrument":
-                        qry = cls._filter_instrument(qry, v)
-                    elif k == "campaign":
-                        qry = cls._filter_campaign(qry, v)
                     elif k == "site":
                         # Handle list of site names
                         if isinstance(v, list):
@@ -250,12 +727,6 @@ class BaseDataset:
                             )
                         else:
                             qry = qry.filter(qry_model.site.has(name=v))
-                    elif k == "observer":
-                        qry = cls._filter_observers(qry, v)
-                    elif k == "doi":
-                        qry = cls._filter_doi(qry, v)
-                    elif k == "type":
-                        qry = cls._filter_measurement_type(qry, v)
                     # Filter to exact value
                     else:
                         qry = qry.filter(getattr(qry_model, k) == v)
@@ -270,23 +741,33 @@ class BaseDataset:
                 raise ValueError(f"{k} is not an allowed filter")
 
         if check_size:
-            cls._check_size(qry, kwargs)
+            cls._check_size(qry, kwargs, session)
 
         return qry
 
     @classmethod
-    def from_unique_entries(cls, columns_to_search, **kwargs):
+    def _unique_entries_query(cls, session, columns_to_search, **kwargs):
         """
-        Returns unique values from a column to help with filtering
+        Statement of from_unique_entries
         """
         columns = [getattr(cls.MODEL, column) for column in columns_to_search]
+        qry = select(*columns)
+        # Hardcode the limit to
+        qry = cls.extend_qry(qry, check_size=False, session=session, **kwargs)
+        return qry.distinct()
 
-        with db_session_with_credentials() as (_engine, session):
+    @classmethod
+    @profiled
+    def from_unique_entries(cls, columns_to_search, **kwargs):
+        """
+        Returns unique values from a column to help with filtering
+        """
+        with cls._session() as (_engine, session):
             try:
-                qry = session.query(*columns)
-                # Hardcode the limit to
-                qry = cls.extend_qry(qry, check_size=False, **kwargs)
-                results = qry.distinct().all()
+                qry = cls._unique_entries_query(
+                    session, columns_to_search, **kwargs
+                )
+                results = session.execute(qry).all()
 
             except Exception as e:
                 session.close()
@@ -298,31 +779,153 @@ class BaseDataset:
 
         return results
 
+    @staticmethod
+    def _shape_geometry(columns, geometry="wkb", precision=None):
+        """
+        Replace the geom column of the selected columns
+
+        Args:
+            columns: Column expressions of _build_select_clause
+            geometry: One of GEOMETRY_OUTPUTS. wkb keeps the geometry, xy
+                      returns float x and y columns of a point geometry
+                      instead and none drops it.
+            precision: Optional number of decimals to round the
+                       coordinates to
+        """
+        if geometry not in GEOMETRY_OUTPUTS:
+            raise ValueError(
+                f"Unknown geometry output {geometry}, use one of "
+                f"{', '.join(GEOMETRY_OUTPUTS)}"
+            )
+
+        shaped = []
+        for column in columns:
+            if getattr(column, "key", None) != "geom":
+                shaped.append(column)
+            elif geometry == "wkb" and precision is None:
+                shaped.append(column)
+            elif geometry == "wkb":
+                shaped.append(
+                    func.ST_SnapToGrid(column, 10.0 ** -precision)
+                    .label("geom")
+                )
+            elif geometry == "xy":
+                for axis, coordinate in [("x", func.ST_X), ("y", func.ST_Y)]:
+                    value = coordinate(column)
+                    if precision is not None:
+                        value = cast(
+                            func.round(cast(value, Numeric), precision), Float
+                        )
+                    shaped.append(value.label(axis))
+
+        return shaped
+
+    @classmethod
+    def _table_joins(cls):
+        """
+        Relationships to join for the columns of a table in verbose mode,
+        by table name. Override in subclasses with verbose joins.
+        """
+        return {}
+
+    @classmethod
+    def _pick_columns(cls, columns):
+        """
+        Column expressions for the names of columns and the relationships
+        they need joined. The names are the ones of the results of
+        from_filter with and without verbose.
+        """
+        available = {}
+        for verbose in [False, True]:
+            for expression in cls._build_select_clause(verbose):
+                available.setdefault(expression.key, expression)
+
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            raise ValueError(
+                f"Unknown columns {unknown}. Use any of {list(available)}"
+            )
+
+        picked = [available[column] for column in columns]
+        table_joins = cls._table_joins()
+        joins = []
+        for expression in picked:
+            for relationship in table_joins.get(_table_name(expression), []):
+                if not any(relationship is joined for joined in joins):
+                    joins.append(relationship)
+
+        return picked, joins
+
+    @classmethod
+    def _select(cls, verbose=False, geometry="wkb", precision=None,
+                columns=None):
+        """
+        Select statement with the columns and joins of cls, before any
+        filter. See _shape_geometry for the geometry and precision.
+        A list of column names selects only those, see _pick_columns.
+        """
+        if columns is not None:
+            picked, joins = cls._pick_columns(columns)
+            qry = select(
+                *cls._shape_geometry(picked, geometry, precision)
+            ).select_from(cls.MODEL)
+            for relationship in joins:
+                qry = qry.join(relationship)
+            return qry
+
+        qry = select(
+            *cls._shape_geometry(
+                cls._build_select_clause(verbose), geometry, precision
+            )
+        )
+
+        # Add explicit joins for verbose mode to avoid cartesian products
+        if verbose and hasattr(cls, "_add_verbose_joins"):
+            qry = cls._add_verbose_joins(qry)
+        elif hasattr(cls, "_add_base_joins"):
+            # For verbose=False, still need basic joins (e.g., Site for geom)
+            qry = cls._add_base_joins(qry)
+
+        return qry
+
     @classmethod
-    def from_filter(cls, verbose=False, **kwargs):
+    def _filter_query(
+        cls, session, verbose=False, geometry="wkb", precision=None,
+        columns=None, **kwargs
+    ):
+        """
+        Statement of from_filter
+        """
+        return cls.extend_qry(
+            cls._select(verbose, geometry, precision, columns),
+            session=session, **kwargs
+        )
+
+    @classmethod
+    @profiled
+    @cached
+    def from_filter(cls, verbose=False, geometry="wkb", precision=None,
+                    columns=None, **kwargs):
         """
         Get data for the class by filtering by allowed arguments. The allowed
         filters are cls.ALLOWED_QRY_KWARGS.
 
         Args:
             verbose: If True, return denormalized data with related table columns
+            geometry: wkb for a geom column, xy for float x and y columns or
+                      none for no geometry. Only wkb returns a GeoDataFrame.
+            precision: Optional number of decimals of the coordinates
+            columns: Optional list of the columns to return instead of the
+                     ones of verbose. Any of the columns of the verbose and
+                     non-verbose results, only the tables they come from
+                     are joined.
             kwargs: Filter arguments from ALLOWED_QRY_KWARGS
         """
-        with db_session_with_credentials() as (engine, session):
+        with cls._session() as (engine, session):
             try:
-                select_clause = cls._build_select_clause(verbose)
-                qry = session.query(*select_clause)
-
-                # Add explicit joins for verbose mode to avoid cartesian
-                # products
-                if verbose and hasattr(cls, "_add_verbose_joins"):
-                    qry = cls._add_verbose_joins(qry)
-                elif hasattr(cls, "_add_base_joins"):
-                    # For verbose=False, still need basic joins (e.g.,
-                    # Site for geom)
-                    qry = cls._add_base_joins(qry)
-
-                qry = cls.extend_qry(qry, **kwargs)
+                qry = cls._filter_query(
+                    session, verbose, geometry, precision, columns, **kwargs
+                )
 
                 # For debugging in the test suite and not
                 # recommended in production
@@ -330,7 +933,7 @@ class BaseDataset:
                 # sqlexpressions.html#rendering-postcompile-
                 # parameters-as-bound-parameters
                 if "DEBUG_QUERY" in os.environ:
-                    full_sql_query = qry.statement.compile(
+                    full_sql_query = qry.compile(
                         compile_kwargs={"literal_binds": True}
                     )
                     print("\n ** SQL query **")
@@ -344,9 +947,144 @@ class BaseDataset:
 
         return df
 
+    @staticmethod
+    def _detect_srid(session, geom_column, crs):
+        """
+        Find the SRID of the stored geometries (or rasters) so search
+        geometries can be transformed instead of the indexed column.
+
+        Args:
+            session: SQLAlchemy session
+            geom_column: Geometry or raster column to inspect
+            crs: SRID to fall back to when the table is empty
+
+        Returns:
+            Integer SRID
+        """
+        table_name = geom_column.class_.__tablename__
+        # Query first non-null geometry to determine database SRID
+        srid_qry = (
+            session.query(func.ST_SRID(geom_column))
+            .filter(geom_column.isnot(None))
+            .limit(1)
+        )
+        try:
+            db_srid_result = session.execute(srid_qry).first()
+            if not db_srid_result or db_srid_result[0] is None:
+                # No data in table yet - use input CRS as default
+                # This allows empty table queries to work
+                # (will return empty)
+                LOG.warning(
+                    f"No geometries found in {table_name}, "
+                    f"using input CRS {crs} as default"
+                )
+                db_srid = crs
+            else:
+                db_srid = db_srid_result[0]
+                LOG.debug(
+                    f"Detected database SRID: \
+                         {db_srid} for table {table_name}"
+                )
+        except Exception as srid_error:
+            # If SRID detection fails, fall back to input CRS
+            LOG.warning(
+                f"SRID detection failed for {table_name}: {srid_error}."
+                f"Using input CRS {crs} as default"
+            )
+            db_srid = crs
+
+        return db_srid
+
+    @staticmethod
+    def _search_geometry(shp, pt, buffer, crs, db_srid):
+        """
+        Build the PostGIS search geometry for spatial queries.
+
+        Args:
+            shp: shapely geometry or WKT string
+            pt: shapely point, WKT string or (x, y) tuple
+            buffer: buffer distance applied to pt in units of crs
+            crs: integer SRID of shp or pt
+            db_srid: integer SRID of the searched column
+
+        Returns:
+            SQLAlchemy function expression in the database SRID
+        """
+        # Convert shapely objects to WKT if needed
+        if shp is not None and hasattr(shp, "wkt"):
+            shp_wkt = shp.wkt
+        elif isinstance(shp, str):
+            shp_wkt = shp
+        else:
+            shp_wkt = None
+
+        pt_wkt = _point_wkt(pt)
+
+        # Transform search geometry to match database SRID for index usage
+        if pt_wkt:
+            # Create point in input CRS, buffer it, then transform to DB SRID
+            # Buffer before transform to ensure correct distance units
+            return func.ST_Transform(
+                func.ST_Buffer(
+                    func.ST_GeomFromText(literal(pt_wkt), literal(crs)),
+                    literal(buffer),
+                ),
+                literal(db_srid),
+            )
+        elif shp_wkt:
+            # Transform shape from input CRS to database SRID
+            return func.ST_Transform(
+                func.ST_GeomFromText(literal(shp_wkt), literal(crs)),
+                literal(db_srid),
+            )
+
+        raise ValueError("Unable to parse geometry input")
+
+    @classmethod
+    def _area_query(
+        cls, session, verbose=False, shp=None, pt=None, buffer=None,
+        crs=26912, geometry="wkb", precision=None, columns=None, **kwargs
+    ):
+        """
+        Statement of from_area
+        """
+        if shp is None and pt is None:
+            raise ValueError("Inputs must be a shape description or a point and buffer")
+        if (pt is not None and buffer is None) or (buffer is not None and pt is None):
+            raise ValueError("pt and buffer must be given together")
+
+        # Determine table structure
+        needs_site_join = cls.MODEL.__tablename__ == "layers"
+
+        # Detect database SRID to avoid transforming indexed column
+        geom_column = Site.geom if needs_site_join else cls.MODEL.geom
+        db_srid = cls._detect_srid(session, geom_column, crs)
+
+        # Build PostGIS search geometry in the database SRID
+        search_geom = cls._search_geometry(shp, pt, buffer, crs, db_srid)
+
+        qry = cls._select(verbose, geometry, precision, columns)
+
+        # Add spatial filter
+        if needs_site_join:
+            # For LayerData, join to Site for geometry
+            # SQLAlchemy handles duplicate joins from _add_*_joins above
+            qry = qry.join(cls.MODEL.site)
+            qry = qry.filter(func.ST_Intersects(Site.geom, search_geom))
+        else:
+            # For PointData, use direct geometry column
+            qry = qry.filter(func.ST_Intersects(cls.MODEL.geom, search_geom))
+
+        # Add standard filters using existing extend_qry
+        # This handles type, instrument, campaign, date ranges, etc.
+        return cls.extend_qry(qry, session=session, **kwargs)
+
     @classmethod
+    @profiled
+    @cached
     def from_area(
-        cls, verbose=False, shp=None, pt=None, buffer=None, crs=26912, **kwargs
+        cls, verbose=False, shp=None, pt=None, buffer=None, crs=26912,
+        geometry="wkb", precision=None, columns=None, **kwargs
     ):
         """
         Get data for the class within a specific shapefile or
@@ -359,145 +1097,401 @@ class BaseDataset:
             pt: shapely point that will have a buffer applied, or WKT string
             buffer: buffer distance in same units as point (meters if using geography)
             crs: integer SRID/EPSG code (default 26912 = UTM Zone 12N)
+            geometry: Shape of the geometry in the result, see from_filter
+            precision: Optional number of decimals of the coordinates
+            columns: Optional list of the columns to return, see from_filter
             kwargs: for more filtering or limiting (cls.ALLOWED_QRY_KWARGS)
 
         Returns:
             pandas DataFrame with results (includes geom column with WKT)
         """
 
-        if shp is None and pt is None:
-            raise ValueError("Inputs must be a shape description or a point and buffer")
-        if (pt is not None and buffer is None) or (buffer is not None and pt is None):
-            raise ValueError("pt and buffer must be given together")
+        with cls._session() as (engine, session):
+            try:
+                qry = cls._area_query(
+                    session, verbose, shp, pt, buffer, crs, geometry,
+                    precision, columns, **kwargs
+                )
 
-        # Convert shapely objects to WKT if needed
-        if shp is not None and hasattr(shp, "wkt"):
-            shp_wkt = shp.wkt
-        elif isinstance(shp, str):
-            shp_wkt = shp
-        else:
-            shp_wkt = None
+                # Execute and convert to GeoDataFrame
+                df = query_to_geopandas(qry, engine)
 
-        if pt is not None:
-            if hasattr(pt, "wkt"):
-                pt_wkt = pt.wkt
-            elif isinstance(pt, str):
-                pt_wkt = pt
-            elif isinstance(pt, (tuple, list)) and len(pt) == 2:
-                # Handle (x, y) tuple format
-                pt_wkt = f"POINT ({pt[0]} {pt[1]})"
-            else:
-                pt_wkt = None
-        else:
-            pt_wkt = None
+            except Exception as e:
+                session.close()
+                LOG.error(f"Failed query for {cls.__name__}")
+                raise e
 
-        # Determine table structure
-        table_name = cls.MODEL.__tablename__
-        needs_site_join = table_name == "layers"
+        return df
 
-        with db_session_with_credentials() as (engine, session):
+    @classmethod
+    def _changes_query(
+        cls, session, token=None, verbose=False, geometry="wkb",
+        precision=None, **kwargs
+    ):
+        """
+        Statement of changes_since
+        """
+        qry = cls._select(verbose, geometry, precision)
+        # The ids are the watermark
+        if "id" not in qry.selected_columns.keys():
+            qry = qry.add_columns(cls.MODEL.id)
+        if token is not None:
+            qry = qry.filter(cls.MODEL.id > token)
+        return cls.extend_qry(
+            qry.order_by(cls.MODEL.id), session=session, **kwargs
+        )
+
+    @classmethod
+    @profiled
+    def changes_since(cls, token=None, verbose=False, geometry="wkb",
+                      precision=None, **kwargs):
+        """
+        Rows loaded after a watermark, in the order they were loaded. Loads
+        replace rows with new ones, so changed data is returned as well.
+        Ids are taken when rows are written, not when they are committed,
+        so a load still running can commit rows below the highest id of the
+        result. Store the lower of committed_token, read before the call,
+        and the highest id of the result as the token of the next call.
+        Use existing_ids to find rows removed since.
+
+        Args:
+            token: Highest id already seen, None for all rows
+            verbose: If True, return denormalized data with related table columns
+            geometry: Shape of the geometry in the result, see from_filter
+            precision: Optional number of decimals of the coordinates
+            kwargs: Filter arguments from ALLOWED_QRY_KWARGS. Use limit to
+                    page through large changes.
+
+        Returns:
+            GeoDataFrame (DataFrame without wkb geometry) with the rows
+            ordered by id
+
+        Example:
+            >>> committed = PointMeasurements.committed_token()
+            >>> new = PointMeasurements.changes_since(token, limit=10000)
+            >>> if committed is not None and len(new):
+            ...     token = min(committed, new["id"].max())
+        """
+        with cls._session() as (engine, session):
             try:
-                # Detect database SRID to avoid transforming indexed column
-                # Query first non-null geometry to determine database SRID
-                if needs_site_join:
-                    srid_qry = (
-                        session.query(func.ST_SRID(Site.geom))
-                        .filter(Site.geom.isnot(None))
-                        .limit(1)
-                    )
-                else:
-                    srid_qry = (
-                        session.query(func.ST_SRID(cls.MODEL.geom))
-                        .filter(cls.MODEL.geom.isnot(None))
-                        .limit(1)
-                    )
-                try:
-                    db_srid_result = session.execute(srid_qry).first()
-                    if not db_srid_result or db_srid_result[0] is None:
-                        # No data in table yet - use input CRS as default
-                        # This allows empty table queries to work
-                        # (will return empty)
-                        LOG.warning(
-                            f"No geometries found in {table_name}, "
-                            f"using input CRS {crs} as default"
-                        )
-                        db_srid = crs
-                    else:
-                        db_srid = db_srid_result[0]
-                        LOG.debug(
-                            f"Detected database SRID: \
-                                 {db_srid} for table {table_name}"
-                        )
-                except Exception as srid_error:
-                    # If SRID detection fails, fall back to input CRS
-                    LOG.warning(
-                        f"SRID detection failed for {table_name}: {srid_error}."
-                        f"Using input CRS {crs} as default"
-                    )
-                    db_srid = crs
-
-                # Build PostGIS search geometry
-                # Transform search geometry to match database SRID for index
-                # usage
-                if pt_wkt:
-                    # Create point in input CRS, buffer it, then transform to
-                    # DB SRID
-                    # Buffer before transform to ensure correct distance units
-                    search_geom = func.ST_Transform(
-                        func.ST_Buffer(
-                            func.ST_GeomFromText(literal(pt_wkt), literal(crs)),
-                            literal(buffer),
-                        ),
-                        literal(db_srid),
-                    )
-                elif shp_wkt:
-                    # Transform shape from input CRS to database SRID
-                    search_geom = func.ST_Transform(
-                        func.ST_GeomFromText(literal(shp_wkt), literal(crs)),
-                        literal(db_srid),
-                    )
-                else:
-                    raise ValueError("Unable to parse geometry input")
+                qry = cls._changes_query(
+                    session, token, verbose, geometry, precision, **kwargs
+                )
+                df = read_frame(qry, session.connection())
+            except Exception as e:
+                session.close()
+                LOG.error(f"Failed query for changes of {cls.__name__}")
+                raise e
+
+        return df
+
+    @classmethod
+    @profiled
+    def existing_ids(cls, **kwargs):
+        """
+        Ids of all rows matching the filters, to remove rows of a local
+        copy that were replaced or deleted in the database
+
+        Args:
+            kwargs: Filter arguments from ALLOWED_QRY_KWARGS
+
+        Returns:
+            numpy array of ids
+        """
+        with cls._session() as (_engine, session):
+            try:
+                qry = cls.extend_qry(
+                    select(cls.MODEL.id), check_size=False, session=session,
+                    **kwargs
+                )
+                ids = session.execute(qry).scalars().all()
+            except Exception as e:
+                session.close()
+                LOG.error(f"Failed query for ids of {cls.__name__}")
+                raise e
+
+        return pd.Series(ids, dtype="int64").to_numpy()
+
+    @classmethod
+    @profiled
+    def committed_token(cls):
+        """
+        Highest id that no rows with a lower id can be committed after, the
+        safe token of changes_since. Only known while no other transaction
+        writes to the table: a writer that started later takes higher ids.
+
+        Returns:
+            Highest id, 0 for an empty table or None while other
+            transactions write to the table
+        """
+        with cls._session() as (_engine, session):
+            try:
+                # Read before checking the writers. A writer holding lower
+                # ids either committed before the check or still writes.
+                highest = session.execute(
+                    select(func.max(cls.MODEL.id))
+                ).scalar()
+                writers = session.execute(
+                    WRITERS_QUERY, {"table": cls.MODEL.__tablename__}
+                ).scalar()
+            except Exception as e:
+                session.close()
+                LOG.error(f"Failed query for the writers of {cls.__name__}")
+                raise e
+
+        if writers:
+            return None
+        return highest or 0
+
+    @classmethod
+    def recorded_writes(cls):
+        """
+        Number of writes recorded in the data_loads table that updated or
+        deleted rows, per table. A local copy only needs to check its rows
+        again when these changed.
+
+        Returns:
+            Dictionary - {"updated": count, "deleted": count} by table name
+        """
+        with cls._session() as (_engine, session):
+            try:
+                rows = session.execute(
+                    select(
+                        DataLoad.table_name,
+                        func.count().filter(DataLoad.updated > 0),
+                        func.count().filter(DataLoad.deleted > 0),
+                    ).group_by(DataLoad.table_name)
+                ).all()
+            except Exception as e:
+                session.close()
+                LOG.error("Failed query for the recorded writes")
+                raise e
+
+        return {
+            table: {"updated": updated, "deleted": deleted}
+            for table, updated, deleted in rows
+        }
+
+    @classmethod
+    def _located_select(cls, verbose=False, geometry="wkb", precision=None):
+        """
+        Select statement of _select joined to the geometry of the rows and
+        that geometry column. Layers are located by their site.
+        """
+        qry = cls._select(verbose, geometry, precision)
+        if cls.MODEL.__tablename__ == "layers":
+            qry = qry.join(cls.MODEL.site)
+            return qry, Site.geom
+        return qry, cls.MODEL.geom
+
+    @classmethod
+    def _areas_query(
+        cls, session, shapes, crs, verbose=False, geometry="wkb",
+        precision=None, **kwargs
+    ):
+        """
+        Statement of from_areas
+        """
+        qry, geom_column = cls._located_select(verbose, geometry, precision)
+        db_srid = cls._detect_srid(session, geom_column, crs)
+        batch = _geometry_batch(shapes.geometry, crs, db_srid)
+
+        qry = qry.add_columns(batch.c.batch_id)
+        qry = qry.join(batch, func.ST_Intersects(geom_column, batch.c.geom))
+
+        return cls.extend_qry(qry, session=session, **kwargs)
+
+    @classmethod
+    @profiled
+    def from_areas(
+        cls, shapes, verbose=False, crs=None, area="area", geometry="wkb",
+        precision=None, **kwargs
+    ):
+        """
+        Get data for the class within many polygons with one query. The
+        polygons are sent as one array parameter and joined to the data
+        with ST_Intersects, using the spatial index.
+
+        Args:
+            shapes: GeoDataFrame or GeoSeries of polygons
+            verbose: If True, return denormalized data with related table columns
+            crs: integer SRID of the shapes. Defaults to the CRS of shapes
+            area: Name of the column with the index of the matched shape
+            geometry: Shape of the geometry in the result, see from_filter
+            precision: Optional number of decimals of the coordinates
+            kwargs: for more filtering or limiting (cls.ALLOWED_QRY_KWARGS)
+
+        Returns:
+            GeoDataFrame with one row per measurement and matched shape.
+            Measurements within several shapes are repeated.
+        """
+        if crs is None:
+            if shapes.crs is None:
+                raise ValueError("shapes have no CRS, pass the crs argument")
+            crs = shapes.crs.to_epsg()
+
+        with cls._session() as (engine, session):
+            try:
+                qry = cls._areas_query(
+                    session, shapes, crs, verbose, geometry, precision,
+                    **kwargs
+                )
+                df = query_to_geopandas(qry, engine)
+            except Exception as e:
+                LOG.error(f"Failed query for {cls.__name__}")
+                raise e
+
+        df.insert(0, area, shapes.index[df.pop("batch_id").to_numpy()])
+        return df
+
+    @staticmethod
+    def _nearest(qry, geom_column, search_geom, k, max_distance=None):
+        """
+        Keep the k rows of a statement closest to a geometry. The rows are
+        ordered with the KNN operator <->, which walks the GiST index of
+        geom_column from the geometry outwards instead of computing all
+        distances. A ``distance`` column is added in units of the SRID of
+        geom_column.
+        """
+        qry = qry.add_columns(
+            func.ST_Distance(geom_column, search_geom).label("distance")
+        )
+        if max_distance is not None:
+            qry = qry.filter(
+                func.ST_DWithin(geom_column, search_geom, max_distance)
+            )
+        return qry.order_by(geom_column.distance_centroid(search_geom)).limit(k)
+
+    @classmethod
+    def _nearest_query(
+        cls, session, pt, k=1, max_distance=None, crs=26912, verbose=False,
+        geometry="wkb", precision=None, **kwargs
+    ):
+        """
+        Statement of nearest
+        """
+        pt_wkt = _point_wkt(pt)
+        if pt_wkt is None:
+            raise ValueError("Unable to parse point input")
+
+        qry, geom_column = cls._located_select(verbose, geometry, precision)
+        db_srid = cls._detect_srid(session, geom_column, crs)
+        search_geom = func.ST_Transform(
+            func.ST_GeomFromText(literal(pt_wkt), literal(crs)),
+            literal(db_srid),
+        )
+        kwargs.pop("limit", None)
+        qry = cls.extend_qry(qry, check_size=False, session=session, **kwargs)
+        return cls._nearest(qry, geom_column, search_geom, k, max_distance)
+
+    @classmethod
+    @profiled
+    def nearest(
+        cls, pt, k=1, max_distance=None, crs=26912, verbose=False,
+        geometry="wkb", precision=None, **kwargs
+    ):
+        """
+        Get the k measurements closest to a point. The search uses the
+        spatial index, so it does not depend on guessing a buffer.
+
+        Args:
+            pt: shapely point, WKT string or (x, y) tuple
+            k: Number of measurements to return
+            max_distance: Optional largest distance, in units of the stored
+                          geometries (meters for UTM)
+            crs: integer SRID/EPSG code of pt (default 26912)
+            verbose: If True, return denormalized data with related table columns
+            geometry: Shape of the geometry in the result, see from_filter
+            precision: Optional number of decimals of the coordinates
+            kwargs: for more filtering (cls.ALLOWED_QRY_KWARGS)
+
+        Returns:
+            GeoDataFrame ordered by the added ``distance`` column
+        """
+        with cls._session() as (engine, session):
+            try:
+                qry = cls._nearest_query(
+                    session, pt, k, max_distance, crs, verbose, geometry,
+                    precision, **kwargs
+                )
+                df = query_to_geopandas(qry, engine)
+            except Exception as e:
+                LOG.error(f"Failed query for {cls.__name__}")
+                raise e
+
+        return df
+
+    @classmethod
+    def _nearest_many_query(
+        cls, session, points, crs, k=1, max_distance=None, verbose=False,
+        geometry="wkb", precision=None, **kwargs
+    ):
+        """
+        Statement of nearest_many
+        """
+        qry, geom_column = cls._located_select(verbose, geometry, precision)
+        db_srid = cls._detect_srid(session, geom_column, crs)
+        batch = _point_batch(
+            points.geometry.x.tolist(), points.geometry.y.tolist(),
+            crs, db_srid, name="origins"
+        )
+        kwargs.pop("limit", None)
+        qry = cls.extend_qry(qry, check_size=False, session=session, **kwargs)
+        nearest = cls._nearest(
+            qry, geom_column, batch.c.geom, k, max_distance
+        ).lateral("nearest")
+
+        return (
+            select(batch.c.batch_id, nearest)
+            .select_from(batch)
+            .join(nearest, true())
+            .order_by(batch.c.batch_id, nearest.c.distance)
+        )
 
-                # Build select clause (handles verbose mode)
-                select_clause = (
-                    cls._build_select_clause(verbose)
-                    if hasattr(cls, "_build_select_clause")
-                    else [cls.MODEL]
-                )
-                qry = session.query(*select_clause)
-
-                # Add explicit joins for verbose mode to avoid
-                # cartesian products
-                if verbose and hasattr(cls, "_add_verbose_joins"):
-                    qry = cls._add_verbose_joins(qry)
-                elif hasattr(cls, "_add_base_joins"):
-                    # For verbose=False, still need basic joins
-                    # (e.g., Site for geom)
-                    qry = cls._add_base_joins(qry)
-
-                # Add spatial filter
-                if needs_site_join:
-                    # For LayerData, join to Site for geometry
-                    # SQLAlchemy handles duplicate joins from _add_*_joins above
-                    qry = qry.join(cls.MODEL.site)
-                    qry = qry.filter(func.ST_Intersects(Site.geom, search_geom))
-                else:
-                    # For PointData, use direct geometry column
-                    qry = qry.filter(func.ST_Intersects(cls.MODEL.geom, search_geom))
+    @classmethod
+    @profiled
+    def nearest_many(
+        cls, points, k=1, max_distance=None, crs=None, verbose=False,
+        origin="origin", geometry="wkb", precision=None, **kwargs
+    ):
+        """
+        Get the k measurements closest to each of many points with one
+        query. The points are sent as array parameters and searched with
+        a LATERAL join, each with the spatial index like nearest.
 
-                # Add standard filters using existing extend_qry
-                # This handles type, instrument, campaign, date ranges, etc.
-                qry = cls.extend_qry(qry, **kwargs)
+        Args:
+            points: GeoDataFrame or GeoSeries of points
+            k: Number of measurements per point
+            max_distance: Optional largest distance, in units of the stored
+                          geometries (meters for UTM)
+            crs: integer SRID of the points. Defaults to the CRS of points
+            verbose: If True, return denormalized data with related table columns
+            origin: Name of the column with the index of the searched point
+            geometry: Shape of the geometry in the result, see from_filter
+            precision: Optional number of decimals of the coordinates
+            kwargs: for more filtering (cls.ALLOWED_QRY_KWARGS)
 
-                # Execute and convert to GeoDataFrame
-                df = query_to_geopandas(qry, engine)
+        Returns:
+            GeoDataFrame with up to k rows per point, ordered by point and
+            ``distance``
+        """
+        if crs is None:
+            if points.crs is None:
+                raise ValueError("points have no CRS, pass the crs argument")
+            crs = points.crs.to_epsg()
 
+        with cls._session() as (engine, session):
+            try:
+                qry = cls._nearest_many_query(
+                    session, points, crs, k, max_distance, verbose, geometry,
+                    precision, **kwargs
+                )
+                df = query_to_geopandas(qry, engine)
             except Exception as e:
-                session.close()
                 LOG.error(f"Failed query for {cls.__name__}")
                 raise e
 
+        df.insert(0, origin, points.index[df.pop("batch_id").to_numpy()])
         return df
 
     @property
@@ -505,7 +1499,7 @@ class BaseDataset:
         """
         Return all campaign names
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(Campaign.name).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -515,7 +1509,7 @@ class BaseDataset:
         """
         Return all types of the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(MeasurementType.name).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -525,7 +1519,7 @@ class BaseDataset:
         """
         Return all distinct dates in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(self.MODEL.date).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -535,7 +1529,7 @@ class BaseDataset:
         """
         Return all distinct observers in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(Observer.name).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -545,7 +1539,7 @@ class BaseDataset:
         """
         Return all distinct DOIs in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(DOI.doi).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -555,7 +1549,7 @@ class BaseDataset:
         """
         Return all distinct units in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             qry = session.query(self.MODEL.units).distinct()
             result = qry.all()
         return self.retrieve_single_value_result(result)
@@ -565,7 +1559,7 @@ class BaseDataset:
         """
         Return all distinct instruments in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             # Use EXISTS for better performance on large datasets
             # (29GB+ tables)
             qry = session.query(Instrument.name).filter(
@@ -634,43 +1628,145 @@ class PointMeasurements(BaseDataset):
         return qry
 
     @classmethod
-    def _filter_campaign(cls, qry, value):
-        return (
-            qry.join(cls.MODEL.observation)
-            .join(PointObservation.campaign)
-            .filter(Campaign.name == value)
-        )
+    def _table_joins(cls):
+        """
+        Points link to their lookups through the observation, except for
+        the measurement type
+        """
+        observation = cls.MODEL.observation
+        return {
+            CampaignObservation.__tablename__: [observation],
+            MeasurementType.__tablename__: [cls.MODEL.measurement_type],
+            Instrument.__tablename__: [
+                observation, PointObservation.instrument
+            ],
+            Campaign.__tablename__: [observation, PointObservation.campaign],
+            Observer.__tablename__: [observation, PointObservation.observer],
+        }
 
     @classmethod
-    def _filter_instrument(cls, qry, value):
-        return (
-            qry.join(cls.MODEL.observation)
-            .join(PointObservation.instrument)
-            .filter(Instrument.name == value)
-        )
+    def _aggregate_groups(cls):
+        """
+        Columns to group aggregates by and the relationships they need
+        joined
+        """
+        return {
+            "date": (
+                cast(cls.MODEL.datetime, Date), []
+            ),
+            "type": (
+                MeasurementType.name, [cls.MODEL.measurement_type]
+            ),
+            "units": (
+                MeasurementType.units, [cls.MODEL.measurement_type]
+            ),
+            "observation": (
+                PointObservation.name, [cls.MODEL.observation]
+            ),
+            "instrument": (
+                Instrument.name,
+                [cls.MODEL.observation, PointObservation.instrument]
+            ),
+            "campaign": (
+                Campaign.name,
+                [cls.MODEL.observation, PointObservation.campaign]
+            ),
+            "observer": (
+                Observer.name,
+                [cls.MODEL.observation, PointObservation.observer]
+            ),
+        }
 
     @classmethod
-    def _filter_doi(cls, qry, value):
-        return (
-            qry.join(cls.MODEL.observation)
-            .join(PointObservation.doi)
-            .filter(DOI.doi == value)
-        )
+    def _aggregate_query(
+        cls, session, grid=None, by=(), stats=("count", "mean"), **kwargs
+    ):
+        """
+        Statement of aggregate
+        """
+        unknown = [stat for stat in stats if stat not in AGGREGATE_STATS]
+        if unknown:
+            raise ValueError(
+                f"Unknown statistics {unknown}. Use any of "
+                f"{list(AGGREGATE_STATS)}"
+            )
+        groups = cls._aggregate_groups()
+        unknown = [column for column in by if column not in groups]
+        if unknown:
+            raise ValueError(
+                f"Cannot group by {unknown}. Use any of {list(groups)}"
+            )
+
+        keys = [groups[column][0].label(column) for column in by]
+        columns = list(keys)
+        if grid is not None:
+            grid = float(grid)
+            # Cells have their lower left corner on multiples of grid
+            center = func.ST_SnapToGrid(
+                cls.MODEL.geom, grid / 2, grid / 2, grid, grid
+            )
+            keys.append(center)
+            columns.append(func.ST_Expand(center, grid / 2).label("geom"))
+        columns += [
+            AGGREGATE_STATS[stat](cls.MODEL.value).label(stat)
+            for stat in stats
+        ]
+
+        qry = select(*columns).select_from(cls.MODEL)
+        for column in by:
+            for relationship in groups[column][1]:
+                qry = qry.join(relationship)
+        qry = cls.extend_qry(qry, check_size=False, session=session, **kwargs)
+
+        return qry.group_by(*keys).order_by(*keys)
 
     @classmethod
-    def _filter_observers(cls, qry, value):
-        return (
-            qry.join(cls.MODEL.observation)
-            .join(PointObservation.observer)
-            .filter(Observer.name == value)
-        )
+    @profiled
+    def aggregate(cls, grid=None, by=None, stats=("count", "mean"), **kwargs):
+        """
+        Summarize the point values in the database, so only the aggregates
+        are transferred instead of every point.
+
+        Args:
+            grid: Optional cell size in units of the stored geometries
+                  (meters for UTM). Values are summarized per square cell
+                  with the lower left corner on a multiple of grid.
+            by: Optional list of columns to group by. Any of date, type,
+                units, observation, instrument, campaign and observer
+            stats: Statistics of the values. Any of the keys of
+                   AGGREGATE_STATS
+            kwargs: for more filtering (cls.ALLOWED_QRY_KWARGS)
+
+        Returns:
+            GeoDataFrame with the cell polygons in ``geom`` when grid is
+            given, DataFrame otherwise. One row per group with one column
+            per group key and statistic.
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        stats = list(stats)
+
+        with cls._session() as (engine, session):
+            try:
+                qry = cls._aggregate_query(
+                    session, grid, by, stats, **kwargs
+                )
+                if grid is None:
+                    with engine.connect() as connection:
+                        df = pd.read_sql(qry, connection)
+                else:
+                    df = query_to_geopandas(qry, engine)
+            except Exception as e:
+                LOG.error(f"Failed query for {cls.__name__}")
+                raise e
+
+        return df
 
     @property
     def all_types(self):
         """
         Return all measurement types that have data in the points table
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             # Use EXISTS for better performance on large points table
             qry = session.query(MeasurementType.name).filter(
                 exists().where(PointData.measurement_type_id == MeasurementType.id)
@@ -683,7 +1779,7 @@ class PointMeasurements(BaseDataset):
         """
         Return all distinct instruments in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             result = (
                 session.query(Instrument.name)
                 .filter(
@@ -726,16 +1822,34 @@ class LayerMeasurements(BaseDataset):
     ]
 
     @classmethod
-    def _filter_campaign(cls, qry, v):
-        return qry.join(cls.MODEL.site).join(Site.campaign).filter(Campaign.name == v)
+    def _lookup_filter(cls, session, lookup, ids):
+        """
+        Layers link to the instrument directly and to the campaign, DOI and
+        observers through their site
+        """
+        if lookup == "type":
+            return cls.MODEL.measurement_type_id.in_(ids)
+        elif lookup == "instrument":
+            return cls.MODEL.instrument_id.in_(ids)
+        elif lookup == "observer":
+            statement = select(SiteObservers.site_id).where(
+                SiteObservers.observer_id.in_(ids)
+            )
+        else:
+            column = Site.campaign_id if lookup == "campaign" else Site.doi_id
+            statement = select(Site.id).where(column.in_(ids))
 
-    @classmethod
-    def _filter_observers(cls, qry, v):
-        return qry.join(cls.MODEL.site).join(Site.observers).filter(Observer.name == v)
+        return cls.MODEL.site_id.in_(cls._ids(session, statement))
 
     @classmethod
-    def _filter_doi(cls, qry, value):
-        return qry.join(cls.MODEL.site).join(Site.doi).filter(DOI.doi == value)
+    def _date_filter(cls, session, key, day):
+        """
+        Layers are dated by their site, dates are resolved to site ids
+        """
+        statement = select(Site.id).where(
+            _datetime_filter(Site.datetime, key, day)
+        )
+        return cls.MODEL.site_id.in_(cls._ids(session, statement))
 
     @classmethod
     def _build_select_clause(cls, verbose=False):
@@ -778,7 +1892,6 @@ class LayerMeasurements(BaseDataset):
                 Instrument.name.label("instrument_name"),
                 Instrument.model.label("instrument_model"),
                 Instrument.specifications.label("instrument_specifications"),
-                func.ST_AsText(Site.geom).label("geom_wkt"),
             ]
         else:
             # Return only core columns from layers table plus geom for geopandas
@@ -790,6 +1903,17 @@ class LayerMeasurements(BaseDataset):
                 Site.geom,  # Required for GeoDataFrame
             ]
 
+    @classmethod
+    def _table_joins(cls):
+        """
+        Layers link to their site, measurement type and instrument
+        """
+        return {
+            Site.__tablename__: [cls.MODEL.site],
+            MeasurementType.__tablename__: [cls.MODEL.measurement_type],
+            Instrument.__tablename__: [cls.MODEL.instrument],
+        }
+
     @classmethod
     def _add_base_joins(cls, qry):
         """
@@ -813,7 +1937,7 @@ class LayerMeasurements(BaseDataset):
         """
         Return all measurement types that have data in the layers table
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             # Use EXISTS for better performance on 208M row table
             qry = session.query(MeasurementType.name).filter(
                 exists().where(LayerData.measurement_type_id == MeasurementType.id)
@@ -826,7 +1950,7 @@ class LayerMeasurements(BaseDataset):
         """
         Return all specific site names
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             result = session.query(Site.name).distinct().all()
         return self.retrieve_single_value_result(result)
 
@@ -835,7 +1959,7 @@ class LayerMeasurements(BaseDataset):
         """
         Return all distinct dates in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             result = session.query(Site.date).distinct().all()
         return self.retrieve_single_value_result(result)
 
@@ -844,11 +1968,12 @@ class LayerMeasurements(BaseDataset):
         """
         Return all distinct units in the data
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             result = session.query(MeasurementType.units).distinct().all()
         return self.retrieve_single_value_result(result)
 
     @classmethod
+    @profiled
     def get_sites(cls, site_names=None, **kwargs):
         """
         Get site information including geometries.
@@ -860,8 +1985,8 @@ class LayerMeasurements(BaseDataset):
         Returns:
             GeoDataFrame with site information
         """
-        with db_session_with_credentials() as (engine, session):
-            qry = session.query(
+        with cls._session() as (engine, session):
+            qry = select(
                 Site.name, Site.geom, Site.description, Site.datetime
             ).distinct()
             # others can be added
@@ -876,17 +2001,77 @@ class LayerMeasurements(BaseDataset):
 
         return df
 
+    @classmethod
+    @profiled
+    def nearest_sites(cls, pt, k=1, max_distance=None, crs=26912, **kwargs):
+        """
+        Get the k sites closest to a point, see nearest.
+
+        Args:
+            pt: shapely point, WKT string or (x, y) tuple
+            k: Number of sites to return
+            max_distance: Optional largest distance, in units of the stored
+                          geometries (meters for UTM)
+            crs: integer SRID/EPSG code of pt (default 26912)
+            kwargs: Only consider sites with layers matching these filters
+                    (cls.ALLOWED_QRY_KWARGS)
+
+        Returns:
+            GeoDataFrame with site information ordered by the added
+            ``distance`` column
+        """
+        pt_wkt = _point_wkt(pt)
+        if pt_wkt is None:
+            raise ValueError("Unable to parse point input")
+        kwargs.pop("limit", None)
+
+        with cls._session() as (engine, session):
+            try:
+                db_srid = cls._detect_srid(session, Site.geom, crs)
+                search_geom = func.ST_Transform(
+                    func.ST_GeomFromText(literal(pt_wkt), literal(crs)),
+                    literal(db_srid),
+                )
+                qry = select(
+                    Site.name, Site.geom, Site.description, Site.datetime
+                )
+                if kwargs:
+                    site_ids = cls.extend_qry(
+                        select(cls.MODEL.site_id), check_size=False,
+                        session=session, **kwargs
+                    )
+                    qry = qry.filter(Site.id.in_(site_ids))
+                qry = cls._nearest(
+                    qry, Site.geom, search_geom, k, max_distance
+                )
+                df = query_to_geopandas(qry, engine)
+            except Exception as e:
+                LOG.error(f"Failed query for {cls.__name__}")
+                raise e
+
+        return df
+
 
 class RasterMeasurements(BaseDataset):
     MODEL = ImageData
     ALLOWED_QRY_KWARGS = BaseDataset.ALLOWED_QRY_KWARGS + ["description"]
+    # Max number of threads fetching tiles when using tiled retrieval
+    MAX_TILE_WORKERS = 8
+    # Number of example values listed when a query spans several datasets
+    DATASET_CHECK_SAMPLES = 5
+    # Seconds and number of filter sets the single dataset check is cached
+    DATASET_CHECK_TTL = 300
+    DATASET_CHECK_CACHE_SIZE = 128
+    # Outcome of the check by database and filters, with the raster version
+    # it was made on
+    _DATASET_CHECK_CACHE = {}
 
     @property
     def all_types(self):
         """
         Return all measurement types that have data in the images table
         """
-        with db_session_with_credentials() as (_engine, session):
+        with self._session() as (_engine, session):
             result = (
                 session.query(MeasurementType.name)
                 .join(ImageData, ImageData.observation_id == ImageObservation.id)
@@ -898,64 +2083,571 @@ class RasterMeasurements(BaseDataset):
 
     @property
     def all_descriptions(self):
-        with db_session_with_credentials() as (_engine, session):
-            qry = session.query(self.MODEL.description).distinct()
+        with self._session() as (_engine, session):
+            qry = (
+                session.query(ImageObservation.description)
+                .join(ImageData, ImageData.observation_id == ImageObservation.id)
+                .distinct()
+            )
             result = qry.all()
         return self.retrieve_single_value_result(result)
 
+    @classmethod
+    def _dataset_indicators(cls):
+        """
+        Columns that each identify a single raster dataset. More than one
+        distinct value in any of them means a query spans several datasets.
+        """
+        return {
+            "instrument": Instrument.name,
+            "date": ImageObservation.date,
+            "observers": Observer.name,
+            "doi": DOI.doi,
+            "type": MeasurementType.name,
+            "description": ImageObservation.description,
+        }
+
+    @staticmethod
+    def _raster_version(session):
+        """
+        Highest id of the images table and number of writes recorded for it
+        and the observations. Changes with any raster or observation load.
+        """
+        tables = [ImageData.__table__.name, CampaignObservation.__table__.name]
+        return tuple(session.execute(
+            select(
+                select(func.max(ImageData.id)).scalar_subquery(),
+                select(func.count(DataLoad.id))
+                .where(DataLoad.table_name.in_(tables))
+                .scalar_subquery(),
+            )
+        ).one())
+
     @classmethod
     def check_for_single_dataset(cls, **kwargs):
         """
         At the moment there is not a clear path to how to deal with
         multiple rasters so check that the user only requested one
-        dataset
+        dataset. All indicator columns are checked with a single aggregate
+        query and the outcome is cached per database and filter set until
+        rasters or observations are loaded.
+        """
+        key = (cls._cache_source(), _canonical_filters(kwargs))
+        with cls._session() as (_engine, session):
+            try:
+                version = cls._raster_version(session)
+            except Exception as e:
+                session.close()
+                LOG.error("Failed to read the raster version")
+                raise e
+
+            cached = cls._DATASET_CHECK_CACHE.get(key)
+            if cached is not None and cached[1] == version and \
+                    time.monotonic() - cached[0] < cls.DATASET_CHECK_TTL:
+                LOG.debug("Using cached single raster dataset check")
+                if cached[2] is not None:
+                    raise TooManyRastersException(cached[2])
+                return
+
+            result = cls._check_datasets(session, kwargs)
+
+        message = cls._dataset_message(result)
+        # Keep the cache bounded by evicting the oldest entry
+        cls._DATASET_CHECK_CACHE.pop(key, None)
+        if len(cls._DATASET_CHECK_CACHE) >= cls.DATASET_CHECK_CACHE_SIZE:
+            cls._DATASET_CHECK_CACHE.pop(next(iter(cls._DATASET_CHECK_CACHE)))
+        cls._DATASET_CHECK_CACHE[key] = (time.monotonic(), version, message)
+
+        if message is not None:
+            raise TooManyRastersException(message)
+
+    @classmethod
+    def _check_datasets(cls, session, kwargs):
+        """
+        Number of distinct values and example values per indicator column of
+        the rasters matching the filters
         """
         LOG.info("Checking raster query for single raster dataset...")
-        multi_raster_indicators = [
-            "instrument",
-            "date",
-            "observers",
-            "doi",
-            "type",
-            "description",
-        ]
-        with db_session_with_credentials() as (_engine, session):
+        indicators = cls._dataset_indicators()
+        columns = []
+        for column in indicators.values():
+            columns.append(func.count(distinct(column)))
+            columns.append(
+                array_agg(distinct(column))[1:cls.DATASET_CHECK_SAMPLES]
+            )
+
+        filters = {k: v for k, v in kwargs.items() if k != "limit"}
+        try:
+            qry = (
+                session.query(*columns)
+                .select_from(ImageData)
+                .join(ImageData.observation)
+                .join(ImageData.measurement_type)
+                .join(ImageObservation.instrument)
+                .join(ImageObservation.observer)
+                .join(ImageObservation.doi)
+            )
+            qry = cls.extend_qry(qry, check_size=False, **filters)
+            return qry.one()
+
+        except Exception as e:
+            session.close()
+            LOG.error("Failed query for Raster Data")
+            raise e
+
+    @classmethod
+    def _dataset_message(cls, result):
+        """
+        Error message naming the first indicator column spanning several
+        raster datasets, None for a single dataset
+        """
+        message = None
+        for i, column in enumerate(cls._dataset_indicators().keys()):
+            count, values = result[2 * i], result[2 * i + 1]
+            if count > 1:
+                options = [f"'{v}'" for v in values]
+                message = (
+                    f"More than one `{column}` suggests "
+                    f"there are multiple raster datasets. "
+                    f"Try filter {column} to one of the "
+                    f"following values {', '.join(options)}."
+                )
+                if count > len(values):
+                    message += f" ({count - len(values)} more not shown)"
+                break
+        return message
+
+    @classmethod
+    @profiled
+    def sample_at(cls, points, crs=None, band=1, column="value", **kwargs):
+        """
+        Sample the raster at many points with a single query. The points are
+        sent to the database once and only one value per point is returned.
+
+        Args:
+            points: GeoDataFrame or GeoSeries of points
+            crs: integer SRID of the points. Defaults to the CRS of points
+            band: Raster band to sample
+            column: Name of the column holding the sampled values
+            kwargs: Filters from cls.ALLOWED_QRY_KWARGS
+
+        Returns:
+            Copy of points with the sampled values added. Points outside of
+            the raster or on nodata pixels are NaN.
+        """
+        if crs is None:
+            if points.crs is None:
+                raise ValueError("points have no CRS, pass the crs argument")
+            crs = points.crs.to_epsg()
+
+        cls.check_for_single_dataset(**kwargs)
+        kwargs.pop("limit", None)
+
+        with cls._session() as (_engine, session):
             try:
-                # Form query and check if the query spans
-                # multiple rasters
-                for column in multi_raster_indicators:
-                    values = cls.from_unique_entries([column], **kwargs)
-                    if len(values) > 1:
-                        options = [f"'{v}'" for v in values]
-                        raise TooManyRastersException(
-                            f"More than one `{column}` suggests "
-                            f"there are multiple raster datasets. "
-                            f"Try filter {column} to one of the "
-                            f"following values {', '.join(options)}."
-                        )
+                db_srid = cls._detect_srid(session, cls.MODEL.raster, crs)
+                batch = _point_batch(
+                    points.geometry.x.tolist(), points.geometry.y.tolist(),
+                    crs, db_srid
+                )
+
+                # A point on a tile edge intersects two tiles holding the
+                # same value, hence the aggregate.
+                qry = (
+                    select(
+                        batch.c.batch_id,
+                        func.max(
+                            func.ST_Value(cls.MODEL.raster, band, batch.c.geom)
+                        ),
+                    )
+                    .select_from(batch)
+                    .join(
+                        cls.MODEL,
+                        func.ST_Intersects(cls.MODEL.raster, batch.c.geom)
+                    )
+                    .group_by(batch.c.batch_id)
+                )
+                qry = cls.extend_qry(
+                    qry, check_size=False, session=session, **kwargs
+                )
+                rows = session.execute(qry).all()
+
+            except Exception as e:
+                session.close()
+                LOG.error("Failed query for Raster Data")
+                raise e
+
+        values = pd.Series(
+            [row[1] for row in rows], index=[row[0] for row in rows],
+            dtype="float64"
+        )
+        # Samples are always returned as a GeoDataFrame
+        if hasattr(points, "to_frame"):
+            result = points.to_frame()
+        else:
+            result = points.copy()
+        result[column] = values.reindex(range(len(points))).to_numpy()
+
+        return result
+
+    @classmethod
+    @profiled
+    def zonal_stats(
+        cls, shapes, stats=("count", "mean", "min", "max"), crs=None, band=1,
+        **kwargs
+    ):
+        """
+        Compute raster statistics within many polygons in one query. Tiles
+        are clipped and summarized in the database so only the statistics
+        are returned.
+
+        Args:
+            shapes: GeoDataFrame or GeoSeries of polygons
+            stats: Statistics to compute. Any of count, sum, mean, stddev,
+                   min and max
+            crs: integer SRID of the shapes. Defaults to the CRS of shapes
+            band: Raster band to summarize
+            kwargs: Filters from cls.ALLOWED_QRY_KWARGS
+
+        Returns:
+            pandas DataFrame with one row per shape and one column per
+            statistic, using the index of shapes
+        """
+        stats = list(stats)
+        unknown = [s for s in stats if s not in SummaryStats.typemap]
+        if unknown:
+            raise ValueError(
+                f"Unknown statistics {unknown}. Use any of "
+                f"{list(SummaryStats.typemap)}"
+            )
+
+        if crs is None:
+            if shapes.crs is None:
+                raise ValueError("shapes have no CRS, pass the crs argument")
+            crs = shapes.crs.to_epsg()
+
+        cls.check_for_single_dataset(**kwargs)
+        kwargs.pop("limit", None)
+
+        with cls._session() as (_engine, session):
+            try:
+                db_srid = cls._detect_srid(session, cls.MODEL.raster, crs)
+                batch = _geometry_batch(shapes.geometry, crs, db_srid)
+
+                summary = func.ST_SummaryStatsAgg(
+                    func.ST_Clip(cls.MODEL.raster, band, batch.c.geom, True),
+                    band,
+                    True,
+                )
+                qry = (
+                    select(
+                        batch.c.batch_id,
+                        *[getattr(summary, stat).label(stat) for stat in stats]
+                    )
+                    .select_from(batch)
+                    .join(
+                        cls.MODEL,
+                        func.ST_Intersects(cls.MODEL.raster, batch.c.geom)
+                    )
+                    .group_by(batch.c.batch_id)
+                )
+                qry = cls.extend_qry(
+                    qry, check_size=False, session=session, **kwargs
+                )
+                rows = session.execute(qry).all()
 
             except Exception as e:
                 session.close()
                 LOG.error("Failed query for Raster Data")
                 raise e
 
+        df = pd.DataFrame(
+            [tuple(row) for row in rows], columns=["batch_id", *stats]
+        )
+        df = df.set_index("batch_id").reindex(range(len(shapes)))
+        df.index = shapes.index
+        if "count" in stats:
+            df["count"] = df["count"].fillna(0).astype(int)
+
+        return df
+
+    @staticmethod
+    def _raster_column(factor=None):
+        """
+        Raster column holding the full resolution tiles or the tiles of an
+        overview factor
+        """
+        return ImageData.raster if factor is None else ImageOverview.raster
+
+    @staticmethod
+    def _join_overview(qry, factor=None):
+        """
+        Join the overview tiles of a factor to a query on the images table
+        """
+        if factor is None:
+            return qry
+        return qry.select_from(ImageData).join(
+            ImageOverview,
+            and_(
+                ImageOverview.image_id == ImageData.id,
+                ImageOverview.factor == factor,
+            ),
+        )
+
+    @staticmethod
+    def _geometry_bounds(session, search_geom):
+        """
+        Bounds (xmin, ymin, xmax, ymax) of a PostGIS geometry expression
+        """
+        return tuple(
+            session.query(
+                func.ST_XMin(search_geom),
+                func.ST_YMin(search_geom),
+                func.ST_XMax(search_geom),
+                func.ST_YMax(search_geom),
+            ).one()
+        )
+
+    @classmethod
+    def _select_overview(
+        cls, session, resolution=None, max_pixels=None, search_geom=None,
+        **kwargs
+    ):
+        """
+        Find the coarsest overview satisfying the requested resolution or
+        the smallest overview within a pixel budget.
+
+        Args:
+            session: SQLAlchemy session
+            resolution: Requested pixel size in units of the raster SRID
+            max_pixels: Max number of pixels of the returned raster
+            search_geom: Optional PostGIS geometry limiting the extent
+            kwargs: Filters from cls.ALLOWED_QRY_KWARGS
+
+        Returns:
+            Integer overview factor or None for full resolution
+        """
+        if resolution is None and max_pixels is None:
+            return None
+
+        raster = ImageData.raster
+        kwargs.pop("limit", None)
+
+        def matching(qry):
+            if search_geom is not None:
+                qry = qry.filter(func.ST_Intersects(raster, search_geom))
+            return cls.extend_qry(qry, check_size=False, **kwargs)
+
+        extent = func.ST_Extent(func.ST_Envelope(raster))
+        images, scale, xmin, ymin, xmax, ymax = matching(
+            session.query(
+                func.count(ImageData.id),
+                func.max(func.abs(func.ST_ScaleX(raster))),
+                func.ST_XMin(extent),
+                func.ST_YMin(extent),
+                func.ST_XMax(extent),
+                func.ST_YMax(extent),
+            )
+        ).one()
+
+        if scale is None:
+            return None
+
+        # Only factors every matching image has an overview for, others
+        # would leave out the images loaded after the overviews were built
+        factors = sorted(
+            factor for factor, count in matching(
+                session.query(
+                    ImageOverview.factor,
+                    func.count(distinct(ImageOverview.image_id)),
+                )
+                .select_from(ImageData)
+                .join(ImageOverview, ImageOverview.image_id == ImageData.id)
+                .group_by(ImageOverview.factor)
+            ).all()
+            if count == images
+        )
+        if not factors:
+            LOG.warning(
+                "No raster overviews for all matching images, using full "
+                "resolution"
+            )
+            return None
+
+        if resolution is not None:
+            # Allow for floating point noise in the stored scales
+            candidates = [f for f in factors if scale * f <= resolution * 1.000001]
+            factor = max(candidates) if candidates else None
+        else:
+            if search_geom is not None:
+                bxmin, bymin, bxmax, bymax = cls._geometry_bounds(
+                    session, search_geom
+                )
+                xmin, ymin = max(xmin, bxmin), max(ymin, bymin)
+                xmax, ymax = min(xmax, bxmax), min(ymax, bymax)
+
+            pixels = ((xmax - xmin) / scale) * ((ymax - ymin) / scale)
+            factor = None
+            if pixels > max_pixels:
+                candidates = [f for f in factors if pixels / f ** 2 <= max_pixels]
+                factor = min(candidates) if candidates else max(factors)
+
+        LOG.info(f"Using raster overview factor {factor}")
+        return factor
+
+    @classmethod
+    def _tile_info(cls, session, search_geom=None, factor=None, **kwargs):
+        """
+        Query the georeferencing of every tile matching the filters. Only
+        the raster metadata is transferred, no pixels.
+
+        Args:
+            session: SQLAlchemy session
+            search_geom: Optional PostGIS geometry the tiles must intersect
+            factor: Overview factor or None for full resolution tiles
+            kwargs: Filters from cls.ALLOWED_QRY_KWARGS
+
+        Returns:
+            List of :py:class:`snowexsql.raster_tiles.TileInfo`
+        """
+        from snowexsql.raster_tiles import TileInfo
+
+        raster = cls._raster_column(factor)
+        qry = session.query(
+            raster.class_.id,
+            func.ST_UpperLeftX(raster),
+            func.ST_UpperLeftY(raster),
+            func.ST_Width(raster),
+            func.ST_Height(raster),
+            func.ST_ScaleX(raster),
+            func.ST_ScaleY(raster),
+            func.ST_SRID(raster),
+            func.ST_NumBands(raster),
+            func.ST_BandPixelType(raster, 1),
+            func.ST_BandNoDataValue(raster, 1),
+        )
+        qry = cls._join_overview(qry, factor)
+        if search_geom is not None:
+            qry = qry.filter(func.ST_Intersects(raster, search_geom))
+
+        qry = cls.extend_qry(qry, check_size=False, **kwargs)
+
+        return [TileInfo(*row) for row in qry.all()]
+
+    @classmethod
+    def _stream_tiles(
+        cls, engine, session, search_geom=None, out_path=None, workers=None,
+        factor=None, **kwargs
+    ):
+        """
+        Fetch all tiles matching the filters individually and mosaic them on
+        the client.
+
+        Args:
+            engine: SQLAlchemy engine used by the worker threads
+            session: SQLAlchemy session to find the tiles with
+            search_geom: Optional PostGIS geometry to clip the tiles with
+            out_path: Optional path to write the mosaic as GeoTIFF
+            workers: Number of threads fetching tiles
+            factor: Overview factor or None for full resolution tiles
+            kwargs: Filters from cls.ALLOWED_QRY_KWARGS
+
+        Returns:
+            rasterio dataset of the mosaic
+        """
+        try:
+            from snowexsql.raster_tiles import mosaic_tiles
+        except ImportError:
+            raise ImportError(
+                "Tiled raster retrieval requires rasterio and numpy."
+            )
+
+        # A limit is meaningless when assembling a single raster
+        kwargs.pop("limit", None)
+
+        tiles = cls._tile_info(
+            session, search_geom=search_geom, factor=factor, **kwargs
+        )
+        LOG.info(f"Streaming {len(tiles)} raster tiles")
+
+        raster = cls._raster_column(factor)
+        tile_id = raster.class_.id
+        bounds = None
+        if search_geom is not None:
+            bounds = cls._geometry_bounds(session, search_geom)
+            raster = func.ST_Clip(raster, search_geom, True)
+
+        tile_qry = select(func.ST_AsTiff(raster))
+
+        def fetch_tile(tile):
+            # Each worker checks out its own pooled connection
+            with engine.connect() as connection:
+                return connection.execute(
+                    tile_qry.where(tile_id == tile.id)
+                ).scalar()
+
+        return mosaic_tiles(
+            fetch_tile,
+            tiles,
+            bounds=bounds,
+            out_path=out_path,
+            max_workers=workers or cls.MAX_TILE_WORKERS,
+        )
+
     @classmethod
-    def from_filter(cls, **kwargs):
+    @profiled
+    def from_filter(
+        cls, tiled=False, out_path=None, workers=None, resolution=None,
+        max_pixels=None, **kwargs
+    ):
         """
         Get data for the class by filtering by allowed arguments.
         The allowed filters are cls.ALLOWED_QRY_KWARGS.
+
+        Args:
+            tiled: If True, fetch the tiles individually and mosaic them on
+                   the client instead of a server-side ST_Union
+            out_path: Optional GeoTIFF path to write a tiled mosaic to
+            workers: Number of threads fetching tiles in tiled mode
+            resolution: Coarsest acceptable pixel size in units of the raster
+                        SRID. Selects the matching overview.
+            max_pixels: Max number of pixels of the returned raster. Selects
+                        the finest overview within that budget.
+            kwargs: Filter arguments from ALLOWED_QRY_KWARGS
         """
 
         cls.check_for_single_dataset(**kwargs)
 
-        with db_session_with_credentials() as (_engine, session):
+        if tiled:
+            with cls._session() as (engine, session):
+                try:
+                    factor = cls._select_overview(
+                        session, resolution=resolution, max_pixels=max_pixels,
+                        **kwargs
+                    )
+                    dataset = cls._stream_tiles(
+                        engine, session, out_path=out_path, workers=workers,
+                        factor=factor, **kwargs
+                    )
+                except Exception as e:
+                    LOG.error("Failed query for Raster Data")
+                    raise e
+
+            return [dataset]
+
+        with cls._session() as (_engine, session):
             try:
+                factor = cls._select_overview(
+                    session, resolution=resolution, max_pixels=max_pixels,
+                    **kwargs
+                )
                 # Rebuild the query and form the raster
-                base_query = cls.MODEL.raster
+                base_query = cls._raster_column(factor)
 
                 qry = session.query(
                     func.ST_AsTiff(func.ST_Union(base_query, type_=Raster))
                 )
+                qry = cls._join_overview(qry, factor)
                 qry = cls.extend_qry(qry, **kwargs)
                 rasters = qry.all()
 
@@ -969,41 +2661,64 @@ class RasterMeasurements(BaseDataset):
         return datasets
 
     @classmethod
-    def from_area(cls, shp=None, pt=None, buffer=None, crs=26912, **kwargs):
+    @profiled
+    def from_area(
+        cls, shp=None, pt=None, buffer=None, crs=26912, tiled=False,
+        out_path=None, workers=None, resolution=None, max_pixels=None,
+        **kwargs
+    ):
+        """
+        Get the raster clipped to a shape or a buffered point.
+
+        Args:
+            shp: shapely geometry in which to clip, or WKT string
+            pt: shapely point that will have a buffer applied, or WKT string
+            buffer: buffer distance in same units as point
+            crs: integer SRID/EPSG code of shp or pt
+            tiled: If True, fetch and clip the intersecting tiles
+                   individually and mosaic them on the client
+            out_path: Optional GeoTIFF path to write a tiled mosaic to
+            workers: Number of threads fetching tiles in tiled mode
+            resolution: Coarsest acceptable pixel size in units of the raster
+                        SRID. Selects the matching overview.
+            max_pixels: Max number of pixels of the returned raster. Selects
+                        the finest overview within that budget.
+            kwargs: for more filtering (cls.ALLOWED_QRY_KWARGS)
+        """
         if shp is None and pt is None:
             raise ValueError("We need a shape description or a point and buffer")
         if (pt is not None and buffer is None) or (buffer is not None and pt is None):
             raise ValueError("pt and buffer must be given together")
 
-        # Check if geometric operations are available
-        if not HAS_CORE_GIS:
-            raise ImportError(
-                "geoalchemy2 and shapely are required for "
-                "geometric filtering. Install with: "
-                "pip install geoalchemy2 shapely"
-            )
-
-        with db_session_with_credentials() as (_engine, session):
+        with cls._session() as (engine, session):
             try:
                 # Get shape ready for cropping with rasters
-                if shp:
-                    db_shp = from_shape(shp, srid=crs)
-                else:
-                    qry_pt = from_shape(pt)
-                    qry = session.query(
-                        gfunc.ST_SetSRID(func.ST_Buffer(qry_pt, buffer), crs)
+                db_srid = cls._detect_srid(session, cls.MODEL.raster, crs)
+                db_shp = cls._search_geometry(shp, pt, buffer, crs, db_srid)
+
+                factor = cls._select_overview(
+                    session, resolution=resolution, max_pixels=max_pixels,
+                    search_geom=db_shp, **kwargs
+                )
+
+                if tiled:
+                    return cls._stream_tiles(
+                        engine, session, search_geom=db_shp,
+                        out_path=out_path, workers=workers, factor=factor,
+                        **kwargs
                     )
-                    db_shp = qry.all()[0][0]
 
                 # Grab the rasters, union and clip them
+                raster = cls._raster_column(factor)
                 base_query = func.ST_AsTiff(
                     func.ST_Clip(
-                        func.ST_Union(ImageData.raster, type_=Raster), db_shp, True
+                        func.ST_Union(raster, type_=Raster), db_shp, True
                     )
                 )
                 q = session.query(base_query)
+                q = cls._join_overview(q, factor)
                 # Find all the tiles that
-                q = q.filter(gfunc.ST_Intersects(ImageData.raster, db_shp))
+                q = q.filter(func.ST_Intersects(raster, db_shp))
 
                 limit = kwargs.get("limit")
                 if limit:
@@ -0,0 +1,255 @@
+"""
+Module for the opt-in result cache of the API classes.
+
+A :py:class:`ResultCache` keeps the DataFrames returned by the API in memory,
+least recently used first out once the frames take more than a number of
+bytes. Frames can also be written to a directory as (Geo)Parquet files, so
+they outlive the process.
+
+Every result is stored with the data version of its database, see
+:py:meth:`ResultCache.version`. Once new data is loaded the version changes
+and the old results are not used anymore.
+
+Example:
+    >>> from snowexsql import api
+    >>> api.enable_cache(max_bytes=512 * 2**20, directory="~/.snowexsql")
+    >>> api.PointMeasurements.from_filter(type='depth', limit=100)
+
+The Parquet files require pyarrow.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+# Bytes of the frames kept in memory
+DEFAULT_MAX_BYTES = 256 * 2**20
+# Seconds a data version is used before it is read again
+DEFAULT_VERSION_TTL = 10
+
+
+def _digest(value):
+    """
+    Short file name safe hash of a value
+    """
+    return hashlib.sha256(repr(value).encode()).hexdigest()[:32]
+
+
+def frame_bytes(frame):
+    """
+    Memory used by a DataFrame
+    """
+    return int(frame.memory_usage(deep=True).sum())
+
+
+class ResultCache:
+    """
+    Two tier cache of API results by database, call and data version.
+
+    Args:
+        max_bytes: Memory used by the cached frames before the least
+                   recently used ones are dropped
+        directory: Optional directory for the Parquet files of the results
+        version_ttl: Seconds a data version is used before it is read from
+                     the database again. Results loaded within that time are
+                     seen after it passed.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None,
+                 version_ttl=DEFAULT_VERSION_TTL):
+        self.max_bytes = max_bytes
+        self.directory = None
+        if directory is not None:
+            self.directory = Path(directory).expanduser()
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.version_ttl = version_ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._frames = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"ResultCache({len(self._frames)} frames, {self.bytes} bytes, "
+            f"{self.hits} hits, {self.misses} misses)"
+        )
+
+    def clear(self):
+        """
+        Remove all results and data versions, including the Parquet files
+        """
+        with self._lock:
+            self._frames.clear()
+            self._versions.clear()
+            self.bytes = 0
+        if self.directory is not None:
+            for path in self.directory.iterdir():
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def current_version(self, source):
+        """
+        Data version of a database read within version_ttl or None
+        """
+        with self._lock:
+            known = self._versions.get(source)
+        if known is not None and \
+                time.monotonic() - known[0] < self.version_ttl:
+            return known[1]
+        return None
+
+    def version(self, source, fetch, refresh=False):
+        """
+        Data version of a database. The version is read again with fetch
+        once it is older than version_ttl. When it changed, the results of
+        the old version are removed.
+
+        Args:
+            source: Hashable identifying the database
+            fetch: Function returning the current data version
+            refresh: Read the version with fetch even within version_ttl
+
+        Returns:
+            Data version
+        """
+        now = time.monotonic()
+        with self._lock:
+            known = self._versions.get(source)
+        if not refresh and known is not None and \
+                now - known[0] < self.version_ttl:
+            return known[1]
+
+        version = fetch()
+        with self._lock:
+            self._versions[source] = (now, version)
+            if known is not None and known[1] != version:
+                LOG.info("Data version changed, dropping cached results")
+                for key in [k for k in self._frames if k[0] == source]:
+                    self.bytes -= self._frames.pop(key)[1]
+        if known is not None and known[1] != version:
+            self._remove_files(source, version)
+
+        return version
+
+    def get(self, source, key, version):
+        """
+        Cached result of a call or None
+
+        Args:
+            source: Hashable identifying the database
+            key: Hashable identifying the call
+            version: Data version of the database
+        """
+        entry = (source, key, version)
+        with self._lock:
+            cached = self._frames.get(entry)
+            if cached is not None:
+                self._frames.move_to_end(entry)
+                self.hits += 1
+                return cached[0].copy()
+
+        frame = self._read(source, key, version)
+        with self._lock:
+            if frame is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._keep(entry, frame)
+        return frame.copy()
+
+    def put(self, source, key, version, frame):
+        """
+        Store the result of a call
+
+        Args:
+            source: Hashable identifying the database
+            key: Hashable identifying the call
+            version: Data version the result was read with
+            frame: DataFrame or GeoDataFrame
+        """
+        frame = frame.copy()
+        self._keep((source, key, version), frame)
+        if self.directory is not None:
+            self._write(source, key, version, frame)
+
+    def _keep(self, entry, frame):
+        """
+        Add a frame to the memory tier and drop the least recently used
+        frames over max_bytes
+        """
+        size = frame_bytes(frame)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if entry in self._frames:
+                self.bytes -= self._frames.pop(entry)[1]
+            self._frames[entry] = (frame, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _entry, (_frame, dropped) = self._frames.popitem(last=False)
+                self.bytes -= dropped
+
+    def _version_directory(self, source, version):
+        return self.directory.joinpath(
+            f"{_digest(source)}-{_digest(version)}"
+        )
+
+    def _remove_files(self, source, version):
+        """
+        Remove the Parquet files of other data versions of a database
+        """
+        if self.directory is None:
+            return
+        current = self._version_directory(source, version)
+        for path in self.directory.glob(f"{_digest(source)}-*"):
+            if path != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _read(self, source, key, version):
+        """
+        Result from the Parquet files or None
+        """
+        if self.directory is None:
+            return None
+        directory = self._version_directory(source, version)
+        name = _digest(key)
+        try:
+            path = directory.joinpath(f"{name}.geoparquet")
+            if path.exists():
+                return gpd.read_parquet(path)
+            path = directory.joinpath(f"{name}.parquet")
+            if path.exists():
+                return pd.read_parquet(path)
+        except Exception as e:
+            LOG.warning(f"Could not read cached result {path}: {e}")
+        return None
+
+    def _write(self, source, key, version, frame):
+        """
+        Write a result to a Parquet file. The file is renamed once written
+        so other processes never read a partial file.
+        """
+        directory = self._version_directory(source, version)
+        suffix = "geoparquet" if isinstance(frame, gpd.GeoDataFrame) \
+            else "parquet"
+        path = directory.joinpath(f"{_digest(key)}.{suffix}")
+        partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            frame.to_parquet(partial)
+            os.replace(partial, path)
+        except Exception as e:
+            LOG.warning(f"Could not write cached result {path}: {e}")
+            partial.unlink(missing_ok=True)
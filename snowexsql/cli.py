@@ -0,0 +1,253 @@
+"""
+Command line interface for database administrators, available as
+``snowexsql`` after installing the package.
+"""
+import argparse
+import logging
+
+from snowexsql.db import Database, get_db
+from snowexsql.maintenance import GEOHASH_PRECISION
+
+LOG = logging.getLogger(__name__)
+
+
+def ingest(args):
+    """
+    Load a directory of SnowEx files
+    """
+    from snowexsql.ingest import ingest_directory
+
+    engine, session = get_db(args.credentials)
+    session.close()
+    try:
+        summary = ingest_directory(
+            args.directory, engine,
+            doi=args.doi,
+            campaign=args.campaign,
+            observer=args.observer,
+            instrument=args.instrument,
+            timezone=args.timezone,
+            workers=args.workers,
+            replace=not args.append,
+        )
+    finally:
+        engine.dispose()
+
+    print(
+        f"Loaded {summary['files']} files with {summary['layers']} layers "
+        f"and {summary['points']} points"
+    )
+    for upserted in ['sites', 'observations']:
+        report = summary[upserted]
+        print(
+            f"{upserted.capitalize()}: {report['inserted']} inserted, "
+            f"{report['updated']} updated, {report['unchanged']} unchanged"
+        )
+    for path in summary['failed']:
+        print(f"Failed: {path}")
+
+    return 1 if summary['failed'] else 0
+
+
+def cluster(args):
+    """
+    Reorder the points table spatially
+    """
+    from snowexsql.maintenance import cluster_table
+
+    engine, session = get_db(args.credentials)
+    session.close()
+    try:
+        with engine.begin() as connection:
+            count = cluster_table(connection, precision=args.precision)
+    finally:
+        engine.dispose()
+
+    print(f"Clustered {count} tables")
+    return 0
+
+
+def indexes(args):
+    """
+    Print the index report
+    """
+    from snowexsql.maintenance import index_report
+
+    engine, session = get_db(args.credentials)
+    session.close()
+    try:
+        report = index_report(engine)
+    finally:
+        engine.dispose()
+
+    for table in report['tables']:
+        print(
+            f"{table['table']}: {table['rows']} rows, "
+            f"{table['sequential_scans']} sequential and "
+            f"{table['index_scans']} index scans"
+        )
+        if table['advice']:
+            print(f"  {table['advice']}")
+    for index in report['indexes']:
+        print(
+            f"{index['index']} ({index['method']}): {index['scans']} scans, "
+            f"{index['size'] / 1024 ** 2:.1f} MB"
+        )
+        if index['advice']:
+            print(f"  {index['advice']}")
+
+    return 0
+
+
+def sync(args):
+    """
+    Update a local GeoParquet mirror of the point and layer data
+    """
+    from snowexsql.sync import sync_mirror
+
+    filters = {
+        key: value for key, value in [
+            ('campaign', args.campaign),
+            ('type', args.type),
+            ('instrument', args.instrument),
+            ('observer', args.observer),
+            ('doi', args.doi),
+            ('date_greater_equal', args.since),
+        ] if value
+    }
+    database = Database(args.credentials)
+    try:
+        summary = sync_mirror(
+            args.directory, args.datasets, filters, database=database,
+            page_size=args.page_size, prune=args.prune
+        )
+    finally:
+        database.dispose()
+
+    for name, report in summary.items():
+        print(
+            f"{name.capitalize()}: {report['added']} added, "
+            f"{report['removed']} removed, {report['rows']} rows in mirror"
+        )
+
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='snowexsql', description='Manage the SnowEx database'
+    )
+    parser.add_argument(
+        '--credentials',
+        help='Path to a credentials file. Defaults to the '
+             'SNOWEX_DB_CREDENTIALS or SNOWEX_DB_CONNECTION environment '
+             'variables'
+    )
+    parser.add_argument(
+        '--verbose', '-v', action='store_true', help='Show debug messages'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_ingest = commands.add_parser(
+        'ingest', help='Load all SnowEx files in a directory'
+    )
+    parser_ingest.add_argument('directory', help='Directory with the files')
+    parser_ingest.add_argument(
+        '--doi', required=True, help='DOI of the data'
+    )
+    parser_ingest.add_argument(
+        '--campaign',
+        help='Campaign name, required for files that do not state one'
+    )
+    parser_ingest.add_argument(
+        '--observer', help='Observer for files that do not state one'
+    )
+    parser_ingest.add_argument(
+        '--instrument', help='Instrument for files that do not state one'
+    )
+    parser_ingest.add_argument(
+        '--timezone', default='UTC',
+        help='Timezone of local dates in the files (default: UTC)'
+    )
+    parser_ingest.add_argument(
+        '--workers', type=int,
+        help='Number of parsing processes (default: number of CPUs)'
+    )
+    parser_ingest.add_argument(
+        '--append', action='store_true',
+        help='Keep data loaded before for the same sites and observations '
+             'instead of replacing it'
+    )
+    parser_ingest.set_defaults(func=ingest)
+
+    parser_cluster = commands.add_parser(
+        'cluster',
+        help='Store the points in spatial order and add block range indexes'
+    )
+    parser_cluster.add_argument(
+        '--precision', type=int, default=GEOHASH_PRECISION,
+        help=f'Geohash length of the sort key (default: {GEOHASH_PRECISION})'
+    )
+    parser_cluster.set_defaults(func=cluster)
+
+    parser_indexes = commands.add_parser(
+        'indexes', help='Report the use of the data tables and indexes'
+    )
+    parser_indexes.set_defaults(func=indexes)
+
+    parser_sync = commands.add_parser(
+        'sync',
+        help='Download the data loaded since the last sync to a local '
+             'GeoParquet mirror'
+    )
+    parser_sync.add_argument('directory', help='Directory of the mirror')
+    parser_sync.add_argument(
+        '--datasets', nargs='+', choices=['points', 'layers'],
+        default=['points', 'layers'], help='Data to mirror (default: all)'
+    )
+    parser_sync.add_argument(
+        '--campaign', action='append', help='Campaign to mirror, repeatable'
+    )
+    parser_sync.add_argument(
+        '--type', action='append',
+        help='Measurement type to mirror, repeatable'
+    )
+    parser_sync.add_argument(
+        '--instrument', action='append',
+        help='Instrument to mirror, repeatable'
+    )
+    parser_sync.add_argument(
+        '--observer', action='append', help='Observer to mirror, repeatable'
+    )
+    parser_sync.add_argument(
+        '--doi', action='append', help='DOI to mirror, repeatable'
+    )
+    parser_sync.add_argument(
+        '--since', help='Only mirror data measured on or after a date '
+                        '(YYYY-MM-DD)'
+    )
+    parser_sync.add_argument(
+        '--page-size', type=int, default=50_000,
+        help='Rows downloaded per query (default: 50000)'
+    )
+    parser_sync.add_argument(
+        '--prune', action='store_true',
+        help='Check all ids of the mirror for deleted rows, also when no '
+             'deletes were recorded'
+    )
+    parser_sync.set_defaults(func=sync)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
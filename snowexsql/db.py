@@ -1,29 +1,185 @@
 """
 This module handles loading the database connection information and creating
-a session.
+a session. It also has the hooks to profile the statements sent to the
+database.
 """
 
+import functools
+import itertools
 import json
+import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
 
+from snowexsql.lookups import LookupResolver
+from snowexsql.tables import LayerData, PointData
 from snowexsql.tables.base import Base
-from sqlalchemy import MetaData, create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import (
+    Engine, MetaData, PrimaryKeyConstraint, create_engine, event, text
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker
+
+LOG = logging.getLogger(__name__)
 
 # This library requires a postgres dialect and the psycopg2 driver
 DB_CONNECTION_PROTOCOL = "postgresql+psycopg2://"
 # Always create a Session in UTC time
 DB_CONNECTION_OPTIONS = {"options": "-c timezone=UTC"}
-
-
-def initialize(engine):
+# Server side prepared statements need the psycopg 3 driver,
+# ``pip install snowexsql[prepared]``, which prepares a statement once it
+# ran this many times on a connection
+PREPARED_CONNECTION_PROTOCOL = "postgresql+psycopg://"
+PREPARE_THRESHOLD = 5
+
+# Engines shared by all sessions of the process, so their connection pools
+# and compiled statement caches are reused between API calls
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+# Strategies to pick a read replica, see ReplicaRouter
+REPLICA_STRATEGIES = ("round_robin", "least_loaded")
+# Seconds a replica that failed is skipped, doubled with every failure in
+# a row up to the maximum
+REPLICA_RETRY_SECONDS = 30
+REPLICA_MAX_RETRY_SECONDS = 600
+# Replica routers per set of connection strings
+_ROUTERS = {}
+# Routers per credentials file, environment and strategy, so sessions do
+# not read the credentials file again
+_ROUTER_SOURCES = {}
+_ROUTERS_LOCK = threading.Lock()
+
+# Partition key and method of the large data tables. Points are split by
+# the year of the measurement. Layers have no date of their own and are
+# split by a hash of their site to keep the partitions small, which only
+# prunes partitions for filters matching a few sites.
+PARTITIONS = {
+    PointData.__table__.fullname: ("datetime", "RANGE"),
+    LayerData.__table__.fullname: ("site_id", "HASH"),
+}
+# Years with a partition of the points table, others go to a default one
+POINT_PARTITION_YEARS = range(2016, 2031)
+# Number of hash partitions of the layers table
+LAYER_PARTITIONS = 16
+
+
+def initialize(engine, partition=False):
     """
     Creates the original database from scratch.
+
+    Args:
+        engine: SQLAlchemy engine
+        partition: Create the points and layers tables with declarative
+                   partitions, see create_partitioned_tables
     """
     meta = Base.metadata
     meta.drop_all(bind=engine)
-    meta.create_all(bind=engine)
+
+    if not partition:
+        meta.create_all(bind=engine)
+        return
+
+    meta.create_all(
+        bind=engine,
+        tables=[
+            table for table in meta.sorted_tables
+            if table.fullname not in PARTITIONS
+        ]
+    )
+    with engine.begin() as connection:
+        create_partitioned_tables(connection)
+
+
+def partitioned_table(table):
+    """
+    Copy of one of the PARTITIONS tables that creates it as a partitioned
+    table. PostgreSQL requires the partition key to be part of the primary
+    key, ids stay unique through the shared sequence. The mapped classes
+    are unchanged.
+
+    Args:
+        table: SQLAlchemy Table of a partitioned data table
+
+    Returns:
+        SQLAlchemy Table bound to a copy of the metadata
+    """
+    column, method = PARTITIONS[table.fullname]
+
+    # Copy all tables so the foreign keys can be resolved
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)
+
+    partitioned = metadata.tables[table.fullname]
+    partitioned.c[column].primary_key = True
+    partitioned.append_constraint(
+        PrimaryKeyConstraint(partitioned.c.id, partitioned.c[column])
+    )
+    partitioned.c.id.autoincrement = True
+    partitioned.dialect_kwargs["postgresql_partition_by"] = (
+        f"{method} ({column})"
+    )
+
+    return partitioned
+
+
+def partition_statements(table, years=POINT_PARTITION_YEARS,
+                         modulus=LAYER_PARTITIONS):
+    """
+    SQL creating the partitions of one of the PARTITIONS tables. Indexes of
+    the partitioned table are created on each partition by PostgreSQL.
+
+    Args:
+        table: SQLAlchemy Table of a partitioned data table
+        years: Years with their own partition for range partitions
+        modulus: Number of hash partitions
+
+    Returns:
+        List of SQL statements
+    """
+    method = PARTITIONS[table.fullname][1]
+
+    if method == "RANGE":
+        bounds = {
+            str(year): f"FOR VALUES FROM ('{year}-01-01 00:00:00+00') "
+                       f"TO ('{year + 1}-01-01 00:00:00+00')"
+            for year in years
+        }
+        bounds["default"] = "DEFAULT"
+    else:
+        bounds = {
+            f"p{remainder}": f"FOR VALUES WITH "
+                             f"(MODULUS {modulus}, REMAINDER {remainder})"
+            for remainder in range(modulus)
+        }
+
+    return [
+        f"CREATE TABLE {table.schema}.{table.name}_{suffix} "
+        f"PARTITION OF {table.fullname} {bound}"
+        for suffix, bound in bounds.items()
+    ]
+
+
+def create_partitioned_tables(connection, years=POINT_PARTITION_YEARS,
+                              modulus=LAYER_PARTITIONS):
+    """
+    Create the points and layers tables with their partitions.
+
+    Args:
+        connection: SQLAlchemy connection
+        years: Years with their own partition of the points table
+        modulus: Number of hash partitions of the layers table
+    """
+    for name in PARTITIONS:
+        table = partitioned_table(Base.metadata.tables[name])
+        table.create(connection)
+        for statement in partition_statements(table, years, modulus):
+            connection.execute(text(statement))
 
 
 def load_credentials(credentials_path=None):
@@ -32,7 +188,9 @@ def load_credentials(credentials_path=None):
     use the default location under the source root.
 
     This file contains the information to address, database name, username,
-    and password.
+    and password. Read replicas with the same database and user can be
+    listed as addresses under 'replicas' and the strategy to pick one of
+    them under 'replica_strategy', see ReplicaRouter.
 
     Args:
         credentials_path (string): Full path to credentials file (Optional)
@@ -61,12 +219,14 @@ def load_credentials(credentials_path=None):
     return credentials
 
 
-def db_connection_string(credentials_path:str = None):
+def db_connection_string(credentials_path:str = None, address:str = None):
     """
     Construct a connection info string for SQLAlchemy database
 
     Args:
         credentials_path (string): Full path to credentials file (Optional)
+        address (string): Host and optional port to use instead of the
+                          address of the credentials, e.g. of a replica
 
     Returns:
         String - DB connection
@@ -75,17 +235,54 @@ def db_connection_string(credentials_path:str = None):
 
     if os.getenv("SNOWEX_DB_CONNECTION"):
         credentials = os.getenv("SNOWEX_DB_CONNECTION")
+        if address is not None:
+            user, location = credentials.rsplit("@", 1)
+            db_name = location.split("/", 1)[1]
+            credentials = f"{user}@{address}/{db_name}"
         db += credentials
     else:
-        credentials = load_credentials(credentials_path)
-        db += (
-            f"{credentials['username']}:{credentials['password']}"
-            f"@{credentials['address']}/{credentials['db_name']}"
+        db = _credentials_connection_string(
+            load_credentials(credentials_path), address
         )
 
     return db
 
 
+def _credentials_connection_string(credentials, address=None):
+    """
+    Connection string from the loaded content of a credentials file
+    """
+    return (
+        f"{DB_CONNECTION_PROTOCOL}"
+        f"{credentials['username']}:{credentials['password']}"
+        f"@{address or credentials['address']}/{credentials['db_name']}"
+    )
+
+
+def replica_addresses(credentials_path:str = None):
+    """
+    Addresses of the read replicas from the comma separated
+    SNOWEX_DB_REPLICAS environment variable or the 'replicas' of the
+    credentials file.
+
+    Args:
+        credentials_path (string): Full path to credentials file (Optional)
+
+    Returns:
+        List - Replica addresses, empty without replicas
+    """
+    if os.getenv("SNOWEX_DB_REPLICAS"):
+        return [
+            address.strip()
+            for address in os.getenv("SNOWEX_DB_REPLICAS").split(",")
+            if address.strip()
+        ]
+    elif os.getenv("SNOWEX_DB_CONNECTION"):
+        return []
+
+    return load_credentials(credentials_path).get("replicas", [])
+
+
 def get_db(credentials_path: str = None, return_metadata: bool = False):
     """
     Returns the DB engine, MetaData, and session object
@@ -118,19 +315,365 @@ def get_db(credentials_path: str = None, return_metadata: bool = False):
         return engine, session
 
 
+def get_engine(credentials_path: str = None, prepared: bool = None):
+    """
+    Engine shared by all calls with the same connection information.
+
+    Args:
+        credentials_path (string): Full path to credentials file (Optional)
+        prepared: Use server side prepared statements for statements that
+                  run repeatedly. Requires psycopg 3,
+                  ``pip install snowexsql[prepared]``. Defaults to the
+                  SNOWEX_DB_PREPARED environment variable.
+
+    Returns:
+        sqlalchemy Engine object
+    """
+    return _shared_engine(db_connection_string(credentials_path), prepared)
+
+
+def _prepared_default(prepared):
+    if prepared is None:
+        prepared = os.getenv("SNOWEX_DB_PREPARED", "").lower() in (
+            "1", "true", "yes"
+        )
+    return prepared
+
+
+def _create_engine(db_connection, prepared=False, pre_ping=False):
+    """
+    Engine for a connection string. With pre_ping pooled connections are
+    checked before use, so a restarted server raises on connect instead
+    of failing the query.
+    """
+    connect_args = dict(DB_CONNECTION_OPTIONS)
+    if prepared:
+        db_connection = db_connection.replace(
+            DB_CONNECTION_PROTOCOL, PREPARED_CONNECTION_PROTOCOL, 1
+        )
+        connect_args["prepare_threshold"] = PREPARE_THRESHOLD
+
+    return create_engine(
+        db_connection, echo=False, connect_args=connect_args,
+        pool_pre_ping=pre_ping,
+    )
+
+
+def _shared_engine(db_connection, prepared=None, pre_ping=False):
+    """
+    Engine for a connection string, created on first use
+    """
+    prepared = _prepared_default(prepared)
+    key = (db_connection, prepared, pre_ping)
+    # Threads opening their first session at once share one engine
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            _ENGINES[key] = _create_engine(db_connection, prepared, pre_ping)
+
+        return _ENGINES[key]
+
+
+class ReplicaRouter:
+    """
+    Spread read only sessions over read replicas. Replicas that fail to
+    connect or lose the connection of a session are skipped for
+    retry_seconds and the next one is tried, the primary is used when no
+    replica is available. Every failure in a row doubles the time a
+    replica is skipped, up to max_retry_seconds.
+
+    Args:
+        primary: Engine of the primary database
+        replicas: List of engines of the read replicas
+        strategy: round_robin to take turns or least_loaded to pick the
+                  replica with the fewest connections in use
+        retry_seconds: Seconds to skip a replica after a failure
+        max_retry_seconds: Most seconds to skip a replica
+    """
+    def __init__(self, primary, replicas, strategy="round_robin",
+                 retry_seconds=REPLICA_RETRY_SECONDS,
+                 max_retry_seconds=REPLICA_MAX_RETRY_SECONDS):
+        if strategy not in REPLICA_STRATEGIES:
+            raise ValueError(
+                f"Unknown replica strategy {strategy}, use one of "
+                f"{', '.join(REPLICA_STRATEGIES)}"
+            )
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._turns = itertools.count()
+        self._down = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def available(self):
+        """
+        Replicas to try in order of the strategy, without the ones that
+        failed recently
+        """
+        now = time.monotonic()
+        with self._lock:
+            replicas = [
+                engine for engine in self.replicas
+                if self._down.get(engine, 0) <= now
+            ]
+            if not replicas:
+                return []
+            if self.strategy == "least_loaded":
+                return sorted(replicas, key=lambda e: e.pool.checkedout())
+            start = next(self._turns) % len(replicas)
+            return replicas[start:] + replicas[:start]
+
+    def mark_down(self, engine):
+        """
+        Skip a replica after a failure, for longer after every failure in
+        a row
+        """
+        with self._lock:
+            failures = self._failures.get(engine, 0) + 1
+            self._failures[engine] = failures
+            seconds = min(
+                self.retry_seconds * 2 ** (failures - 1),
+                self.max_retry_seconds
+            )
+            self._down[engine] = time.monotonic() + seconds
+
+    def failed(self, engine, error):
+        """
+        Mark a replica down when a session on it lost its connection
+
+        Args:
+            engine: Engine the session was connected with
+            error: Exception raised in the session
+        """
+        if engine is self.primary or not isinstance(error, DBAPIError):
+            return
+        if error.connection_invalidated:
+            LOG.warning(f"Replica {engine.url.host} failed: {error}")
+            self.mark_down(engine)
+
+    def connect(self):
+        """
+        Connection to the first available replica or the primary
+
+        Returns:
+            tuple: Engine and Connection
+        """
+        for engine in self.available():
+            try:
+                connection = engine.connect()
+            except DBAPIError as e:
+                LOG.warning(f"Skipping replica {engine.url.host}: {e}")
+                self.mark_down(engine)
+                continue
+
+            with self._lock:
+                self._failures.pop(engine, None)
+            return engine, connection
+
+        return self.primary, self.primary.connect()
+
+
+def get_router(credentials_path: str = None, strategy: str = None):
+    """
+    Router shared by all read only sessions with the same connection
+    information. The credentials file is read once per path and strategy,
+    changes to it need a new process.
+
+    Args:
+        credentials_path (string): Full path to credentials file (Optional)
+        strategy: One of REPLICA_STRATEGIES. Defaults to the
+                  SNOWEX_DB_REPLICA_STRATEGY environment variable, the
+                  'replica_strategy' of the credentials file or round_robin
+
+    Returns:
+        ReplicaRouter or None without replicas
+    """
+    source = (
+        credentials_path, strategy,
+        *[os.getenv(name) for name in (
+            "SNOWEX_DB_CREDENTIALS", "SNOWEX_DB_CONNECTION",
+            "SNOWEX_DB_REPLICAS", "SNOWEX_DB_REPLICA_STRATEGY",
+        )]
+    )
+    with _ROUTERS_LOCK:
+        if source not in _ROUTER_SOURCES:
+            _ROUTER_SOURCES[source] = _create_router(
+                credentials_path, strategy
+            )
+
+        return _ROUTER_SOURCES[source]
+
+
+def _create_router(credentials_path=None, strategy=None):
+    """
+    Router for the connection information, shared with other sources of
+    the same information. Caller holds _ROUTERS_LOCK.
+    """
+    addresses = replica_addresses(credentials_path)
+    if not addresses:
+        return None
+
+    strategy = _replica_strategy(credentials_path, strategy)
+    primary = db_connection_string(credentials_path)
+    replicas = tuple(
+        db_connection_string(credentials_path, address)
+        for address in addresses
+    )
+    key = (primary, replicas, strategy)
+    if key not in _ROUTERS:
+        _ROUTERS[key] = ReplicaRouter(
+            _shared_engine(primary),
+            [_shared_engine(replica, pre_ping=True) for replica in replicas],
+            strategy,
+        )
+
+    return _ROUTERS[key]
+
+
+def _replica_strategy(credentials_path=None, strategy=None):
+    if strategy is None:
+        strategy = os.getenv("SNOWEX_DB_REPLICA_STRATEGY")
+    if strategy is None and not os.getenv("SNOWEX_DB_CONNECTION"):
+        strategy = load_credentials(credentials_path).get("replica_strategy")
+    return strategy or "round_robin"
+
+
 @contextmanager
-def db_session_with_credentials(credentials_path=None):
+def db_session_with_credentials(credentials_path=None, read_only=False):
     """
-    Helper method to allow database session with a context block.
+    Helper method to allow database session with a context block. The
+    session uses the shared engine of get_engine.
 
     Args:
         credentials_path (string): Full path to credentials file (Optional)
+        read_only: Route the session to a read replica if there are any,
+                   see get_router. Writes always go to the primary.
 
     """
-    engine, session = get_db(credentials_path)
-    yield engine, session
-    session.close()
-    engine.dispose()
+    router = get_router(credentials_path) if read_only else None
+    engine = get_engine(credentials_path) if router is None else None
+    with _open_session(engine, router) as (engine, session):
+        yield engine, session
+
+
+@contextmanager
+def _open_session(engine, router=None):
+    """
+    Session on the engine, or on a connection of the router if given
+    """
+    if router is None:
+        session = sessionmaker(bind=engine)(expire_on_commit=False)
+        try:
+            yield engine, session
+        finally:
+            session.close()
+        return
+
+    engine, connection = router.connect()
+    session = Session(bind=connection, expire_on_commit=False)
+    try:
+        yield engine, session
+    except Exception as e:
+        router.failed(engine, e)
+        raise
+    finally:
+        session.close()
+        connection.close()
+
+
+class Database:
+    """
+    A database to query with the API classes, owning the pooled engines of
+    its primary and read replicas. The connection information is read once
+    on creation, so one process can query several databases from
+    concurrent threads without changing environment variables.
+
+    Args:
+        credentials_path (string): Full path to credentials file. Without
+                                   one, the connection information comes
+                                   from the environment, see
+                                   db_connection_string
+        credentials: Dictionary with the content of a credentials file, in
+                     place of credentials_path
+        prepared: Use server side prepared statements, see get_engine
+        replica_strategy: One of REPLICA_STRATEGIES, see get_router
+
+    Example:
+        >>> database = Database("/path/to/credentials.json")
+        >>> PointMeasurements.bind(database).from_filter(type="depth")
+    """
+    def __init__(self, credentials_path=None, credentials=None,
+                 prepared=None, replica_strategy=None):
+        if credentials is None and credentials_path is not None:
+            credentials = load_credentials(credentials_path)
+
+        if credentials is None:
+            self.url = db_connection_string()
+            replicas = [
+                db_connection_string(address=address)
+                for address in replica_addresses()
+            ]
+            replica_strategy = _replica_strategy(strategy=replica_strategy)
+        else:
+            self.url = _credentials_connection_string(credentials)
+            replicas = [
+                _credentials_connection_string(credentials, address)
+                for address in credentials.get("replicas", [])
+            ]
+            replica_strategy = (
+                replica_strategy
+                or credentials.get("replica_strategy", "round_robin")
+            )
+
+        # Lookup ids of this database for the API filters
+        self.lookups = LookupResolver()
+        prepared = _prepared_default(prepared)
+        self.engine = _create_engine(self.url, prepared)
+        self.router = None
+        if replicas:
+            self.router = ReplicaRouter(
+                self.engine,
+                [
+                    _create_engine(replica, prepared, pre_ping=True)
+                    for replica in replicas
+                ],
+                replica_strategy,
+            )
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}"
+            f"({self.engine.url.render_as_string(hide_password=True)})"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.dispose()
+
+    @contextmanager
+    def session(self, read_only=False):
+        """
+        Session in a context block, like db_session_with_credentials
+
+        Args:
+            read_only: Route the session to a read replica if there are any
+        """
+        router = self.router if read_only else None
+        with _open_session(self.engine, router) as (engine, session):
+            yield engine, session
+
+    def dispose(self):
+        """
+        Close the pooled connections of the primary and the replicas
+        """
+        self.engine.dispose()
+        if self.router is not None:
+            for engine in self.router.replicas:
+                engine.dispose()
 
 
 def get_table_attributes(DataCls):
@@ -143,3 +686,234 @@ def get_table_attributes(DataCls):
     # Drop ID as it is (should) never provided
     valid_attributes = [v for v in valid_attributes if v != "id"]
     return valid_attributes
+
+
+# Profiles active in the current context and the API call in progress
+_PROFILES = ContextVar("snowexsql_profiles", default=())
+_API_CALL = ContextVar("snowexsql_api_call", default=None)
+
+
+@dataclass
+class QueryRecord:
+    """
+    A statement sent to the database while profiling
+    """
+    statement: str
+    parameters: object
+    seconds: float
+    # Rows returned or changed
+    rows: int
+    # Name of the API call that sent the statement
+    call: str = None
+    # EXPLAIN (ANALYZE, BUFFERS) of slow statements
+    plan: list = None
+
+
+@dataclass
+class CallRecord:
+    """
+    A call of the API while profiling
+    """
+    name: str
+    seconds: float = None
+    # Rows and in memory size of a returned DataFrame
+    rows: int = None
+    bytes: int = None
+    queries: list = field(default_factory=list)
+
+
+class QueryProfile:
+    """
+    Statements and API calls recorded in a profile block.
+
+    Args:
+        explain_over: Seconds a SELECT statement needs to take to be
+                      explained. None never runs EXPLAIN.
+        callback: Function receiving each QueryRecord and CallRecord when
+                  it is complete, e.g. log_record or a metrics client
+    """
+    def __init__(self, explain_over=None, callback=None):
+        self.explain_over = explain_over
+        self.callback = callback
+        self.queries = []
+        self.calls = []
+
+    def _record(self, record):
+        if isinstance(record, QueryRecord):
+            self.queries.append(record)
+        else:
+            self.calls.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    @property
+    def seconds(self):
+        """
+        Time spent on all statements
+        """
+        return sum(query.seconds for query in self.queries)
+
+    def to_frame(self):
+        """
+        Recorded statements as a pandas DataFrame
+        """
+        import pandas as pd
+
+        return pd.DataFrame(
+            [asdict(query) for query in self.queries],
+            columns=list(QueryRecord.__dataclass_fields__)
+        )
+
+
+def log_record(record):
+    """
+    Profile callback writing records as JSON to the snowexsql.db logger
+    """
+    values = asdict(record)
+    if isinstance(record, CallRecord):
+        values.pop("queries")
+        LOG.info(f"API call {json.dumps(values, default=str)}")
+    else:
+        LOG.info(f"Query {json.dumps(values, default=str)}")
+
+
+@contextmanager
+def profile(explain_over=None, callback=None):
+    """
+    Record the statements sent to the database and the API calls made
+    within the block. Profiles can be nested.
+
+    Example:
+        >>> with snowexsql.profile(explain_over=1) as p:
+        ...     PointMeasurements.from_filter(type='depth', limit=10)
+        >>> p.to_frame()
+
+    Args:
+        explain_over: Seconds after which a SELECT statement is run again
+                      with EXPLAIN (ANALYZE, BUFFERS) to capture its plan
+        callback: Function receiving each QueryRecord and CallRecord
+
+    Yields:
+        QueryProfile
+    """
+    recorder = QueryProfile(explain_over, callback)
+    token = _PROFILES.set(_PROFILES.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _PROFILES.reset(token)
+
+
+def profiled(function):
+    """
+    Decorator recording the calls of an API method while profiling
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profiles = _PROFILES.get()
+        # Calls made by other API calls are part of those
+        if not profiles or _API_CALL.get() is not None:
+            return function(*args, **kwargs)
+
+        owner = args[0] if isinstance(args[0], type) else type(args[0])
+        call = CallRecord(f"{owner.__name__}.{function.__name__}")
+        token = _API_CALL.set(call)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            call.seconds = time.perf_counter() - start
+            _API_CALL.reset(token)
+
+        if hasattr(result, "memory_usage"):
+            call.rows = len(result)
+            call.bytes = int(result.memory_usage(deep=True).sum())
+        elif isinstance(result, list):
+            call.rows = len(result)
+        for recorder in profiles:
+            recorder._record(call)
+
+        return result
+
+    return wrapper
+
+
+def _explain(dbapi_connection, statement, parameters):
+    """
+    Plan of a statement, run again on the DBAPI connection so the results
+    of the profiled cursor are kept
+    """
+    savepoint = not dbapi_connection.autocommit
+    with dbapi_connection.cursor() as cursor:
+        if savepoint:
+            cursor.execute("SAVEPOINT snowexsql_explain")
+        try:
+            cursor.execute(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}",
+                parameters
+            )
+            plan = cursor.fetchone()[0]
+        except Exception as e:
+            LOG.warning(f"Could not explain statement: {e}")
+            plan = None
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT snowexsql_explain")
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT snowexsql_explain")
+
+    return plan
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    if _PROFILES.get():
+        conn.info.setdefault("snowexsql_query_start", []).append(
+            time.perf_counter()
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # Drop the start time of the failed statement
+    if context.connection is not None and _PROFILES.get():
+        starts = context.connection.info.get("snowexsql_query_start")
+        if starts:
+            starts.pop()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    profiles = _PROFILES.get()
+    starts = conn.info.get("snowexsql_query_start")
+    if not profiles or not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+
+    plan = None
+    thresholds = [
+        recorder.explain_over for recorder in profiles
+        if recorder.explain_over is not None
+    ]
+    if (
+        thresholds and seconds > min(thresholds) and not executemany
+        and statement.lstrip().upper().startswith("SELECT")
+    ):
+        plan = _explain(cursor.connection, statement, parameters)
+
+    call = _API_CALL.get()
+    record = QueryRecord(
+        statement=statement,
+        parameters=parameters,
+        seconds=seconds,
+        rows=cursor.rowcount,
+        call=call.name if call is not None else None,
+        plan=plan,
+    )
+    if call is not None:
+        call.queries.append(record)
+    for recorder in profiles:
+        recorder._record(record)
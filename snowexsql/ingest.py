@@ -0,0 +1,766 @@
+"""
+Module to load large amounts of point and layer data into the database.
+
+Rows are not added through the ORM. Instead, all names of lookup tables
+(campaigns, instruments, measurement types, observers, DOIs and
+observations) are resolved to ids with a
+:py:class:`~snowexsql.lookups.LookupResolver` and the data rows are
+streamed to the database with ``COPY FROM STDIN``.
+
+The load functions take an open SQLAlchemy connection and do not commit,
+so a whole load can be run in a single transaction:
+
+.. code-block:: python
+
+    with engine.begin() as connection:
+        bulk_load_points(df, connection)
+
+Directories of SnowEx files are loaded with :py:func:`ingest_directory`,
+which is also available as ``snowexsql ingest <directory>``.
+
+Every write is recorded in the data_loads table with :py:func:`record_load`,
+which tells cached API results and local mirrors that data changed.
+"""
+import io
+import logging
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+)
+from pathlib import Path
+
+import pandas as pd
+import shapely
+from geoalchemy2 import WKBElement
+from sqlalchemy import delete, insert, select, text, tuple_
+from sqlalchemy import table as sql_table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .lookups import LookupResolver
+from .parsers import parse_file, read_smp_log
+from .tables import (
+    CampaignObservation, DataLoad, LayerData, PointData, PointObservation,
+    Site
+)
+from .tables.site import SiteObservers
+
+LOG = logging.getLogger(__name__)
+
+# Number of rows sent to the database with a single COPY statement
+COPY_BATCH_SIZE = 100_000
+# Files parsed ahead of the writer per worker process. Limits the parsed
+# files held in memory while the writer loads.
+FILES_IN_FLIGHT_PER_WORKER = 2
+
+# Columns of the data tables in the order they are copied
+POINT_COLUMNS = [
+    'value', 'datetime', 'elevation', 'geom', 'measurement_type_id',
+    'observation_id',
+]
+LAYER_COLUMNS = [
+    'depth', 'bottom_depth', 'value', 'site_id', 'measurement_type_id',
+    'instrument_id',
+]
+# Optional columns stored with new sites
+SITE_COLUMNS = [
+    'elevation', 'description', 'slope_angle', 'aspect', 'air_temp',
+    'total_depth', 'weather_description', 'precip', 'sky_cover', 'wind',
+    'ground_condition', 'ground_roughness', 'ground_vegetation',
+    'vegetation_height', 'tree_canopy', 'comments',
+]
+# Timestamps are written with their UTC offset
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f%z'
+
+
+def _first_per_key(df, keys):
+    """
+    First row for each unique combination of the key columns
+    """
+    return df.drop_duplicates(subset=keys).set_index(keys)
+
+
+def _observer_names(value):
+    """
+    Observer names of a site, several names are separated by commas
+    """
+    if not isinstance(value, str):
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _site_values(row, columns):
+    """
+    Optional site columns of a row with missing values as None
+    """
+    values = {}
+    for column in columns:
+        value = row.get(column)
+        values[column] = None if pd.isna(value) else value
+    return values
+
+
+def resolve_sites(connection, df, resolver):
+    """
+    Get or create the sites of layer data rows. Sites are unique by name
+    and datetime. The geometry, campaign, DOI, observers and details of a
+    new site are taken from its first row.
+
+    Args:
+        connection: SQLAlchemy connection
+        df: DataFrame with the columns ``site``, ``datetime``, ``geom``
+            (hex EWKB), ``campaign`` and ``doi``. Optional are ``observer``
+            with comma separated names and any of :py:data:`SITE_COLUMNS`.
+        resolver: :py:class:`~snowexsql.lookups.LookupResolver`
+
+    Returns:
+        pandas Series - site id for each row of df
+    """
+    campaigns = resolver.ids(
+        connection, 'campaign', df['campaign'], create=True
+    )
+    dois = resolver.ids(connection, 'doi', df['doi'], create=True)
+
+    keys = ['site', 'datetime']
+    sites = _first_per_key(df, keys)
+    table = Site.__table__
+    details = [column for column in SITE_COLUMNS if column in df]
+
+    def select_ids(keys):
+        return connection.execute(
+            select(table.c.name, table.c.datetime, table.c.id)
+            .where(tuple_(table.c.name, table.c.datetime).in_(keys))
+        ).all()
+
+    ids = {(name, dt): id for name, dt, id in select_ids(list(sites.index))}
+
+    missing = sites.loc[[key not in ids for key in sites.index]]
+    if not missing.empty:
+        rows = [
+            {
+                'name': name,
+                'datetime': dt,
+                'geom': WKBElement(row['geom'], extended=True),
+                'campaign_id': campaigns[row['campaign']],
+                'doi_id': dois[row['doi']],
+                **_site_values(row, details),
+            }
+            for (name, dt), row in missing.iterrows()
+        ]
+        created = connection.execute(
+            pg_insert(table).on_conflict_do_nothing(
+                index_elements=['name', 'datetime']
+            ).returning(table.c.name, table.c.datetime, table.c.id),
+            rows
+        ).all()
+
+        # Only sites created here are linked to the observers of the rows
+        site_observers = {
+            key: _observer_names(row.get('observer'))
+            for key, row in missing.iterrows()
+        }
+        observers = resolver.ids(
+            connection, 'observer',
+            [name for names in site_observers.values() for name in names],
+            create=True
+        )
+        links = [
+            {'site_id': id, 'observer_id': observers[observer]}
+            for name, dt, id in created
+            for observer in site_observers[(name, dt)]
+        ]
+        if links:
+            connection.execute(insert(SiteObservers.__table__), links)
+
+        ids.update(
+            ((name, dt), id)
+            for name, dt, id in select_ids(list(missing.index))
+        )
+
+    return pd.Series(
+        [ids[key] for key in zip(df['site'], df['datetime'])],
+        index=df.index
+    )
+
+
+def _hex_ewkb(gdf, crs=None):
+    """
+    Hex encoded EWKB of the geometries in a GeoDataFrame. Postgres parses
+    this representation directly into a geometry.
+    """
+    if crs is None:
+        if gdf.crs is None:
+            raise ValueError('Data has no CRS, pass the crs argument')
+        crs = gdf.crs.to_epsg()
+
+    geometries = shapely.set_srid(gdf.geometry.to_numpy(), crs)
+    return shapely.to_wkb(geometries, hex=True, include_srid=True)
+
+
+def copy_rows(connection, table, df, columns, batch_size=COPY_BATCH_SIZE):
+    """
+    Stream rows of a DataFrame to a table with COPY FROM STDIN using the
+    DBAPI cursor of the connection. Works with the psycopg2 and the
+    psycopg 3 driver of prepared engines.
+
+    Args:
+        connection: SQLAlchemy connection
+        table: SQLAlchemy Table to copy into
+        df: DataFrame holding the columns
+        columns: List of column names to copy
+        batch_size: Number of rows sent with one COPY statement
+
+    Returns:
+        Integer - Number of rows copied
+    """
+    statement = (
+        f"COPY {table.fullname} ({', '.join(columns)}) "
+        f"FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = connection.connection.cursor()
+
+    try:
+        for start in range(0, len(df), batch_size):
+            buffer = io.StringIO()
+            df[columns].iloc[start:start + batch_size].to_csv(
+                buffer, index=False, header=False, date_format=DATE_FORMAT
+            )
+            if connection.dialect.driver == 'psycopg':
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+            else:
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+    LOG.info(f'Copied {len(df)} rows to {table.name}')
+    return len(df)
+
+
+def record_load(connection, table, inserted=0, updated=0, deleted=0):
+    """
+    Add an entry for a write to a table to the data_loads table. Nothing is
+    recorded when no row changed.
+
+    Args:
+        connection: SQLAlchemy connection
+        table: SQLAlchemy Table that was written to
+        inserted: Number of inserted rows
+        updated: Number of updated rows
+        deleted: Number of deleted rows
+    """
+    if not (inserted or updated or deleted):
+        return
+
+    connection.execute(
+        insert(DataLoad.__table__).values(
+            table_name=table.name, inserted=int(inserted),
+            updated=int(updated), deleted=int(deleted)
+        )
+    )
+
+
+def _delete_rows(connection, table, **columns):
+    """
+    Delete the rows of a table matching any of the ids given per column
+    """
+    statement = delete(table).where(*[
+        table.c[column].in_([int(id) for id in ids.unique()])
+        for column, ids in columns.items()
+    ])
+    result = connection.execute(statement)
+    if result.rowcount:
+        LOG.info(f'Deleted {result.rowcount} rows from {table.name}')
+        record_load(connection, table, deleted=result.rowcount)
+
+
+def _measurement_type_ids(connection, df, resolver):
+    """
+    Measurement type id for each row, new types get the units of their
+    first row when a ``units`` column is present.
+    """
+    defaults = {}
+    if 'units' in df:
+        defaults = {
+            name: {'units': units}
+            for name, units in _first_per_key(df, ['type'])['units'].items()
+        }
+    return resolver.resolve(
+        connection, 'type', df['type'], create=True, defaults=defaults
+    )
+
+
+def bulk_load_points(df, connection, crs=None, batch_size=COPY_BATCH_SIZE,
+                     resolver=None, replace=False):
+    """
+    Load point data into the points table.
+
+    Args:
+        df: GeoDataFrame with point geometries and the columns ``value``,
+            ``datetime``, ``type``, ``observation``, ``campaign``,
+            ``instrument``, ``observer`` and ``doi``. Optional columns are
+            ``elevation``, ``units`` (of new measurement types) and
+            ``description`` (of new observations). Naive datetimes are
+            stored as UTC.
+        connection: SQLAlchemy connection
+        crs: integer SRID of the geometries. Defaults to the CRS of df
+        batch_size: Number of rows sent with one COPY statement
+        resolver: Optional :py:class:`~snowexsql.lookups.LookupResolver` to
+                  share cached lookup ids between loads
+        replace: Delete existing points of the same observations and
+                 measurement types first, which makes loading a file
+                 again idempotent
+
+    Returns:
+        Integer - Number of rows loaded
+    """
+    if df.empty:
+        return 0
+
+    resolver = resolver or LookupResolver()
+    df = df.assign(datetime=pd.to_datetime(df['datetime'], utc=True))
+    data = pd.DataFrame({
+        'value': df['value'],
+        'datetime': df['datetime'],
+        'elevation': df.get('elevation'),
+        'geom': _hex_ewkb(df, crs),
+    }, index=df.index)
+    data['measurement_type_id'] = _measurement_type_ids(
+        connection, df, resolver
+    )
+    data['observation_id'] = resolver.observation_ids(
+        connection,
+        df.assign(date=df['datetime'].dt.date),
+        PointObservation,
+        create=True
+    )
+
+    if replace:
+        _delete_rows(
+            connection, PointData.__table__,
+            observation_id=data['observation_id'],
+            measurement_type_id=data['measurement_type_id'],
+        )
+
+    count = copy_rows(
+        connection, PointData.__table__, data, POINT_COLUMNS,
+        batch_size=batch_size
+    )
+    record_load(connection, PointData.__table__, inserted=count)
+
+    return count
+
+
+def bulk_load_layers(df, connection, crs=None, batch_size=COPY_BATCH_SIZE,
+                     resolver=None, replace=False):
+    """
+    Load layer data into the layers table. Sites are created from the rows
+    when they do not exist yet.
+
+    Args:
+        df: GeoDataFrame with the site location as point geometry and the
+            columns ``depth``, ``value``, ``type``, ``instrument``,
+            ``site``, ``datetime``, ``campaign`` and ``doi``. Optional
+            columns are ``bottom_depth``, ``elevation``, ``units`` (of new
+            measurement types) and ``observer`` (of new sites).
+        connection: SQLAlchemy connection
+        crs: integer SRID of the geometries. Defaults to the CRS of df
+        batch_size: Number of rows sent with one COPY statement
+        resolver: Optional :py:class:`~snowexsql.lookups.LookupResolver` to
+                  share cached lookup ids between loads
+        replace: Delete existing layers of the same sites and measurement
+                 types first, which makes loading a file again idempotent
+
+    Returns:
+        Integer - Number of rows loaded
+    """
+    if df.empty:
+        return 0
+
+    resolver = resolver or LookupResolver()
+    df = df.assign(datetime=pd.to_datetime(df['datetime'], utc=True))
+    data = pd.DataFrame({
+        'depth': df['depth'],
+        'bottom_depth': df.get('bottom_depth'),
+        'value': df['value'],
+    }, index=df.index)
+    data['site_id'] = resolve_sites(
+        connection, pd.DataFrame(df).assign(geom=_hex_ewkb(df, crs)),
+        resolver
+    )
+    data['measurement_type_id'] = _measurement_type_ids(
+        connection, df, resolver
+    )
+    data['instrument_id'] = resolver.resolve(
+        connection, 'instrument', df['instrument'], create=True
+    )
+
+    if replace:
+        _delete_rows(
+            connection, LayerData.__table__,
+            site_id=data['site_id'],
+            measurement_type_id=data['measurement_type_id'],
+        )
+
+    count = copy_rows(
+        connection, LayerData.__table__, data, LAYER_COLUMNS,
+        batch_size=batch_size
+    )
+    record_load(connection, LayerData.__table__, inserted=count)
+
+    return count
+
+
+def staged_upsert(connection, table, df, keys, batch_size=COPY_BATCH_SIZE):
+    """
+    Insert or update rows of a table with a unique index on the key
+    columns. Rows are copied to a temporary table first and merged with a
+    single INSERT ... ON CONFLICT DO UPDATE. Existing rows are only
+    updated when a value changed.
+
+    Args:
+        connection: SQLAlchemy connection
+        table: SQLAlchemy Table with a unique index on the keys
+        df: DataFrame with the key columns and the columns to write. For
+            duplicate keys, the last row is used.
+        keys: List of columns of the unique index
+        batch_size: Number of rows sent with one COPY statement
+
+    Returns:
+        Dictionary - Number of inserted, updated and unchanged rows
+    """
+    df = df.drop_duplicates(subset=keys, keep='last')
+    columns = list(df.columns)
+    updates = [column for column in columns if column not in keys]
+    column_list = ', '.join(columns)
+    stage = f'staged_{table.name}'
+
+    connection.execute(text(f'DROP TABLE IF EXISTS {stage}'))
+    connection.execute(text(
+        f'CREATE TEMP TABLE {stage} ON COMMIT DROP AS '
+        f'SELECT {column_list} FROM {table.fullname} WITH NO DATA'
+    ))
+    copy_rows(
+        connection, sql_table(stage), df, columns, batch_size=batch_size
+    )
+
+    if updates:
+        conflict = (
+            'DO UPDATE SET '
+            + ', '.join(f'{column} = EXCLUDED.{column}' for column in updates)
+            + f" WHERE ({', '.join(f'{table.name}.{c}' for c in updates)}) "
+            + f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in updates)})"
+        )
+    else:
+        conflict = 'DO NOTHING'
+
+    # Rows inserted by this statement have no deleting transaction id
+    result = connection.execute(text(
+        f'INSERT INTO {table.fullname} AS {table.name} ({column_list}) '
+        f'SELECT {column_list} FROM {stage} '
+        f"ON CONFLICT ({', '.join(keys)}) {conflict} "
+        f'RETURNING (xmax = 0) AS inserted'
+    )).scalars().all()
+
+    report = {
+        'inserted': sum(result),
+        'updated': len(result) - sum(result),
+        'unchanged': len(df) - len(result),
+    }
+    LOG.info(
+        f"Upserted {table.name}: {report['inserted']} inserted, "
+        f"{report['updated']} updated, {report['unchanged']} unchanged"
+    )
+    record_load(
+        connection, table, inserted=report['inserted'],
+        updated=report['updated']
+    )
+    return report
+
+
+def _sync_site_observers(connection, df, resolver):
+    """
+    Set the observers of sites to the comma separated names of the
+    ``observer`` column. Only links that changed are written.
+    """
+    site_ids = resolve_sites(connection, df, resolver)
+    names = [_observer_names(value) for value in df['observer']]
+    observers = resolver.ids(
+        connection, 'observer', [n for row in names for n in row],
+        create=True
+    )
+    wanted = {
+        (int(site_id), observers[name])
+        for site_id, row in zip(site_ids, names)
+        for name in row
+    }
+
+    links = SiteObservers.__table__
+    existing = {
+        tuple(row) for row in connection.execute(
+            select(links.c.site_id, links.c.observer_id)
+            .where(links.c.site_id.in_([int(i) for i in site_ids.unique()]))
+        ).all()
+    }
+
+    removed = existing - wanted
+    if removed:
+        connection.execute(
+            delete(links).where(
+                tuple_(links.c.site_id, links.c.observer_id).in_(removed)
+            )
+        )
+    added = wanted - existing
+    if added:
+        connection.execute(
+            insert(links),
+            [
+                {'site_id': site_id, 'observer_id': observer_id}
+                for site_id, observer_id in sorted(added)
+            ]
+        )
+    record_load(
+        connection, links, inserted=len(added), deleted=len(removed)
+    )
+
+
+def upsert_sites(connection, df, resolver=None, crs=None):
+    """
+    Insert new sites and update the details of existing sites, which are
+    unique by name and datetime.
+
+    Args:
+        connection: SQLAlchemy connection
+        df: GeoDataFrame with the site location as point geometry and the
+            columns ``site``, ``datetime``, ``campaign`` and ``doi``.
+            Optional are ``observer`` with comma separated names and any of
+            :py:data:`SITE_COLUMNS`. Missing optional columns are not
+            changed for existing sites.
+        resolver: Optional :py:class:`~snowexsql.lookups.LookupResolver`
+        crs: integer SRID of the geometries. Defaults to the CRS of df
+
+    Returns:
+        Dictionary - Number of inserted, updated and unchanged sites
+    """
+    if df.empty:
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    resolver = resolver or LookupResolver()
+    df = pd.DataFrame(df).assign(
+        datetime=pd.to_datetime(df['datetime'], utc=True),
+        geom=_hex_ewkb(df, crs),
+    )
+
+    sites = pd.DataFrame({
+        'name': df['site'],
+        'datetime': df['datetime'],
+        'geom': df['geom'],
+        'campaign_id': resolver.resolve(
+            connection, 'campaign', df['campaign'], create=True
+        ),
+        'doi_id': resolver.resolve(
+            connection, 'doi', df['doi'], create=True
+        ),
+    }, index=df.index)
+    for column in SITE_COLUMNS:
+        if column in df:
+            sites[column] = df[column]
+
+    report = staged_upsert(
+        connection, Site.__table__, sites, ['name', 'datetime']
+    )
+
+    if 'observer' in df:
+        # Files that name no observers keep the observers loaded before
+        named = df[[bool(_observer_names(value)) for value in df['observer']]]
+        if not named.empty:
+            _sync_site_observers(connection, named, resolver)
+
+    return report
+
+
+def upsert_observations(connection, df, observation_type, resolver=None):
+    """
+    Insert new campaign observations and update existing ones, which are
+    unique by name and date.
+
+    Args:
+        connection: SQLAlchemy connection
+        df: DataFrame with the columns ``observation``, ``date``,
+            ``campaign``, ``instrument``, ``observer`` and ``doi`` and the
+            optional column ``description``
+        observation_type: Class of the observation, e.g. PointObservation
+        resolver: Optional :py:class:`~snowexsql.lookups.LookupResolver`
+
+    Returns:
+        Dictionary - Number of inserted, updated and unchanged observations
+    """
+    if df.empty:
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    resolver = resolver or LookupResolver()
+    observations = pd.DataFrame({
+        'name': df['observation'],
+        'date': df['date'],
+        'type': observation_type.__mapper__.polymorphic_identity,
+        'campaign_id': resolver.resolve(
+            connection, 'campaign', df['campaign'], create=True
+        ),
+        'instrument_id': resolver.resolve(
+            connection, 'instrument', df['instrument'], create=True
+        ),
+        'observers_id': resolver.resolve(
+            connection, 'observer', df['observer'], create=True
+        ),
+        'doi_id': resolver.resolve(
+            connection, 'doi', df['doi'], create=True
+        ),
+    }, index=df.index)
+    if 'description' in df:
+        observations['description'] = df['description']
+
+    return staged_upsert(
+        connection, CampaignObservation.__table__, observations,
+        ['name', 'date']
+    )
+
+
+def load_parsed_file(parsed, connection, resolver=None, replace=True):
+    """
+    Load the sites, layers and points of a parsed file
+
+    Args:
+        parsed: :py:class:`~snowexsql.parsers.ParsedFile`
+        connection: SQLAlchemy connection
+        resolver: Optional :py:class:`~snowexsql.lookups.LookupResolver`
+        replace: Replace data of the same sites or observations
+
+    Returns:
+        Dictionary - Number of layers and points loaded and the upsert
+                     reports of the sites and observations
+    """
+    resolver = resolver or LookupResolver()
+    loaded = {'layers': 0, 'points': 0}
+
+    if parsed.sites is not None:
+        loaded['sites'] = upsert_sites(connection, parsed.sites, resolver)
+    if parsed.layers is not None:
+        loaded['layers'] = bulk_load_layers(
+            parsed.layers, connection, resolver=resolver, replace=replace
+        )
+    if parsed.points is not None:
+        points = parsed.points.assign(
+            date=pd.to_datetime(parsed.points['datetime'], utc=True).dt.date
+        )
+        loaded['observations'] = upsert_observations(
+            connection, points, PointObservation, resolver
+        )
+        loaded['points'] = bulk_load_points(
+            parsed.points, connection, resolver=resolver, replace=replace
+        )
+
+    return loaded
+
+
+def ingest_directory(directory, engine, doi, campaign=None, observer=None,
+                     instrument=None, timezone='UTC', workers=None,
+                     replace=True):
+    """
+    Load all supported files in a directory and its subdirectories. Files
+    are parsed in a process pool while a single writer loads each parsed
+    file in its own transaction. A file that fails to parse or load is
+    logged and does not stop the other files.
+
+    Args:
+        directory: Path to the directory
+        engine: SQLAlchemy engine
+        doi: DOI of the data
+        campaign: Campaign name, required for files without a Location
+        observer: Observer name for files that do not state one
+        instrument: Instrument name for pit sheets that do not state one
+        timezone: Timezone of local dates in the files
+        workers: Number of parsing processes. Defaults to the number of CPUs
+        replace: Replace data of sites and observations loaded before, so
+                 loading a directory again does not duplicate data
+
+    Returns:
+        Dictionary - Number of files, layers and points loaded, the number
+                     of inserted, updated and unchanged sites and
+                     observations and a list of the files that failed
+    """
+    directory = Path(directory)
+    files = sorted(
+        path for path in directory.rglob('*')
+        if path.is_file() and path.suffix.lower() == '.csv'
+    )
+
+    options = {
+        'campaign': campaign,
+        'doi': doi,
+        'observer': observer,
+        'instrument': instrument,
+        'timezone': timezone,
+    }
+    # SMP logs name the observers of the SMP profiles
+    smp_logs = [path for path in files if 'smp_log' in path.name.lower()]
+    if smp_logs:
+        options['smp_log'] = {}
+        for path in smp_logs:
+            options['smp_log'].update(read_smp_log(path))
+        files = [path for path in files if path not in smp_logs]
+
+    summary = {
+        'files': 0,
+        'layers': 0,
+        'points': 0,
+        'sites': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+        'observations': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+        'failed': [],
+    }
+    resolver = LookupResolver()
+
+    def load(path, future):
+        try:
+            parsed = future.result()
+            if parsed is None:
+                return
+
+            with engine.begin() as connection:
+                loaded = load_parsed_file(
+                    parsed, connection, resolver=resolver, replace=replace
+                )
+        except Exception as e:
+            # Ids added in the rolled back transaction are invalid
+            resolver.clear()
+            LOG.error(f'Failed to load {path}: {e}')
+            summary['failed'].append(str(path))
+            return
+
+        summary['files'] += 1
+        summary['layers'] += loaded['layers']
+        summary['points'] += loaded['points']
+        for upserted in ['sites', 'observations']:
+            for change, count in loaded.get(upserted, {}).items():
+                summary[upserted][change] += count
+        LOG.info(
+            f"Loaded {path.name}: {loaded['layers']} layers, "
+            f"{loaded['points']} points"
+        )
+
+    # Parsed files wait in memory for the writer, so only a few files per
+    # worker are submitted at a time
+    workers = workers or os.cpu_count() or 1
+    in_flight = workers * FILES_IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for path in files:
+            if len(pending) >= in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    load(pending.pop(future), future)
+            pending[executor.submit(parse_file, path, **options)] = path
+
+        for future in as_completed(pending):
+            load(pending[future], future)
+
+    return summary
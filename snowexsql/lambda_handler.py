@@ -45,6 +45,9 @@ LOG = logging.getLogger(__name__)
 
 LOG.info("Using standard API classes")
 
+# Databases of warm invocations by their credentials
+_DATABASES = {}
+
 
 def deserialize_geometry(geom_dict):
     """Convert GeoJSON dict back to Shapely geometry"""
@@ -197,8 +200,20 @@ def validate_measurement_class(cls, class_name: str) -> bool:
     return True
 
 
+def _get_database(credentials: Dict[str, Any]) -> sled_db.Database:
+    """
+    Database for the credentials, reused by later invocations of a warm
+    Lambda so they keep the pooled connections.
+    """
+    key = json.dumps(credentials, sort_keys=True)
+    if key not in _DATABASES:
+        _DATABASES[key] = sled_db.Database(credentials=credentials)
+    return _DATABASES[key]
+
+
 def _handle_class_action(
-    class_name: str, method_name: str, event: dict, tmp_cred_path: str
+    class_name: str, method_name: str, event: dict,
+    database: sled_db.Database
 ):
     """Handle class-based actions that mirror the api.py structure."""
     try:
@@ -209,7 +224,7 @@ def _handle_class_action(
             available = list(allowed_classes.keys())
             raise ValueError(f"Unknown class: {class_name}. Available: {available}")
 
-        api_class = allowed_classes[class_name]
+        api_class = allowed_classes[class_name].bind(database)
 
         # Handle different method types
         if method_name == "from_filter":
@@ -230,9 +245,6 @@ def _handle_class_action(
             # Extract verbose parameter before passing to from_area
             verbose = filters.pop("verbose", False)
 
-            # Set credentials for api.py to use
-            os.environ["SNOWEX_DB_CREDENTIALS_FILE"] = tmp_cred_path
-
             try:
                 df = api_class.from_area(
                     shp=shp_wkt,
@@ -263,9 +275,6 @@ def _handle_class_action(
             # Handle get_sites method for LayerMeasurements
             site_names = event.get("site_names")
 
-            # Set credentials for api.py to use
-            os.environ["SNOWEX_DB_CREDENTIALS_FILE"] = tmp_cred_path
-
             try:
                 df = api_class.get_sites(site_names=site_names)
                 records = df.to_dict("records")
@@ -368,29 +377,22 @@ def handle_event_with_secret(
             creds_check = json.load(f)
             LOG.info(f"Credentials file keys: {list(creds_check.keys())}")
 
-        # Set environment variable so API classes can find credentials
-        # This is critical because api.py classes call db_session_with_credentials()
-        # without passing credentials_path parameter
-        os.environ["SNOWEX_DB_CREDENTIALS"] = str(tmp_creds)
-
-        # Get database connection with explicit credentials path
-        engine, session = sled_db.get_db(credentials_path=str(tmp_creds))
+        # The API classes are bound to this database instead of reading
+        # the credentials from the environment, which concurrent requests
+        # would share
+        database = _get_database(creds_check)
 
         # Test connection
         if event.get("action") == "test_connection":
-            result = _test_connection(engine)
-            session.close()
-            return result
+            return _test_connection(database.engine)
 
         # Handle class-based actions (e.g., PointMeasurements.from_filter)
         action = event.get("action", "")
         if "." in action:
             class_name, method_name = action.split(".", 1)
-            result = _handle_class_action(
-                class_name, method_name, event, str(tmp_creds)
+            return _handle_class_action(
+                class_name, method_name, event, database
             )
-            session.close()
-            return result
 
         # Handle raw SQL queries
         if action == "query":
@@ -398,18 +400,15 @@ def handle_event_with_secret(
             if not sql:
                 raise ValueError("SQL query not provided")
 
-            result = session.execute(text(sql))
-            rows = [dict(row._mapping) for row in result]
-            session.close()
+            with database.session() as (_engine, session):
+                result = session.execute(text(sql))
+                rows = [dict(row._mapping) for row in result]
             return _create_response("query", serialize_for_json(rows))
 
-        session.close()
         raise ValueError(f"Unknown action: {action}")
 
     except Exception as e:
         LOG.error(f"Error in handle_event_with_secret: {str(e)}", exc_info=True)
-        if "session" in locals():
-            session.close()
         return {"error": str(e), "action": event.get("action", "unknown")}
 
 
@@ -0,0 +1,284 @@
+"""
+Module to resolve names of the lookup tables to their ids.
+
+The lookup tables (campaigns, instruments, measurement types, observers and
+DOIs) are small and referenced by every row of the data tables. A
+:py:class:`LookupResolver` keeps their names and ids in dictionaries, so
+repeated lookups do not query the database and whole columns of names are
+resolved with at most one select and one insert per table.
+"""
+import logging
+
+import pandas as pd
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .tables import (
+    DOI, Campaign, CampaignObservation, Instrument, MeasurementType, Observer
+)
+
+LOG = logging.getLogger(__name__)
+
+# Lookup name -> column holding the name in the lookup table
+LOOKUPS = {
+    'campaign': Campaign.name,
+    'doi': DOI.doi,
+    'instrument': Instrument.name,
+    'observer': Observer.name,
+    'type': MeasurementType.name,
+}
+
+
+def _names(values):
+    """
+    Unique, non-null values of a column
+    """
+    return set(pd.Series(values, dtype=object).dropna().unique())
+
+
+class LookupResolver:
+    """
+    Resolve names of lookup tables and campaign observations to ids.
+
+    Only ids found in or added to the database are cached, unknown names are
+    looked up again on the next call. Names are not unique in the lookup
+    tables, all ids of a name are cached with the name. The cache is not
+    transactional. When a transaction that added names is rolled back, call
+    :py:meth:`clear` before using the resolver again.
+    """
+
+    def __init__(self):
+        self._ids = {lookup: {} for lookup in LOOKUPS}
+        self._observations = {}
+
+    def clear(self):
+        """
+        Remove all cached ids
+        """
+        for ids in self._ids.values():
+            ids.clear()
+        self._observations.clear()
+
+    def preload(self, connection, lookups=None):
+        """
+        Read all entries of lookup tables into the cache
+
+        Args:
+            connection: SQLAlchemy connection
+            lookups: List of lookup names to load. Defaults to all in
+                     :py:data:`LOOKUPS`
+        """
+        for lookup in lookups or LOOKUPS:
+            self._ids[lookup].update(
+                self._select(connection, LOOKUPS[lookup])
+            )
+
+    @staticmethod
+    def _select(connection, column, values=None):
+        """
+        Ids of names in a lookup table, in ascending order per name
+        """
+        table = column.class_.__table__
+        qry = select(column, table.c.id).order_by(table.c.id)
+        if values is not None:
+            qry = qry.where(column.in_(values))
+
+        ids = {}
+        for name, id in connection.execute(qry).all():
+            ids[name] = ids.get(name, ()) + (id,)
+        return ids
+
+    @staticmethod
+    def _lock(connection, table):
+        """
+        Serialize inserts into a table across concurrent loaders until the
+        end of the current transaction.
+        """
+        connection.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(table.fullname)))
+        )
+
+    def _cached(self, connection, lookup, values, create=False,
+                defaults=None):
+        """
+        Cached ids of the names, after reading or creating the missing ones
+        """
+        if lookup not in LOOKUPS:
+            raise ValueError(
+                f"Unknown lookup {lookup}. Use any of {list(LOOKUPS)}"
+            )
+
+        column = LOOKUPS[lookup]
+        cache = self._ids[lookup]
+        values = _names(values)
+
+        missing = values - cache.keys()
+        if missing:
+            cache.update(self._select(connection, column, missing))
+            missing = values - cache.keys()
+
+        if missing and create:
+            table = column.class_.__table__
+            self._lock(connection, table)
+            # Another loader may have added names while waiting for the lock
+            cache.update(self._select(connection, column, missing))
+            missing = values - cache.keys()
+
+            if missing:
+                defaults = defaults or {}
+                rows = [
+                    {column.key: value, **defaults.get(value, {})}
+                    for value in sorted(missing)
+                ]
+                cache.update(
+                    (name, (id,)) for name, id in connection.execute(
+                        insert(table).returning(
+                            table.c[column.key], table.c.id
+                        ),
+                        rows
+                    ).all()
+                )
+                LOG.debug(f'Added {len(rows)} entries to {table.name}')
+
+        return {value: cache[value] for value in values if value in cache}
+
+    def ids(self, connection, lookup, values, create=False, defaults=None):
+        """
+        Resolve names of a lookup table to ids. Names that are not unique
+        in the table resolve to the first entry, new rows reference that
+        one.
+
+        Args:
+            connection: SQLAlchemy connection
+            lookup: Name of the lookup, one of :py:data:`LOOKUPS`
+            values: Iterable of names
+            create: Insert names that do not exist in the table
+            defaults: Optional dictionary of name -> dictionary of additional
+                      column values for new entries
+
+        Returns:
+            Dictionary - name -> id for all names that exist
+        """
+        return {
+            name: ids[0] for name, ids in self._cached(
+                connection, lookup, values, create=create, defaults=defaults
+            ).items()
+        }
+
+    def all_ids(self, connection, lookup, values):
+        """
+        All ids of names of a lookup table, to filter the rows that
+        reference any entry with the names
+
+        Args:
+            connection: SQLAlchemy connection
+            lookup: Name of the lookup, one of :py:data:`LOOKUPS`
+            values: Iterable of names
+
+        Returns:
+            List - ids of the names that exist
+        """
+        return sorted(
+            id for ids in self._cached(connection, lookup, values).values()
+            for id in ids
+        )
+
+    def resolve(self, connection, lookup, values, create=False,
+                defaults=None):
+        """
+        Same as :py:meth:`ids` but for a whole column of names
+
+        Returns:
+            pandas Series - id for each name, NaN for unknown names
+        """
+        values = pd.Series(values)
+        ids = self.ids(
+            connection, lookup, values, create=create, defaults=defaults
+        )
+        return values.map(ids)
+
+    def _select_observations(self, connection, keys):
+        table = CampaignObservation.__table__
+        rows = connection.execute(
+            select(table.c.name, table.c.date, table.c.id)
+            .where(tuple_(table.c.name, table.c.date).in_(keys))
+        ).all()
+        self._observations.update(
+            ((name, date), id) for name, date, id in rows
+        )
+
+    def observation_ids(self, connection, df, observation_type,
+                        create=False):
+        """
+        Resolve campaign observations, which are unique by name and date,
+        to ids.
+
+        Args:
+            connection: SQLAlchemy connection
+            df: DataFrame with the columns ``observation`` and ``date``. To
+                create observations, the columns ``campaign``,
+                ``instrument``, ``observer`` and ``doi`` are required and
+                ``description`` is optional.
+            observation_type: Class of the observation, e.g. PointObservation
+            create: Insert observations that do not exist in the table
+
+        Returns:
+            pandas Series - observation id for each row of df
+        """
+        keys = list(zip(df['observation'], df['date']))
+        missing = set(keys) - self._observations.keys()
+        if missing:
+            self._select_observations(connection, list(missing))
+            missing -= self._observations.keys()
+
+        if missing and create:
+            new = df.drop_duplicates(subset=['observation', 'date'])
+            new = new.loc[[
+                key in missing
+                for key in zip(new['observation'], new['date'])
+            ]]
+
+            campaigns = self.ids(
+                connection, 'campaign', new['campaign'], create=True
+            )
+            instruments = self.ids(
+                connection, 'instrument', new['instrument'], create=True
+            )
+            observers = self.ids(
+                connection, 'observer', new['observer'], create=True
+            )
+            dois = self.ids(connection, 'doi', new['doi'], create=True)
+
+            rows = [
+                {
+                    'name': row['observation'],
+                    'date': row['date'],
+                    'description': row.get('description'),
+                    'type': observation_type.__mapper__.polymorphic_identity,
+                    'campaign_id': campaigns[row['campaign']],
+                    'instrument_id': instruments[row['instrument']],
+                    'observers_id': observers[row['observer']],
+                    'doi_id': dois[row['doi']],
+                }
+                for _, row in new.iterrows()
+            ]
+            table = CampaignObservation.__table__
+            created = connection.execute(
+                pg_insert(table).on_conflict_do_nothing(
+                    index_elements=['name', 'date']
+                ).returning(table.c.name, table.c.date, table.c.id),
+                rows
+            ).all()
+            self._observations.update(
+                ((name, date), id) for name, date, id in created
+            )
+
+            # Observations added by a concurrent loader conflict and are
+            # not returned from the insert
+            missing -= self._observations.keys()
+            if missing:
+                self._select_observations(connection, list(missing))
+
+        return pd.Series(
+            [self._observations.get(key) for key in keys], index=df.index
+        )
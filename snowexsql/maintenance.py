@@ -0,0 +1,438 @@
+"""
+Module with maintenance routines for database administrators. None of these
+are needed to query the database, they keep derived tables and the physical
+layout of the database in shape after new data was loaded.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from snowexsql.db import (
+    LAYER_PARTITIONS, PARTITIONS, POINT_PARTITION_YEARS, partition_statements,
+    partitioned_table
+)
+from snowexsql.tables import LayerData, PointData, Site
+from snowexsql.tables.base import Base
+
+LOG = logging.getLogger(__name__)
+
+# Downsampling factors for raster overviews
+OVERVIEW_FACTORS = (2, 4, 8, 16)
+
+# Geohash length of the sort key for spatial clustering, about 1 m cells
+GEOHASH_PRECISION = 10
+# Tables covered by the index report
+REPORT_TABLES = (
+    PointData.__table__.fullname,
+    LayerData.__table__.fullname,
+    Site.__table__.fullname,
+)
+# Block range indexes need rows ordered by their column. Below this
+# absolute correlation of the column with the row order they rarely skip
+# any blocks.
+BRIN_MIN_CORRELATION = 0.9
+# Tables with fewer rows are fine to read sequentially
+SEQUENTIAL_SCAN_ROWS = 100_000
+
+
+def build_raster_overviews(connection, factors=OVERVIEW_FACTORS,
+                           algorithm='NearestNeighbor'):
+    """
+    Build downsampled copies of all tiles in the images table that do not
+    have an overview for the requested factors yet. Similar to PostGIS
+    ST_CreateOverview, but each overview tile keeps the link to its full
+    resolution tile so all image filters still apply.
+
+    Each tile is rescaled on its own. When its width or height is not a
+    multiple of the factor, the last overview pixel reaches past the tile.
+    Such tiles only get an overview when that part covers no other tile of
+    the same image, e.g. the partial tiles at the right and bottom edge of
+    an image. Images missing a factor are read at full resolution, see
+    RasterMeasurements._select_overview.
+
+    Args:
+        connection: SQLAlchemy connection
+        factors: Iterable of integer downsampling factors
+        algorithm: Resampling algorithm passed to ST_Rescale. The default
+                   does not blend nodata into the pixels at tile edges.
+
+    Returns:
+        Dictionary - Number of overview tiles created per factor
+    """
+    # Extent of the overview tile, without any pixel values
+    overview_extent = (
+        "ST_Envelope(ST_MakeEmptyRaster("
+        "CEIL(ST_Width(i.raster) / CAST(:factor AS float))::integer, "
+        "CEIL(ST_Height(i.raster) / CAST(:factor AS float))::integer, "
+        "ST_UpperLeftX(i.raster), ST_UpperLeftY(i.raster), "
+        "ST_ScaleX(i.raster) * :factor, ST_ScaleY(i.raster) * :factor, "
+        "ST_SkewX(i.raster), ST_SkewY(i.raster), ST_SRID(i.raster)))"
+    )
+    created = {}
+    for factor in factors:
+        result = connection.execute(
+            text(
+                "INSERT INTO public.image_overviews "
+                "(image_id, factor, raster) "
+                "SELECT i.id, :factor, ST_Rescale("
+                "i.raster, ST_ScaleX(i.raster) * :factor, "
+                "ST_ScaleY(i.raster) * :factor, :algorithm) "
+                "FROM public.images i "
+                "WHERE NOT EXISTS ("
+                "SELECT 1 FROM public.image_overviews o "
+                "WHERE o.image_id = i.id AND o.factor = :factor) "
+                "AND ("
+                "(ST_Width(i.raster) % :factor = 0 "
+                "AND ST_Height(i.raster) % :factor = 0) "
+                "OR NOT EXISTS ("
+                "SELECT 1 FROM public.images n "
+                "WHERE n.observation_id = i.observation_id "
+                "AND n.measurement_type_id = i.measurement_type_id "
+                "AND n.id <> i.id "
+                "AND ST_Area(ST_Intersection(ST_Envelope(n.raster), "
+                f"ST_Difference({overview_extent}, "
+                "ST_Envelope(i.raster)))) > 0))"
+            ),
+            {'factor': factor, 'algorithm': algorithm}
+        )
+        created[factor] = result.rowcount
+        LOG.info(f'Created {result.rowcount} overview tiles at {factor}x')
+
+    return created
+
+
+def create_raster_overviews(engine, factors=OVERVIEW_FACTORS,
+                            algorithm='NearestNeighbor'):
+    """
+    Build the missing raster overviews in a single transaction, see
+    :py:func:`build_raster_overviews`
+
+    Args:
+        engine: SQLAlchemy engine
+        factors: Iterable of integer downsampling factors
+        algorithm: Resampling algorithm passed to ST_Rescale
+
+    Returns:
+        Dictionary - Number of overview tiles created per factor
+    """
+    with engine.begin() as connection:
+        return build_raster_overviews(connection, factors, algorithm)
+
+
+def migrate_to_partitions(connection, table, years=POINT_PARTITION_YEARS,
+                          modulus=LAYER_PARTITIONS):
+    """
+    Move the rows of a data table into the partitioned layout created by
+    snowexsql.db.initialize. The existing table is renamed, the partitioned
+    table is created under the original name, filled and the old table
+    dropped. Ids are kept and the new sequence continues after them.
+
+    Queries on points with a date filter only read the partitions of its
+    years. Layers are spread over hash partitions of their site id. Their
+    filters on campaigns, DOIs, observers and dates resolve to lists of
+    site ids, which only skip partitions when few sites match. A campaign
+    or date range usually matches sites in every partition, so these
+    queries read all layer partitions through their site_id indexes.
+
+    Args:
+        connection: SQLAlchemy connection with an open transaction
+        table: SQLAlchemy Table, one of snowexsql.db.PARTITIONS
+        years: Years with their own partition for the points table
+        modulus: Number of hash partitions for the layers table
+
+    Returns:
+        Integer - Number of moved rows, None if the table is partitioned
+                  already
+    """
+    kind = connection.scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+        {'name': table.fullname}
+    )
+    if kind == 'p':
+        LOG.info(f'{table.fullname} is partitioned already')
+        return None
+
+    old = f'{table.name}_unpartitioned'
+    connection.execute(text(f'ALTER TABLE {table.fullname} RENAME TO {old}'))
+
+    # Free the names of the sequence and indexes for the new table
+    sequence = connection.scalar(
+        text("SELECT pg_get_serial_sequence(:name, 'id')"),
+        {'name': f'{table.schema}.{old}'}
+    )
+    connection.execute(text(f'ALTER SEQUENCE {sequence} RENAME TO {old}_id_seq'))
+    indexes = connection.scalars(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = :schema AND tablename = :name"
+        ),
+        {'schema': table.schema, 'name': old}
+    ).all()
+    for index in indexes:
+        connection.execute(
+            text(f'ALTER INDEX {table.schema}.{index} RENAME TO {index}_old')
+        )
+
+    partitioned = partitioned_table(table)
+    partitioned.create(connection)
+    for statement in partition_statements(partitioned, years, modulus):
+        connection.execute(text(statement))
+
+    columns = ', '.join(column.name for column in table.columns)
+    result = connection.execute(
+        text(
+            f'INSERT INTO {table.fullname} ({columns}) '
+            f'SELECT {columns} FROM {table.schema}.{old}'
+        )
+    )
+    connection.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence(:name, 'id'), "
+            f"COALESCE(MAX(id), 0) + 1, false) FROM {table.fullname}"
+        ),
+        {'name': table.fullname}
+    )
+    connection.execute(text(f'DROP TABLE {table.schema}.{old}'))
+    connection.execute(text(f'ANALYZE {table.fullname}'))
+
+    LOG.info(f'Moved {result.rowcount} rows into partitions of {table.fullname}')
+    return result.rowcount
+
+
+def partition_tables(engine, years=POINT_PARTITION_YEARS,
+                     modulus=LAYER_PARTITIONS):
+    """
+    Migrate the points and layers tables of an existing database to
+    partitioned tables in a single transaction. Both tables are locked
+    while their rows are copied.
+
+    Args:
+        engine: SQLAlchemy engine
+        years: Years with their own partition for the points table
+        modulus: Number of hash partitions for the layers table
+
+    Returns:
+        Dictionary - Number of moved rows per table
+    """
+    moved = {}
+    with engine.begin() as connection:
+        for name in PARTITIONS:
+            moved[name] = migrate_to_partitions(
+                connection, Base.metadata.tables[name], years, modulus
+            )
+
+    return moved
+
+
+def create_tables(engine):
+    """
+    Create the tables declared in snowexsql.tables that are missing in an
+    existing database, e.g. the data_loads table after an update.
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        List - Full names of the created tables
+    """
+    with engine.begin() as connection:
+        missing = [
+            table for table in Base.metadata.sorted_tables
+            if not inspect(connection).has_table(
+                table.name, schema=table.schema
+            )
+        ]
+        for table in missing:
+            LOG.info(f'Creating table {table.fullname}')
+        Base.metadata.create_all(bind=connection, tables=missing)
+
+    return [table.fullname for table in missing]
+
+
+def create_indexes(engine, tables=REPORT_TABLES):
+    """
+    Create the indexes declared with the tables that are missing in an
+    existing database, e.g. after an update of snowexsql added new ones.
+
+    Args:
+        engine: SQLAlchemy engine
+        tables: Full names of the tables to check
+
+    Returns:
+        List - Names of the created indexes
+    """
+    created = []
+    with engine.begin() as connection:
+        existing = set(
+            connection.scalars(
+                text(
+                    "SELECT indexname FROM pg_indexes "
+                    "WHERE schemaname || '.' || tablename = ANY(:tables)"
+                ),
+                {'tables': list(tables)}
+            )
+        )
+        for name in tables:
+            for index in Base.metadata.tables[name].indexes:
+                if index.name not in existing:
+                    LOG.info(f'Creating index {index.name}')
+                    index.create(connection)
+                    created.append(index.name)
+
+    return created
+
+
+def _cluster_targets(connection, table, index):
+    """
+    Tables and indexes CLUSTER runs on, the partitions and their index for
+    a partitioned table
+    """
+    targets = connection.execute(
+        text(
+            "SELECT CAST(t.inhrelid AS regclass)::text, "
+            "CAST(i.inhrelid AS regclass)::text "
+            "FROM pg_inherits t "
+            "JOIN pg_index x ON x.indrelid = t.inhrelid "
+            "JOIN pg_inherits i ON i.inhrelid = x.indexrelid "
+            "AND i.inhparent = CAST(:index AS regclass) "
+            "WHERE t.inhparent = CAST(:table AS regclass)"
+        ),
+        {'table': table, 'index': index}
+    ).all()
+
+    return targets or [(table, index)]
+
+
+def cluster_table(connection, table=PointData.__table__,
+                  precision=GEOHASH_PRECISION):
+    """
+    Store the rows of a table with point geometries in the order of their
+    geohash. Points close to each other end up on the same pages, so
+    spatial queries read a fraction of the pages and the block range
+    index on geom becomes selective. All geometries need a SRID.
+
+    CLUSTER locks the table exclusively and rewrites it, new rows are
+    appended unordered until this is run again.
+
+    Args:
+        connection: SQLAlchemy connection with an open transaction
+        table: SQLAlchemy Table with a geom column
+        precision: Length of the geohash used as sort key
+
+    Returns:
+        Integer - Number of clustered tables, partitions count separately
+    """
+    index = f'idx_{table.name}_geohash'
+    connection.execute(
+        text(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table.fullname} '
+            f'(ST_GeoHash(ST_Transform(geom, 4326), {int(precision)}))'
+        )
+    )
+    # Block range indexes declared with the table. Rows ordered by
+    # location are not ordered by date, which a date index would need.
+    for brin in table.indexes:
+        if brin.dialect_options['postgresql']['using'] == 'brin':
+            brin.create(connection, checkfirst=True)
+
+    targets = _cluster_targets(
+        connection, table.fullname, f'{table.schema}.{index}'
+    )
+    for target, target_index in targets:
+        connection.execute(text(f'CLUSTER {target} USING {target_index}'))
+    connection.execute(text(f'ANALYZE {table.fullname}'))
+
+    LOG.info(f'Clustered {len(targets)} tables of {table.fullname}')
+    return len(targets)
+
+
+def _table_advice(table):
+    if (
+        table['rows'] > SEQUENTIAL_SCAN_ROWS
+        and table['sequential_scans'] > table['index_scans']
+    ):
+        return 'Mostly read with sequential scans, check the query filters'
+    return None
+
+
+def _index_advice(index):
+    if index['scans'] == 0 and not index['unique']:
+        return 'Never used, consider dropping it'
+    elif (
+        index['method'] == 'brin' and index['correlation'] is not None
+        and index['correlation'] < BRIN_MIN_CORRELATION
+    ):
+        return 'Rows are not ordered by the column, run cluster_table'
+    return None
+
+
+def index_report(engine, tables=REPORT_TABLES):
+    """
+    Report the use of the data tables and their indexes since the
+    statistics of the database were last reset. Partitions are summed up
+    with their table. Each entry has an advice, None when nothing stands
+    out.
+
+    Args:
+        engine: SQLAlchemy engine
+        tables: Full names of the tables to report on
+
+    Returns:
+        Dictionary - Lists of dictionaries under 'tables' and 'indexes'
+    """
+    parameters = {'tables': list(tables)}
+    with engine.connect() as connection:
+        table_stats = connection.execute(
+            text(
+                "SELECT CAST(COALESCE(i.inhparent, s.relid) AS regclass)::text "
+                "AS table, "
+                "CAST(SUM(s.n_live_tup) AS bigint) AS rows, "
+                "CAST(SUM(s.seq_scan) AS bigint) AS sequential_scans, "
+                "CAST(SUM(COALESCE(s.idx_scan, 0)) AS bigint) AS index_scans "
+                "FROM pg_stat_user_tables s "
+                "LEFT JOIN pg_inherits i ON i.inhrelid = s.relid "
+                "WHERE COALESCE(i.inhparent, s.relid) "
+                "= ANY(CAST(:tables AS regclass[])) "
+                "GROUP BY 1 ORDER BY 1"
+            ),
+            parameters
+        ).mappings().all()
+        index_stats = connection.execute(
+            text(
+                "SELECT CAST(COALESCE(ti.inhparent, s.relid) AS regclass)::text "
+                "AS table, "
+                "CAST(COALESCE(ii.inhparent, s.indexrelid) AS regclass)::text "
+                "AS index, "
+                "am.amname AS method, "
+                "bool_or(x.indisunique) AS unique, "
+                "CAST(SUM(s.idx_scan) AS bigint) AS scans, "
+                "CAST(SUM(pg_relation_size(s.indexrelid)) AS bigint) AS size, "
+                "AVG(ABS(st.correlation)) AS correlation "
+                "FROM pg_stat_user_indexes s "
+                "JOIN pg_index x ON x.indexrelid = s.indexrelid "
+                "JOIN pg_class c ON c.oid = s.indexrelid "
+                "JOIN pg_am am ON am.oid = c.relam "
+                "LEFT JOIN pg_inherits ti ON ti.inhrelid = s.relid "
+                "LEFT JOIN pg_inherits ii ON ii.inhrelid = s.indexrelid "
+                "LEFT JOIN pg_attribute a ON a.attrelid = s.relid "
+                "AND a.attnum = x.indkey[0] "
+                "LEFT JOIN pg_stats st ON st.schemaname = s.schemaname "
+                "AND st.tablename = s.relname AND st.attname = a.attname "
+                "AND NOT st.inherited "
+                "WHERE COALESCE(ti.inhparent, s.relid) "
+                "= ANY(CAST(:tables AS regclass[])) "
+                "GROUP BY 1, 2, 3 ORDER BY 1, 2"
+            ),
+            parameters
+        ).mappings().all()
+
+    report = {
+        'tables': [dict(row) for row in table_stats],
+        'indexes': [dict(row) for row in index_stats],
+    }
+    for table in report['tables']:
+        table['advice'] = _table_advice(table)
+    for index in report['indexes']:
+        index['advice'] = _index_advice(index)
+
+    return report
@@ -0,0 +1,449 @@
+"""
+Module to read SnowEx data files into DataFrames that the functions in
+:py:mod:`snowexsql.ingest` can load.
+
+Supported are the formats delivered with the campaigns:
+
+* Pit sheets with a ``# key,value`` header. Files with data rows hold one
+  profile per value column (density, LWC, SSA, temperature, stratigraphy,
+  ...), files without data rows only hold the site details.
+* SnowMicroPen profiles (``S06M0874_2N12_20200131.CSV``) with an optional
+  SMP log in the same directory naming the observer of each profile.
+* Snow depth transects with one measurement per row and the measurement
+  tool in the first column.
+"""
+import csv
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+# Used for required lookups that are not stated in a file
+UNKNOWN = 'unknown'
+
+# Columns of pit sheets holding depths instead of values
+DEPTH_COLUMNS = {
+    'top': 'depth',
+    'height': 'depth',
+    'sample_top_height': 'depth',
+    'bottom': 'bottom_depth',
+}
+
+# Site details in pit sheet headers -> Site columns
+SITE_DETAILS = {
+    'slope': 'slope_angle',
+    'aspect': 'aspect',
+    'air_temp': 'air_temp',
+    'total_depth': 'total_depth',
+    'weather': 'weather_description',
+    'precip': 'precip',
+    'sky': 'sky_cover',
+    'wind': 'wind',
+    'ground_condition': 'ground_condition',
+    'ground_roughness': 'ground_roughness',
+    'ground_vegetation': 'ground_vegetation',
+    'vegetation_height': 'vegetation_height',
+    'tree_canopy': 'tree_canopy',
+    'comments': 'comments',
+    'notes': 'comments',
+}
+# Site details stored as numbers
+NUMERIC_SITE_DETAILS = ['slope_angle', 'air_temp', 'total_depth']
+
+# Measurement tool codes of depth transects
+DEPTH_TOOLS = {
+    'MP': 'magnaprobe',
+    'M2': 'mesa2',
+    'PR': 'pit ruler',
+}
+
+# Name of SMP profile files, e.g. S06M0874_2N12_20200131.CSV
+SMP_FILE = re.compile(r'^S(?P<serial>\w+)M(?P<suffix>\d+)_(?P<site>[^_]+)_')
+
+
+@dataclass
+class ParsedFile:
+    """
+    Data of a single file, normalized to the columns expected by
+    :py:func:`snowexsql.ingest.resolve_sites`,
+    :py:func:`snowexsql.ingest.bulk_load_layers` and
+    :py:func:`snowexsql.ingest.bulk_load_points`.
+    """
+    path: str
+    sites: gpd.GeoDataFrame = None
+    layers: gpd.GeoDataFrame = None
+    points: gpd.GeoDataFrame = None
+
+
+def standardize_name(name):
+    """
+    Lowercase column or header name without units, e.g.
+    ``Specific surface area (m^2/kg)`` becomes ``specific_surface_area``
+
+    Returns:
+        tuple: **name** - standardized name
+               **units** - units from parentheses or brackets or None
+    """
+    units = re.search(r'[(\[]([^)\]]*)[)\]]', name)
+    name = re.sub(r'[(\[][^)\]]*[)\]]', '', name)
+    name = name.strip().strip('#:').strip().lower()
+    name = re.sub(r'[^a-z0-9]+', '_', name).strip('_')
+    return name, units.group(1).strip() if units else None
+
+
+def utm_epsg(zone):
+    """
+    EPSG code of NAD83 UTM zones as used for the SnowEx data, e.g. 26912
+
+    Args:
+        zone: Zone as string like ``12N`` or integer
+    """
+    return int(f"269{int(re.sub(r'[^0-9]', '', str(zone))):02d}")
+
+
+def _localize(datetimes, timezone):
+    datetimes = pd.to_datetime(datetimes)
+    if datetimes.dt.tz is None:
+        datetimes = datetimes.dt.tz_localize(timezone)
+    return datetimes.dt.tz_convert('UTC')
+
+
+def _read_rows(path):
+    """
+    Rows of a CSV file. Values spanning multiple lines are quoted.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        return [row for row in csv.reader(file) if any(c.strip() for c in row)]
+
+
+def read_smp_log(path):
+    """
+    Observers of SMP profiles from an SMP log.
+
+    Returns:
+        Dictionary - (site, file suffix) -> observer name
+    """
+    rows = _read_rows(path)
+    initials = {}
+    for row in rows:
+        if row[0].upper().startswith('#OBSERVER'):
+            initials = {
+                code: name.strip()
+                for name, code in re.findall(r'([^,(]+)\((\w+)\)', row[1])
+            }
+
+    start = next(i for i, row in enumerate(rows) if row[0] == 'Date')
+    log = pd.DataFrame(rows[start + 1:]).iloc[:, :len(rows[start])]
+    log.columns = [standardize_name(c)[0] for c in rows[start]]
+    return {
+        (row['pit_id'], row['fname_sufix']): initials.get(
+            row['observer'], row['observer']
+        )
+        for _, row in log.iterrows()
+    }
+
+
+def _pit_header(rows):
+    """
+    Split a pit sheet into its ``# key,value`` header and the data rows
+    with their column names.
+    """
+    header = [row for row in rows if row[0].startswith('#')]
+    data = rows[len(header):]
+
+    columns = None
+    if data:
+        columns = header.pop()
+
+    info = {}
+    for row in header:
+        key, _units = standardize_name(row[0])
+        if key and len(row) > 1:
+            info[key] = ','.join(row[1:]).strip()
+
+    return info, columns, data
+
+
+def _pit_datetime(info, timezone):
+    key = next(k for k in info if k.startswith('date'))
+    # 2020-02-05-13:30 or 2020-03-12T14:45
+    value = re.sub(r'(\d{4}-\d{2}-\d{2})[-T ]', r'\1 ', info[key])
+    return _localize(pd.Series([value]), timezone).iloc[0]
+
+
+def read_pit_file(path, campaign=None, doi=None, observer=None,
+                  instrument=None, timezone='UTC', **kwargs):
+    """
+    Read a pit sheet into a site and the layers of its profiles. Sample
+    columns (e.g. density A, B and C) are averaged into a single value.
+
+    Args:
+        path: Path to the file
+        campaign: Campaign name. Defaults to the Location of the header
+        doi: DOI of the data
+        observer: Observer name. Defaults to the Surveyors or Operator of
+                  the header
+        instrument: Instrument name. Defaults to the Instrument of the header
+        timezone: Timezone of the header date when not stated in the file
+        kwargs: Ignored options of other readers
+
+    Returns:
+        :py:class:`ParsedFile`
+    """
+    info, columns, data = _pit_header(_read_rows(path))
+
+    crs = utm_epsg(info['utm_zone'])
+    site = {
+        'site': info.get('pitid', info.get('site')),
+        'datetime': _pit_datetime(info, timezone),
+        'campaign': campaign or info.get('location'),
+        'doi': doi,
+        'observer': observer or info.get('surveyors') or info.get('operator'),
+        'description': info.get('site'),
+    }
+    for key, column in SITE_DETAILS.items():
+        if key in info:
+            site[column] = info[key]
+
+    sites = gpd.GeoDataFrame(
+        [site],
+        geometry=gpd.points_from_xy(
+            [float(info['easting'])], [float(info['northing'])]
+        ),
+        crs=crs,
+    )
+    for column in NUMERIC_SITE_DETAILS:
+        if column in sites:
+            sites[column] = pd.to_numeric(
+                sites[column].str.extract(r'(-?[\d.]+)')[0], errors='coerce'
+            )
+
+    if columns is None:
+        return ParsedFile(str(path), sites=sites)
+
+    names = [standardize_name(c) for c in columns]
+    df = pd.DataFrame(
+        [row + [None] * (len(names) - len(row)) for row in data]
+    ).iloc[:, :len(names)]
+    df.columns = range(len(names))
+
+    depths = {}
+    profiles = {}
+    for index, (name, units) in enumerate(names):
+        if name in DEPTH_COLUMNS:
+            depths[DEPTH_COLUMNS[name]] = pd.to_numeric(
+                df[index], errors='coerce'
+            )
+        elif name:
+            # Samples of the same measurement end in a single letter
+            name = re.sub(r'_[a-z]$', '', name)
+            profiles.setdefault((name, units), []).append(index)
+
+    layers = []
+    for (name, units), indices in profiles.items():
+        values = df[indices].replace({'NaN': None, 'N/A': None, '': None})
+        numbers = values.apply(pd.to_numeric, errors='coerce')
+        if numbers.notna().sum().sum() == values.notna().sum().sum():
+            value = numbers.mean(axis=1).round(6).astype(str)
+            value = value.where(numbers.notna().any(axis=1))
+        else:
+            value = values.iloc[:, 0]
+
+        layers.append(pd.DataFrame({
+            **depths,
+            'value': value,
+            'type': name,
+            'units': units,
+        }).dropna(subset=['value']))
+
+    layers = pd.concat(layers, ignore_index=True)
+    if 'bottom_depth' not in layers:
+        layers['bottom_depth'] = None
+    for key in ['site', 'datetime', 'campaign', 'doi', 'observer']:
+        layers[key] = site[key]
+    layers['instrument'] = instrument or info.get('instrument') or UNKNOWN
+
+    layers = gpd.GeoDataFrame(
+        layers,
+        geometry=[sites.geometry.iloc[0]] * len(layers),
+        crs=crs,
+    )
+    return ParsedFile(str(path), sites=sites, layers=layers)
+
+
+def read_smp_profile(path, campaign=None, doi=None, observer=None,
+                     smp_log=None, **kwargs):
+    """
+    Read a SnowMicroPen profile. The force profile is stored as layers of
+    a site named after the pit of the profile. Depths are converted to cm.
+
+    Args:
+        path: Path to the file
+        campaign: Campaign name
+        doi: DOI of the data
+        observer: Observer name. Defaults to the observer in the SMP log
+        smp_log: Result of :py:func:`read_smp_log`
+        kwargs: Ignored options of other readers
+
+    Returns:
+        :py:class:`ParsedFile`
+    """
+    if campaign is None:
+        raise ValueError('A campaign is required for SMP profiles')
+
+    path = Path(path)
+    rows = _read_rows(path)
+    info = {}
+    for row in rows:
+        if not row[0].startswith('#'):
+            break
+        key, _, value = ','.join(row).lstrip('#').partition(':')
+        info[standardize_name(key)[0]] = value.strip()
+
+    data = pd.read_csv(path, comment='#')
+    names = [standardize_name(c)[0] for c in data.columns]
+    data.columns = names
+
+    match = SMP_FILE.match(path.name)
+    site_name = match.group('site') if match else path.stem
+    if observer is None and smp_log and match:
+        observer = smp_log.get((site_name, match.group('suffix')))
+
+    datetime = pd.Timestamp(f"{info['date']} {info['time']}", tz='UTC')
+    location = gpd.GeoSeries(
+        gpd.points_from_xy([float(info['lon'])], [float(info['lat'])]),
+        crs=4326,
+    )
+    zone = int((float(info['lon']) + 180) / 6) + 1
+    location = location.to_crs(utm_epsg(zone))
+
+    sites = gpd.GeoDataFrame(
+        [{
+            'site': site_name,
+            'datetime': datetime,
+            'campaign': campaign,
+            'doi': doi,
+            'observer': observer or UNKNOWN,
+            'description': f'SMP profile {path.stem}',
+        }],
+        geometry=location.values,
+        crs=location.crs,
+    )
+
+    layers = pd.DataFrame({
+        'depth': data['depth'] / 10,
+        'bottom_depth': None,
+        'value': data['force'].astype(str),
+        'type': 'force',
+        'units': 'N',
+        'instrument': f"snowmicropen {info.get('smp_serial_number', '')}"
+                      .strip(),
+    })
+    for key in ['site', 'datetime', 'campaign', 'doi', 'observer']:
+        layers[key] = sites[key].iloc[0]
+
+    layers = gpd.GeoDataFrame(
+        layers, geometry=[location.iloc[0]] * len(layers), crs=location.crs
+    )
+    return ParsedFile(str(path), sites=sites, layers=layers)
+
+
+def read_depth_file(path, campaign=None, doi=None, observer=None,
+                    timezone='UTC', **kwargs):
+    """
+    Read a snow depth transect. Every measurement tool in the file becomes
+    an observation named after the file and the tool.
+
+    Args:
+        path: Path to the file
+        campaign: Campaign name
+        doi: DOI of the data
+        observer: Observer name
+        timezone: Timezone of the dates when not in UTC
+        kwargs: Ignored options of other readers
+
+    Returns:
+        :py:class:`ParsedFile`
+    """
+    if campaign is None:
+        raise ValueError('A campaign is required for depth transects')
+
+    path = Path(path)
+    df = pd.read_csv(path, dtype=str)
+    columns = {standardize_name(c)[0]: c for c in df.columns}
+
+    tool = df[columns['measurement_tool']].str.strip()
+    date = df[columns['date']]
+    time = df[columns['time']]
+    # Times are local unless stated in the column name
+    utc = 'utc' in columns['time'].lower()
+    datetime = _localize(
+        pd.to_datetime(date + ' ' + time, format='%Y%m%d %H:%M'),
+        'UTC' if utc else timezone
+    )
+
+    points = gpd.GeoDataFrame(
+        {
+            'value': pd.to_numeric(df[columns['depth']]),
+            'datetime': datetime,
+            'elevation': pd.to_numeric(df[columns['elevation']])
+            if 'elevation' in columns else None,
+            'type': 'depth',
+            'units': 'cm',
+            'instrument': tool.map(DEPTH_TOOLS).fillna(tool),
+            'campaign': campaign,
+            'observer': observer or UNKNOWN,
+            'doi': doi,
+        },
+        geometry=gpd.points_from_xy(
+            pd.to_numeric(df[columns['longitude']]),
+            pd.to_numeric(df[columns['latitude']]),
+        ),
+        crs=4326,
+    )
+    points['observation'] = path.stem + ' ' + points['instrument']
+
+    zone = int((points.geometry.x.mean() + 180) / 6) + 1
+    return ParsedFile(str(path), points=points.to_crs(utm_epsg(zone)))
+
+
+def file_reader(path):
+    """
+    Reader function for a file or None when the file is not supported
+    """
+    path = Path(path)
+    if SMP_FILE.match(path.name):
+        return read_smp_profile
+
+    with open(path, encoding='utf-8-sig') as file:
+        first = file.readline()
+
+    if first.startswith('# Location'):
+        return read_pit_file
+    elif first.lower().startswith('measurement tool'):
+        return read_depth_file
+    return None
+
+
+def parse_file(path, **kwargs):
+    """
+    Read a file with the reader matching its format
+
+    Args:
+        path: Path to the file
+        kwargs: Options passed to the reader
+
+    Returns:
+        :py:class:`ParsedFile` or None when the format is not supported
+    """
+    reader = file_reader(path)
+    if reader is None:
+        LOG.info(f'Skipping {path}, format not supported')
+        return None
+
+    return reader(path, **kwargs)
@@ -0,0 +1,301 @@
+"""
+Module to assemble rasters on the client from individual database tiles.
+
+Instead of asking PostGIS to ST_Union all matching tiles into one large
+GeoTIFF, tiles are fetched one at a time in a thread pool, decoded with
+rasterio, and written into a mosaic that is preallocated in memory or
+written window by window to a GeoTIFF on disk.
+"""
+import logging
+import math
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+)
+from dataclasses import dataclass
+
+import numpy as np
+import rasterio
+from rasterio import MemoryFile
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+LOG = logging.getLogger(__name__)
+
+# Tiles fetched ahead of the mosaic per worker thread. Limits the decoded
+# tiles held in memory while the calling thread writes.
+TILES_IN_FLIGHT_PER_WORKER = 2
+
+# Translation of PostGIS band pixel types to numpy data types
+PIXEL_TYPES = {
+    '1BB': 'uint8',
+    '2BUI': 'uint8',
+    '4BUI': 'uint8',
+    '8BSI': 'int8',
+    '8BUI': 'uint8',
+    '16BSI': 'int16',
+    '16BUI': 'uint16',
+    '32BSI': 'int32',
+    '32BUI': 'uint32',
+    '32BF': 'float32',
+    '64BF': 'float64',
+}
+
+
+@dataclass
+class TileInfo:
+    """
+    Georeferencing of a single tile in the images table
+    """
+    id: int
+    upper_left_x: float
+    upper_left_y: float
+    width: int
+    height: int
+    scale_x: float
+    scale_y: float
+    srid: int
+    num_bands: int
+    pixel_type: str
+    nodata: float = None
+
+
+@dataclass
+class MosaicGrid:
+    """
+    Pixel grid that all tiles of a single dataset are placed on
+    """
+    transform: object
+    width: int
+    height: int
+    count: int
+    dtype: str
+    nodata: float
+    srid: int
+
+    @property
+    def profile(self):
+        """
+        Rasterio profile to create a GeoTIFF for this grid
+        """
+        return {
+            'driver': 'GTiff',
+            'width': self.width,
+            'height': self.height,
+            'count': self.count,
+            'dtype': self.dtype,
+            'nodata': self.nodata,
+            'crs': f'EPSG:{self.srid}',
+            'transform': self.transform,
+        }
+
+    def window(self, transform, width, height):
+        """
+        Window of a tile with the given transform and shape on this grid.
+
+        Args:
+            transform: Affine transform of the tile
+            width: Tile width in pixels
+            height: Tile height in pixels
+
+        Returns:
+            rasterio.windows.Window in the mosaic pixel space
+        """
+        col = round((transform.c - self.transform.c) / self.transform.a)
+        row = round((transform.f - self.transform.f) / self.transform.e)
+        return Window(col, row, width, height)
+
+
+def mosaic_grid(tiles, bounds=None):
+    """
+    Compute the pixel grid that covers all tiles, optionally limited to
+    bounds. All tiles are assumed to share the same resolution and
+    alignment, which is the case for tiles of a single raster dataset.
+
+    Args:
+        tiles: List of :py:class:`TileInfo`
+        bounds: Optional (xmin, ymin, xmax, ymax) in the tile SRID to crop
+                the mosaic to
+
+    Returns:
+        :py:class:`MosaicGrid`
+    """
+    if not tiles:
+        raise ValueError('No raster tiles found to build a mosaic from')
+
+    first = tiles[0]
+    scale_x = first.scale_x
+    scale_y = abs(first.scale_y)
+
+    xmin = min(t.upper_left_x for t in tiles)
+    ymax = max(t.upper_left_y for t in tiles)
+    xmax = max(t.upper_left_x + t.width * scale_x for t in tiles)
+    ymin = min(t.upper_left_y - t.height * scale_y for t in tiles)
+
+    if bounds is not None:
+        # Snap the requested bounds outward onto the tile grid
+        bxmin, bymin, bxmax, bymax = bounds
+        origin_x, origin_y = xmin, ymax
+        xmin = max(
+            xmin, origin_x + math.floor((bxmin - origin_x) / scale_x) * scale_x
+        )
+        xmax = min(
+            xmax, origin_x + math.ceil((bxmax - origin_x) / scale_x) * scale_x
+        )
+        ymax = min(
+            ymax, origin_y - math.floor((origin_y - bymax) / scale_y) * scale_y
+        )
+        ymin = max(
+            ymin, origin_y - math.ceil((origin_y - bymin) / scale_y) * scale_y
+        )
+
+    nodata = first.nodata
+    dtype = PIXEL_TYPES.get(first.pixel_type, 'float32')
+
+    return MosaicGrid(
+        transform=from_origin(xmin, ymax, scale_x, scale_y),
+        width=max(int(round((xmax - xmin) / scale_x)), 0),
+        height=max(int(round((ymax - ymin) / scale_y)), 0),
+        count=first.num_bands,
+        dtype=dtype,
+        nodata=nodata,
+        srid=first.srid,
+    )
+
+
+def decode_tile(tiff):
+    """
+    Decode a GeoTIFF returned from ST_AsTiff
+
+    Args:
+        tiff: bytes or memoryview of the GeoTIFF
+
+    Returns:
+        tuple: **data** - masked numpy array of shape (bands, rows, cols)
+               **transform** - Affine transform of the tile
+    """
+    with MemoryFile(bytes(tiff)) as tmpfile:
+        with tmpfile.open() as dataset:
+            return dataset.read(masked=True), dataset.transform
+
+
+def _place(grid, data, transform):
+    """
+    Clip a decoded tile to the mosaic grid.
+
+    Returns:
+        tuple: Window in the mosaic and the matching part of the tile or
+               None when the tile does not overlap the mosaic.
+    """
+    window = grid.window(transform, data.shape[2], data.shape[1])
+    row_start = max(window.row_off, 0)
+    col_start = max(window.col_off, 0)
+    row_stop = min(window.row_off + window.height, grid.height)
+    col_stop = min(window.col_off + window.width, grid.width)
+
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+
+    data = data[
+        :,
+        row_start - window.row_off:row_stop - window.row_off,
+        col_start - window.col_off:col_stop - window.col_off,
+    ]
+    window = Window(
+        col_start, row_start, col_stop - col_start, row_stop - row_start
+    )
+    return window, data
+
+
+def mosaic_tiles(fetch_tile, tiles, bounds=None, out_path=None,
+                 max_workers=None):
+    """
+    Fetch and decode tiles in a thread pool and write them to a single
+    mosaic. Fetching happens concurrently while only the calling thread
+    writes to the mosaic. At most TILES_IN_FLIGHT_PER_WORKER tiles per
+    worker are fetched ahead of the writes.
+
+    Args:
+        fetch_tile: Callable receiving a :py:class:`TileInfo` and returning
+                    the tile as GeoTIFF bytes (or None when empty). Called
+                    from worker threads.
+        tiles: List of :py:class:`TileInfo` to place in the mosaic
+        bounds: Optional (xmin, ymin, xmax, ymax) to crop the mosaic to
+        out_path: Optional path to write a GeoTIFF to. By default, the mosaic
+                  is assembled in memory.
+        max_workers: Number of threads fetching tiles. Defaults to the number
+                     of CPUs.
+
+    Returns:
+        dataset: rasterio dataset opened for reading
+    """
+    grid = mosaic_grid(tiles, bounds=bounds)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if out_path is not None:
+        destination = rasterio.open(out_path, 'w+', tiled=True, **grid.profile)
+        mosaic = None
+    else:
+        destination = None
+        fill = grid.nodata if grid.nodata is not None else 0
+        mosaic = np.full(
+            (grid.count, grid.height, grid.width), fill, dtype=grid.dtype
+        )
+
+    LOG.debug(
+        f'Mosaicking {len(tiles)} tiles into a {grid.width}x{grid.height} '
+        f'grid using {max_workers} workers'
+    )
+
+    def fetch_and_decode(tile):
+        tiff = fetch_tile(tile)
+        if tiff is None:
+            return None
+        return decode_tile(tiff)
+
+    def write(result):
+        if result is None:
+            return
+
+        placed = _place(grid, *result)
+        if placed is None:
+            return
+        window, data = placed
+        rows = slice(window.row_off, window.row_off + window.height)
+        cols = slice(window.col_off, window.col_off + window.width)
+
+        if destination is not None:
+            current = destination.read(window=window)
+            destination.write(
+                np.where(data.mask, current, data.data).astype(grid.dtype),
+                window=window
+            )
+        else:
+            mosaic[:, rows, cols] = np.where(
+                data.mask, mosaic[:, rows, cols], data.data
+            )
+
+    in_flight = max_workers * TILES_IN_FLIGHT_PER_WORKER
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for tile in tiles:
+                if len(pending) >= in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+                pending.add(executor.submit(fetch_and_decode, tile))
+
+            for future in as_completed(pending):
+                write(future.result())
+    finally:
+        if destination is not None:
+            destination.close()
+
+    if out_path is not None:
+        return rasterio.open(out_path)
+
+    tmpfile = MemoryFile()
+    with tmpfile.open(**grid.profile) as dataset:
+        dataset.write(mosaic)
+    return tmpfile.open()
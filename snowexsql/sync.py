@@ -0,0 +1,230 @@
+"""
+Module to keep a local GeoParquet mirror of the point and layer data up to
+date.
+
+The mirror is a directory with one GeoParquet file per dataset and a
+``sync.json`` file with the filters of the mirror and, per dataset, the
+id up to which all rows were read and the number of writes that updated or
+deleted rows. A sync only downloads the rows loaded after that id with
+:py:meth:`~snowexsql.api.BaseDataset.changes_since`. While other
+transactions load rows, the id does not move past
+:py:meth:`~snowexsql.api.BaseDataset.committed_token` and the rows after it
+are read again by the next sync.
+
+Updates and deletes are found through the writes snowexsql.ingest records in
+the data_loads table, see
+:py:meth:`~snowexsql.api.BaseDataset.recorded_writes`. After rows of a
+dataset were deleted, the ids of the mirror are checked against the
+database. After sites or observations were updated in place, the dataset is
+downloaded again. Changes made without snowexsql.ingest are not recorded,
+``prune=True`` checks the ids regardless. Changing the filters of a mirror
+downloads it again.
+
+Requires pyarrow, ``pip install snowexsql[cache]``
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from snowexsql.api import LayerMeasurements, PointMeasurements
+from snowexsql.tables import CampaignObservation, Site
+from snowexsql.tables.site import SiteObservers
+
+LOG = logging.getLogger(__name__)
+
+# Dataset name -> API class
+DATASETS = {
+    "points": PointMeasurements,
+    "layers": LayerMeasurements,
+}
+# Tables with details of the mirrored rows that are updated in place
+DETAIL_TABLES = (
+    Site.__table__.name,
+    SiteObservers.__table__.name,
+    CampaignObservation.__table__.name,
+)
+# Number of rows read with one query
+DEFAULT_PAGE_SIZE = 50_000
+STATE_FILE = "sync.json"
+
+
+def _write(path, write):
+    """
+    Write a file under a temporary name and rename it when done, so an
+    interrupted sync keeps the last complete file
+    """
+    partial = path.with_name(f"{path.name}.partial")
+    write(partial)
+    os.replace(partial, path)
+
+
+def read_state(directory):
+    """
+    Filters and sync state of the datasets of a mirror, empty for a new
+    mirror
+
+    Args:
+        directory: Directory of the mirror
+
+    Returns:
+        Dictionary with the filters and by dataset name the highest id and
+        the counts of updating and deleting writes seen
+    """
+    path = Path(directory).joinpath(STATE_FILE)
+    if not path.exists():
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_counts(dataset):
+    """
+    Counts of the writes that deleted rows of a dataset and that updated
+    the details of its rows
+    """
+    writes = dataset.recorded_writes()
+    table = writes.get(dataset.MODEL.__table__.name, {})
+    details = [writes.get(name, {}) for name in DETAIL_TABLES]
+    return {
+        "deleted": table.get("deleted", 0),
+        "updated": sum(
+            detail.get("updated", 0) + detail.get("deleted", 0)
+            for detail in details
+        ),
+    }
+
+
+def _sync_dataset(dataset, path, previous, filters, page_size, prune):
+    """
+    Add the new rows of a dataset to its mirror file and remove the rows
+    gone from the database
+
+    Returns:
+        Tuple - Report and sync state of the mirror
+    """
+    token = previous.get("token")
+    before = _write_counts(dataset)
+    if token is not None and previous.get("updated") != before["updated"]:
+        LOG.info(
+            f"Details of the {path.stem} were updated, downloading them again"
+        )
+        token = None
+
+    mirror = None
+    if token is not None and path.exists():
+        mirror = gpd.read_parquet(path)
+    else:
+        token = None
+
+    # Rows of loads still running can commit below the ids read
+    committed = dataset.committed_token()
+    pages = []
+    cursor = token
+    while True:
+        page = dataset.changes_since(
+            cursor, verbose=True, limit=page_size, **filters
+        )
+        if len(page) == 0:
+            break
+        pages.append(page)
+        cursor = int(page["id"].max())
+        LOG.debug(f"Read {len(page)} rows of {path.stem} up to id {cursor}")
+        if len(page) < page_size:
+            break
+    if pages and committed is not None:
+        token = min(cursor, committed)
+
+    after = _write_counts(dataset)
+    state = {"token": token, **after}
+    frames = ([] if mirror is None else [mirror]) + pages
+    report = {
+        "added": sum(len(page) for page in pages),
+        "removed": 0,
+        "rows": 0,
+    }
+    if mirror is not None:
+        # Rows after the token of the last sync are read again
+        report["added"] -= int(sum(
+            page["id"].isin(mirror["id"]).sum() for page in pages
+        ))
+    if not frames:
+        # Nothing matches the filters, drop a mirror of other filters
+        path.unlink(missing_ok=True)
+        return report, state
+
+    rows = pd.concat(frames, ignore_index=True)
+    rows = rows.drop_duplicates(subset="id", keep="last", ignore_index=True)
+    # Rows deleted since the last sync or replaced while paging
+    deleted = before["deleted"] != after["deleted"] or (
+        mirror is not None and previous.get("deleted") != after["deleted"]
+    )
+    if prune or deleted:
+        ids = dataset.existing_ids(**filters)
+        kept = rows["id"].isin(ids)
+        report["removed"] = int((~kept).sum())
+        rows = rows[kept].reset_index(drop=True)
+    report["rows"] = len(rows)
+
+    if report["added"] or report["removed"] or mirror is None:
+        _write(path, rows.to_parquet)
+
+    return report, state
+
+
+def sync_mirror(directory, datasets=tuple(DATASETS), filters=None,
+                database=None, page_size=DEFAULT_PAGE_SIZE, prune=False):
+    """
+    Create or update a local mirror of the database
+
+    Args:
+        directory: Directory of the mirror, created when missing
+        datasets: Names of the DATASETS to mirror
+        filters: Dictionary of filters of the mirrored rows, see
+                 ALLOWED_QRY_KWARGS of the API classes
+        database: Optional snowexsql.db.Database to read from. Defaults to
+                  the database of the environment
+        page_size: Number of rows read with one query
+        prune: Check the ids of the mirror against the database even when
+               no deletes were recorded, e.g. after rows were deleted
+               without snowexsql.ingest
+
+    Returns:
+        Dictionary - Number of added, removed and mirrored rows by dataset
+    """
+    directory = Path(directory).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    filters = filters or {}
+
+    state = read_state(directory)
+    synced = state.get("datasets", {})
+    if state and state.get("filters") != filters:
+        LOG.info("Filters of the mirror changed, downloading it again")
+        synced = {}
+
+    summary = {}
+    for name in datasets:
+        dataset = DATASETS[name]
+        if database is not None:
+            dataset = dataset.bind(database)
+
+        summary[name], synced[name] = _sync_dataset(
+            dataset, directory.joinpath(f"{name}.parquet"),
+            synced.get(name, {}), filters, page_size, prune
+        )
+
+        # Saved per dataset, so an interrupted sync continues from here
+        state = {"filters": filters, "datasets": synced}
+        _write(
+            directory.joinpath(STATE_FILE),
+            lambda path: path.write_text(json.dumps(state, indent=2))
+        )
+        LOG.info(
+            f"Synced {name}: {summary[name]['added']} added, "
+            f"{summary[name]['removed']} removed"
+        )
+
+    return summary
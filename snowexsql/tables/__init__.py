@@ -1,8 +1,10 @@
 from .campaign import Campaign
 from .campaign_observation import CampaignObservation
+from .data_load import DataLoad
 from .doi import DOI
 from .image_data import ImageData
 from .image_observation import ImageObservation
+from .image_overview import ImageOverview
 from .instrument import Instrument
 from .layer_data import LayerData
 from .measurement_type import MeasurementType
@@ -14,9 +16,11 @@ from .site import Site
 __all__ = [
     "Campaign",
     "CampaignObservation",
+    "DataLoad",
     "DOI",
     "ImageData",
     "ImageObservation",
+    "ImageOverview",
     "Instrument",
     "LayerData",
     "MeasurementType",
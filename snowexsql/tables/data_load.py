@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+
+from .base import Base
+
+
+class DataLoad(Base):
+    """
+    Class representing the data_loads table. Every write of the functions in
+    snowexsql.ingest adds a row, so clients can tell that data changed
+    without comparing the data tables.
+    """
+    __tablename__ = 'data_loads'
+
+    table_name = Column(String(), nullable=False, index=True)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+    loaded_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,28 @@
+from geoalchemy2 import Raster
+from sqlalchemy import Column, ForeignKey, Index, Integer
+from sqlalchemy.orm import relationship
+
+from .base import Base
+
+
+class ImageOverview(Base):
+    """
+    Class representing the image_overviews table. This table holds
+    downsampled copies of the tiles in the images table. Each overview tile
+    is linked to its full resolution tile, so all image filters apply.
+    """
+    __tablename__ = 'image_overviews'
+
+    # Downsampling factor relative to the full resolution tile
+    factor = Column(Integer, nullable=False)
+    raster = Column(Raster)
+
+    image_id = Column(
+        Integer, ForeignKey('public.images.id'), index=True, nullable=False
+    )
+    image = relationship('ImageData')
+
+    # Index
+    __table_args__ = (
+        Index('idx_image_factor_unique', 'image_id', 'factor', unique=True),
+    )
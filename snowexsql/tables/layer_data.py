@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, Text
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, Text
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -14,6 +14,19 @@ class LayerData(HasMeasurementType, HasInstrument, Base):
     temperature etc...
     """
     __tablename__ = 'layers'
+    __table_args__ = (
+        # Profiles of sites resolved from campaign, DOI, observer and date
+        # filters, covering the columns of non-verbose queries
+        Index(
+            'idx_layers_site_type_depth', 'site_id', 'measurement_type_id',
+            'depth', postgresql_include=['id', 'bottom_depth', 'value']
+        ),
+        # Filters on a type measured with an instrument
+        Index(
+            'idx_layers_type_instrument', 'measurement_type_id',
+            'instrument_id'
+        ),
+    )
 
     depth = Column(Float, nullable=False, index=True)
     bottom_depth = Column(Float)
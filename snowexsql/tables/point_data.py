@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, Float, Integer, String
+from sqlalchemy import Column, Date, Float, Index, Integer, String
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import Base
@@ -16,6 +16,22 @@ class PointData(
     e.g. snow depths
     """
     __tablename__ = 'points'
+    __table_args__ = (
+        # Filters on a type or observations with a date range, values are
+        # included to filter on them without reading the table
+        Index(
+            'idx_points_type_datetime', 'measurement_type_id', 'datetime',
+            postgresql_include=['value']
+        ),
+        Index(
+            'idx_points_observation_type_datetime', 'observation_id',
+            'measurement_type_id', 'datetime', postgresql_include=['value']
+        ),
+        # Small block range index for the physical order of the rows, see
+        # snowexsql.maintenance.cluster_table. Dates are covered by the
+        # indexes above and the yearly partitions.
+        Index('idx_points_geom_brin', 'geom', postgresql_using='brin'),
+    )
 
     value = Column(Float, nullable=False)
 
@@ -7,7 +7,10 @@ import geopandas as gpd
 import pytest
 from geoalchemy2.shape import to_shape
 
+from snowexsql import api
 from snowexsql.api import LayerMeasurements
+from snowexsql.cache import ResultCache
+from snowexsql.ingest import upsert_sites
 from snowexsql.tables import LayerData
 
 
@@ -124,6 +127,16 @@ class TestLayerMeasurementFilter:
         assert pytest.approx(result["value"].astype("float").mean()) == \
                float(self.db_data.value)
 
+    def test_duplicate_lookup_names(self, layer_data_factory):
+        # Each record has its own instrument and campaign of the same name
+        layer_data_factory.create()
+
+        for kwargs in [
+            dict(instrument=self.db_data.instrument.name),
+            dict(campaign=self.db_data.site.campaign.name),
+        ]:
+            assert len(self.subject.from_filter(**kwargs)) == 2
+
     def test_no_instrument_on_date(self):
         result = self.subject.from_filter(
             date=self.db_data.site.datetime.date() + timedelta(days=1),
@@ -183,9 +196,93 @@ class TestLayerMeasurementFilter:
         result = self.subject.from_area(pt=pts[0], buffer=10, crs=crs)
         assert len(result) == 1
 
+    def test_from_areas(self, layer_data, point_data_x_y, point_data_srid):
+        shapes = gpd.GeoSeries(
+            gpd.points_from_xy(
+                [point_data_x_y.x, point_data_x_y.x + 1000],
+                [point_data_x_y.y, point_data_x_y.y],
+            ).buffer(10),
+            index=["near", "far"],
+            crs=f"epsg:{point_data_srid}"
+        )
+        result = self.subject.from_areas(shapes)
+        assert result["area"].tolist() == ["near"]
+
+    def test_geometry_xy(self, layer_data, point_data_x_y):
+        result = self.subject.from_filter(
+            verbose=True, geometry="xy", limit=1
+        )
+        assert "geom_wkt" not in result.columns
+        assert result.loc[0, "x"] == pytest.approx(point_data_x_y.x)
+        assert result.loc[0, "y"] == pytest.approx(point_data_x_y.y)
+
+    def test_changes_since(self, layer_data):
+        result = self.subject.changes_since(verbose=True, limit=10)
+        assert result["id"].tolist() == sorted(
+            record.id for record in layer_data
+        )
+        assert len(self.subject.changes_since(result["id"].max())) == 0
+
+    def test_columns(self, layer_data):
+        result = self.subject.from_filter(
+            columns=["value", "site_name", "geom"], limit=1
+        )
+        assert list(result.columns) == ["value", "site_name", "geom"]
+        assert result.loc[0, "site_name"] == layer_data[0].site.name
+
+    def test_from_areas_without_crs(self, point_data_x_y):
+        shapes = gpd.GeoSeries(
+            gpd.points_from_xy([point_data_x_y.x], [point_data_x_y.y])
+        )
+        with pytest.raises(ValueError):
+            self.subject.from_areas(shapes)
+
+    def test_nearest_sites(self, layer_data, point_data_x_y, point_data_srid):
+        result = self.subject.nearest_sites(
+            (point_data_x_y.x + 3, point_data_x_y.y + 4), k=5,
+            crs=point_data_srid
+        )
+        assert len(result) == 1
+        assert result["distance"].iloc[0] == pytest.approx(5)
+
+    def test_nearest_sites_filter(
+        self, layer_data, point_data_x_y, point_data_srid
+    ):
+        result = self.subject.nearest_sites(
+            point_data_x_y, crs=point_data_srid, type="unknown_type"
+        )
+        assert len(result) == 0
+
 
 # Testing with real density data
 
+@pytest.mark.usefixtures("db_test_session")
+@pytest.mark.usefixtures("db_test_connection")
+class TestResultCache:
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch):
+        cache = ResultCache(version_ttl=0)
+        monkeypatch.setattr(api, "RESULT_CACHE", cache)
+        return cache
+
+    def test_site_upsert(self, layer_data, connection, cache):
+        LayerMeasurements.from_filter(limit=10)
+        site = layer_data[0].site
+        upsert_sites(connection, gpd.GeoDataFrame(
+            {
+                "site": [site.name],
+                "datetime": [site.datetime],
+                "campaign": [site.campaign.name],
+                "doi": [site.doi.doi],
+                "air_temp": [-2.0],
+            },
+            geometry=[to_shape(site.geom)], crs=site.geom.srid
+        ))
+        LayerMeasurements.from_filter(limit=10)
+
+        assert (cache.hits, cache.misses) == (0, 2)
+
+
 @pytest.fixture
 def layer_data_with_density(layer_density_factory, db_session):
     layer_density_factory.create()
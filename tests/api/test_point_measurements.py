@@ -7,7 +7,9 @@ import geopandas as gpd
 import pytest
 from geoalchemy2.shape import to_shape
 
+from snowexsql import api
 from snowexsql.api import PointMeasurements
+from snowexsql.cache import ResultCache
 from snowexsql.tables import PointData
 
 
@@ -78,6 +80,25 @@ class TestPointMeasurements:
             for record in self.db_data
         ]
 
+    def test_changes_since(self, point_data_factory):
+        token = max(record.id for record in self.db_data)
+        assert len(self.subject.changes_since(token)) == 0
+
+        point_data_factory.create()
+        result = self.subject.changes_since(token, verbose=True)
+        assert len(result) == 1
+        assert result["id"].iloc[0] > token
+
+    def test_committed_token(self):
+        assert self.subject.committed_token() == max(
+            record.id for record in self.db_data
+        )
+
+    def test_existing_ids(self):
+        assert self.subject.existing_ids().tolist() == [
+            record.id for record in self.db_data
+        ]
+
 
 @pytest.mark.usefixtures("db_test_session")
 @pytest.mark.usefixtures("db_test_connection")
@@ -108,6 +129,16 @@ class TestPointMeasurementFilter:
         assert len(result) == 5
         assert pytest.approx(result["value"].mean()) == self.db_data.value
 
+    def test_duplicate_lookup_names(self, point_data_factory):
+        # Each record has its own instrument and campaign of the same name
+        point_data_factory.create()
+
+        for kwargs in [
+            dict(instrument=self.db_data.observation.instrument.name),
+            dict(campaign=self.db_data.observation.campaign.name),
+        ]:
+            assert len(self.subject.from_filter(**kwargs)) == 2
+
     def test_no_instrument_on_date(self):
         result = self.subject.from_filter(
             date=self.db_data.datetime.date() + timedelta(days=1),
@@ -164,6 +195,43 @@ class TestPointMeasurementFilter:
         assert len(result) == 1
         assert result.loc[0].value == self.db_data.value
 
+    def test_list_of_types(self):
+        result = self.subject.from_filter(
+            type=[self.db_data.measurement_type.name, "unknown type"],
+        )
+        assert len(result) == 1
+
+    def test_geometry_xy(self, point_data_x_y):
+        result = self.subject.from_filter(
+            type=self.db_data.measurement_type.name, geometry="xy",
+            precision=1
+        )
+        assert not isinstance(result, gpd.GeoDataFrame)
+        assert "geom" not in result.columns
+        assert result.loc[0, "x"] == round(point_data_x_y.x, 1)
+        assert result.loc[0, "y"] == round(point_data_x_y.y, 1)
+
+    def test_geometry_none(self):
+        result = self.subject.from_filter(
+            type=self.db_data.measurement_type.name, geometry="none"
+        )
+        assert len(result) == 1
+        assert {"geom", "x", "y"}.isdisjoint(result.columns)
+
+    def test_columns(self):
+        result = self.subject.from_filter(
+            type=self.db_data.measurement_type.name,
+            columns=["value", "type", "campaign_name"]
+        )
+        assert list(result.columns) == ["value", "type", "campaign_name"]
+        assert result.loc[0, "type"] == self.db_data.measurement_type.name
+        assert result.loc[0, "campaign_name"] == \
+            self.db_data.observation.campaign.name
+
+    def test_columns_unknown(self):
+        with pytest.raises(ValueError):
+            self.subject.from_filter(columns=["value", "notacolumn"])
+
     @pytest.mark.parametrize(
         "kwargs, expected_error", [
             ({"notakey": "value"}, ValueError),
@@ -195,3 +263,95 @@ class TestPointMeasurementFilter:
         crs = point_data_srid
         result = self.subject.from_area(pt=pts[0], buffer=10, crs=crs)
         assert len(result) == 1
+
+    def test_from_areas(self, point_data_x_y, point_data_srid):
+        shapes = gpd.GeoSeries(
+            gpd.points_from_xy(
+                [point_data_x_y.x, point_data_x_y.x + 1000],
+                [point_data_x_y.y, point_data_x_y.y],
+            ).buffer(10),
+            index=["near", "far"],
+            crs=f"epsg:{point_data_srid}"
+        )
+        result = self.subject.from_areas(shapes)
+        assert result["area"].tolist() == ["near"]
+
+    def test_from_areas_without_crs(self, point_data_x_y):
+        shapes = gpd.GeoSeries(
+            gpd.points_from_xy([point_data_x_y.x], [point_data_x_y.y])
+        )
+        with pytest.raises(ValueError):
+            self.subject.from_areas(shapes)
+
+    def test_nearest(self, point_data_x_y, point_data_srid):
+        result = self.subject.nearest(
+            (point_data_x_y.x + 3, point_data_x_y.y + 4), k=5,
+            crs=point_data_srid
+        )
+        assert len(result) == 1
+        assert result["distance"].iloc[0] == pytest.approx(5)
+
+    def test_nearest_max_distance(self, point_data_x_y, point_data_srid):
+        result = self.subject.nearest(
+            (point_data_x_y.x + 3, point_data_x_y.y + 4), max_distance=4,
+            crs=point_data_srid
+        )
+        assert len(result) == 0
+
+    def test_nearest_many(self, point_data_x_y, point_data_srid):
+        points = gpd.GeoSeries(
+            gpd.points_from_xy(
+                [point_data_x_y.x, point_data_x_y.x + 100],
+                [point_data_x_y.y, point_data_x_y.y],
+            ),
+            index=["pit", "probe"],
+            crs=f"epsg:{point_data_srid}"
+        )
+        result = self.subject.nearest_many(points, max_distance=10)
+        assert result["origin"].tolist() == ["pit"]
+
+    def test_aggregate_by_type(self, point_data_factory):
+        point_data_factory.create(value=20)
+
+        result = self.subject.aggregate(
+            by="type", stats=["count", "mean", "max"]
+        )
+        assert result["count"].sum() == 2
+        assert result["max"].max() == 20
+
+    def test_aggregate_grid(self, point_data_x_y):
+        result = self.subject.aggregate(grid=100, stats=["count", "mean"])
+
+        assert len(result) == 1
+        assert result["mean"].iloc[0] == 10
+        cell = result.geometry.iloc[0]
+        assert cell.contains(point_data_x_y)
+        assert cell.area == pytest.approx(100 ** 2)
+        assert cell.bounds[0] % 100 == 0
+
+    def test_aggregate_unknown_stat(self):
+        with pytest.raises(ValueError):
+            self.subject.aggregate(stats=["mode"])
+
+
+@pytest.mark.usefixtures("db_test_session")
+@pytest.mark.usefixtures("db_test_connection")
+class TestResultCache:
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch):
+        cache = ResultCache(version_ttl=0)
+        monkeypatch.setattr(api, "RESULT_CACHE", cache)
+        return cache
+
+    def test_repeated_call(self, point_data, cache):
+        first = PointMeasurements.from_filter(limit=10)
+        second = PointMeasurements.from_filter(limit=10)
+
+        assert cache.hits == 1
+        assert second["value"].tolist() == first["value"].tolist()
+
+    def test_new_data(self, point_data, point_data_factory):
+        assert len(PointMeasurements.from_filter(limit=10)) == 1
+        point_data_factory.create()
+
+        assert len(PointMeasurements.from_filter(limit=10)) == 2
@@ -0,0 +1,227 @@
+"""
+Test the Raster Measurement class
+"""
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from snowexsql.api import RasterMeasurements, TooManyRastersException
+from snowexsql.maintenance import build_raster_overviews
+
+
+@pytest.fixture
+def points():
+    return gpd.GeoDataFrame(
+        {"name": ["a", "b"]},
+        geometry=gpd.points_from_xy(
+            [747987.6, 747990.0], [4324061.7, 4324065.0]
+        ),
+        crs="EPSG:26912",
+    )
+
+
+@pytest.fixture
+def image_data(image_data_factory):
+    """
+    Two tiles next to each other, the second one starts at x = 747990
+    """
+    first = image_data_factory.create()
+    second = image_data_factory.create(
+        upper_left_x=747990, observation=first.observation,
+        measurement_type=first.measurement_type
+    )
+    return [first, second]
+
+
+@pytest.mark.usefixtures("db_test_session")
+@pytest.mark.usefixtures("db_test_connection")
+@pytest.mark.usefixtures("image_data")
+class TestRasterFromArea:
+    def test_tiled_matches_union(self):
+        # Spans both tiles
+        area = dict(pt=(747990, 4324062), buffer=1.5, crs=26912)
+        union = RasterMeasurements.from_area(**area)
+        tiled = RasterMeasurements.from_area(**area, tiled=True, workers=1)
+
+        assert tiled.bounds == union.bounds
+        np.testing.assert_array_equal(
+            tiled.read(1, masked=True).filled(np.nan),
+            union.read(1, masked=True).filled(np.nan)
+        )
+
+
+@pytest.mark.usefixtures("db_test_session")
+@pytest.mark.usefixtures("image_data")
+class TestSingleDatasetCheck:
+    def test_single_dataset(self):
+        RasterMeasurements.check_for_single_dataset()
+
+    def test_cache_cleared_by_load(self, image_data_factory):
+        RasterMeasurements.check_for_single_dataset()
+        image_data_factory.create(measurement_type__name="swe")
+
+        with pytest.raises(TooManyRastersException, match="`type`"):
+            RasterMeasurements.check_for_single_dataset()
+
+
+@pytest.mark.usefixtures("image_data")
+class TestSelectOverview:
+    """
+    The image_data tiles have 1 m pixels and cover 8 x 4 pixels
+    """
+    @pytest.fixture(autouse=True)
+    def overviews(self, connection):
+        build_raster_overviews(connection, (2, 4))
+
+    @pytest.mark.parametrize(
+        "resolution, factor", [
+            (1, None),
+            (1.9, None),
+            (2, 2),
+            (3.9, 2),
+            (4, 4),
+            (100, 4),
+        ]
+    )
+    def test_resolution(self, db_session, resolution, factor):
+        assert RasterMeasurements._select_overview(
+            db_session, resolution=resolution
+        ) == factor
+
+    @pytest.mark.parametrize(
+        "max_pixels, factor", [
+            (32, None),
+            (31, 2),
+            (8, 2),
+            (7, 4),
+            # Nothing fits, the coarsest overview is used
+            (1, 4),
+        ]
+    )
+    def test_max_pixels(self, db_session, max_pixels, factor):
+        assert RasterMeasurements._select_overview(
+            db_session, max_pixels=max_pixels
+        ) == factor
+
+    def test_max_pixels_in_area(self, db_session):
+        # A 4 x 4 m square in the first tile
+        area = "POLYGON((747986 4324060, 747990 4324060, 747990 4324064, " \
+               "747986 4324064, 747986 4324060))"
+        search_geom = RasterMeasurements._search_geometry(
+            area, None, None, 26912, 26912
+        )
+
+        assert RasterMeasurements._select_overview(
+            db_session, max_pixels=16, search_geom=search_geom
+        ) is None
+
+    def test_no_request(self, db_session):
+        assert RasterMeasurements._select_overview(db_session) is None
+
+    def test_image_without_overviews(self, db_session, image_data,
+                                     image_data_factory):
+        # Loaded after the overviews were built
+        image_data_factory.create(
+            upper_left_y=4324060, observation=image_data[0].observation,
+            measurement_type=image_data[0].measurement_type
+        )
+
+        assert RasterMeasurements._select_overview(
+            db_session, resolution=100
+        ) is None
+
+    def test_factor_of_some_images(self, db_session, connection):
+        # Only the second tile gets an 8x overview
+        build_raster_overviews(connection, (8,))
+
+        assert RasterMeasurements._select_overview(
+            db_session, resolution=100
+        ) == 4
+
+
+def test_select_overview_without_overviews(db_session, image_data):
+    assert RasterMeasurements._select_overview(
+        db_session, resolution=100
+    ) is None
+
+
+@pytest.mark.usefixtures("db_test_session")
+class TestRasterSampling:
+    @pytest.fixture(autouse=True)
+    def setup_method(self):
+        self.subject = RasterMeasurements
+
+    def test_sample_without_rasters(self, points):
+        result = self.subject.sample_at(points, type="depth")
+
+        assert len(result) == len(points)
+        assert list(result["name"]) == list(points["name"])
+        assert np.isnan(result["value"]).all()
+
+    def test_sample_values(self, image_data):
+        points = gpd.GeoDataFrame(
+            geometry=gpd.points_from_xy(
+                [747987.6, 747991.5, 747990.0],
+                [4324061.7, 4324063.5, 4324065.0]
+            ),
+            crs="EPSG:26912",
+        )
+        result = self.subject.sample_at(points, type="depth")
+
+        # Column 2 and row 3 of the first tile, column 2 and row 1 of the
+        # second one and above both tiles
+        np.testing.assert_array_equal(result["value"], [32, 12, np.nan])
+
+    def test_sample_custom_column(self, points):
+        result = self.subject.sample_at(points.geometry, column="depth")
+        assert "depth" in result.columns
+
+    def test_sample_requires_crs(self, points):
+        with pytest.raises(ValueError):
+            self.subject.sample_at(points.set_crs(None, allow_override=True))
+
+
+@pytest.mark.usefixtures("db_test_session")
+class TestRasterZonalStats:
+    @pytest.fixture(autouse=True)
+    def setup_method(self):
+        self.subject = RasterMeasurements
+
+    @pytest.fixture
+    def zones(self, points):
+        return points.set_geometry(points.buffer(5))
+
+    def test_zonal_stats_without_rasters(self, zones):
+        result = self.subject.zonal_stats(
+            zones, stats=["count", "mean"], type="depth"
+        )
+
+        assert list(result.columns) == ["count", "mean"]
+        assert list(result.index) == list(zones.index)
+        assert (result["count"] == 0).all()
+        assert np.isnan(result["mean"]).all()
+
+    def test_zonal_stats_values(self, image_data):
+        zones = gpd.GeoDataFrame(
+            geometry=[
+                # Columns 1 and 2 and rows 3 and 4 of the first tile
+                box(747986, 4324060, 747988, 4324062),
+                # Last column of the first and first of the second tile
+                box(747989, 4324063, 747991, 4324064),
+                box(747900, 4324000, 747901, 4324001),
+            ],
+            crs="EPSG:26912",
+        )
+        result = self.subject.zonal_stats(
+            zones, stats=["count", "mean", "min", "max"], type="depth"
+        )
+
+        assert list(result["count"]) == [4, 2, 0]
+        np.testing.assert_array_equal(result["mean"], [36.5, 12.5, np.nan])
+        np.testing.assert_array_equal(result["min"], [31, 11, np.nan])
+        np.testing.assert_array_equal(result["max"], [42, 14, np.nan])
+
+    def test_zonal_stats_unknown_stat(self, zones):
+        with pytest.raises(ValueError):
+            self.subject.zonal_stats(zones, stats=["median"])
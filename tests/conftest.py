@@ -1,15 +1,18 @@
 import os
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 
 import pytest
 import snowexsql
+import snowexsql.lambda_handler
 from pytest_factoryboy import register
 from snowexsql.db import DB_CONNECTION_OPTIONS, db_connection_string, initialize
 from sqlalchemy import create_engine
 from tests.factories import (
    CampaignFactory,
    DOIFactory,
+   ImageDataFactory,
+   ImageObservationFactory,
    InstrumentFactory,
    LayerDataFactory,
    LayerDensityFactory,
@@ -32,6 +35,8 @@ else:
 # Make factories available to tests
 register(CampaignFactory)
 register(DOIFactory)
+register(ImageDataFactory)
+register(ImageObservationFactory)
 register(InstrumentFactory)
 register(LayerDataFactory)
 register(LayerDensityFactory)
@@ -70,12 +75,20 @@ def db_test_session(monkeypatch, sqlalchemy_engine):
         yield sqlalchemy_engine, SESSION()
 
     monkeypatch.setattr(snowexsql.api, "db_session_with_credentials", db_session_with_credentials)
+    # Classes bound to a Database
+    monkeypatch.setattr(
+        snowexsql.db.Database, "session", db_session_with_credentials
+    )
+    # Cached lookup ids of rolled back tests must not be reused
+    monkeypatch.setattr(snowexsql.lambda_handler, "_DATABASES", {})
 
 
 @pytest.fixture(scope='function')
 def db_test_connection(monkeypatch, sqlalchemy_engine, connection):
+    # The API closes its connections, which must not end the transaction of
+    # the test
     def test_connection():
-        return connection
+        return nullcontext(connection)
 
     monkeypatch.setattr(sqlalchemy_engine, 'connect', test_connection)
 
@@ -130,3 +143,5 @@ def db_session(connection):
     # (including calls to commit()) are rolled back.
     session.close()
     transaction.rollback()
+    # Ids of rolled back lookup entries must not be reused
+    snowexsql.api.LOOKUP_RESOLVER.clear()
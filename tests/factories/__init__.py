@@ -1,5 +1,7 @@
 from .campaign import CampaignFactory
 from .doi import DOIFactory
+from .image_data import ImageDataFactory
+from .image_observation import ImageObservationFactory
 from .instrument import InstrumentFactory
 from .layer_data import LayerDataFactory, LayerDensityFactory, \
     LayerTemperatureFactory
@@ -12,6 +14,8 @@ from .site import SiteFactory
 __all__ = [
     "CampaignFactory",
     "DOIFactory",
+    "ImageDataFactory",
+    "ImageObservationFactory",
     "InstrumentFactory",
     "LayerDataFactory",
     "LayerDensityFactory",
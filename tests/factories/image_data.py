@@ -0,0 +1,32 @@
+import factory
+from sqlalchemy import literal_column
+
+from snowexsql.tables import ImageData
+from .base_factory import BaseFactory
+from .image_observation import ImageObservationFactory
+from .measurement_type import MeasurementTypeFactory
+
+
+class ImageDataFactory(BaseFactory):
+    """
+    A 4 x 4 tile with 1 m pixels. The pixel in column x and row y (starting
+    at 1) has the value x + 10 * y.
+    """
+    class Meta:
+        model = ImageData
+        exclude = ('upper_left_x', 'upper_left_y')
+
+    upper_left_x = 747986
+    upper_left_y = 4324064
+
+    raster = factory.LazyAttribute(lambda o: literal_column(
+        "ST_MapAlgebra(ST_AddBand(ST_MakeEmptyRaster("
+        f"4, 4, {o.upper_left_x}, {o.upper_left_y}, 1, -1, 0, 0, 26912"
+        "), '32BF'::text, 0::float8, -9999::float8), 1, '32BF'::text, "
+        "'[rast.x] + 10 * [rast.y]'::text, -9999::float8)"
+    ))
+
+    observation = factory.SubFactory(ImageObservationFactory)
+    measurement_type = factory.SubFactory(
+        MeasurementTypeFactory, name='depth', units='m'
+    )
@@ -0,0 +1,12 @@
+import factory
+
+from snowexsql.tables import ImageObservation
+from .point_observation import PointObservationFactory
+
+
+class ImageObservationFactory(PointObservationFactory):
+    class Meta:
+        model = ImageObservation
+
+    name = factory.Sequence(lambda n: f'Image Observation {n}')
+    description = 'Image Description'
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("asyncpg")
+pytest.importorskip("greenlet")
+
+from snowexsql import aio  # noqa: E402
+
+
+def run(coroutine):
+    """
+    Run a coroutine and close the connections opened in its event loop
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await aio.dispose_engines()
+
+    return asyncio.run(main())
+
+
+def test_get_async_engine():
+    engine = aio.get_async_engine()
+    assert engine.url.drivername == "postgresql+asyncpg"
+    assert aio.get_async_engine() is engine
+    run(aio.dispose_engines())
+
+
+def test_unknown_driver():
+    with pytest.raises(ValueError):
+        aio.get_async_engine(driver="psycopg2")
+
+
+def test_from_filter_unknown_type():
+    result = run(aio.PointMeasurements.from_filter(type="Unknown type"))
+    assert len(result) == 0
+
+
+def test_concurrent_queries():
+    async def queries():
+        return await asyncio.gather(*[
+            aio.LayerMeasurements.from_unique_entries(["value"], site="none")
+            for _ in range(5)
+        ])
+
+    assert run(queries()) == [[]] * 5
@@ -0,0 +1,80 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from snowexsql.cache import ResultCache, frame_bytes
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"value": [1.0, 2.0, 3.0]})
+
+
+class TestResultCache:
+    def test_get_put(self, frame):
+        cache = ResultCache()
+        assert cache.get("db", "call", 1) is None
+
+        cache.put("db", "call", 1, frame)
+        pd.testing.assert_frame_equal(cache.get("db", "call", 1), frame)
+        assert cache.get("db", "call", 2) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_returns_copies(self, frame):
+        cache = ResultCache()
+        cache.put("db", "call", 1, frame)
+        result = cache.get("db", "call", 1)
+        result.loc[:, "value"] = 0
+
+        assert cache.get("db", "call", 1)["value"].tolist() == [1, 2, 3]
+
+    def test_max_bytes(self, frame):
+        cache = ResultCache(max_bytes=2 * frame_bytes(frame))
+        for call in ["first", "second", "third"]:
+            cache.put("db", call, 1, frame)
+
+        assert cache.get("db", "first", 1) is None
+        assert cache.get("db", "third", 1) is not None
+        assert cache.bytes == 2 * frame_bytes(frame)
+
+    def test_version_ttl(self):
+        versions = iter([1, 2])
+        cache = ResultCache(version_ttl=60)
+
+        assert cache.version("db", lambda: next(versions)) == 1
+        assert cache.version("db", lambda: next(versions)) == 1
+
+    def test_version_change(self, frame):
+        versions = iter([1, 2])
+        cache = ResultCache(version_ttl=0)
+        cache.put("db", "call", cache.version("db", lambda: next(versions)),
+                  frame)
+
+        assert cache.version("db", lambda: next(versions)) == 2
+        assert cache.bytes == 0
+
+    def test_directory(self, tmp_path, frame):
+        pytest.importorskip("pyarrow")
+        geo_frame = gpd.GeoDataFrame(
+            frame, geometry=[Point(i, i) for i in range(3)], crs=26912
+        )
+        ResultCache(directory=tmp_path).put("db", "geo", 1, geo_frame)
+        ResultCache(directory=tmp_path).put("db", "call", 1, frame)
+
+        cache = ResultCache(directory=tmp_path)
+        result = cache.get("db", "geo", 1)
+        assert isinstance(result, gpd.GeoDataFrame)
+        assert result.crs == geo_frame.crs
+        pd.testing.assert_frame_equal(cache.get("db", "call", 1), frame)
+
+    def test_version_refresh(self):
+        versions = iter([1, 2])
+        cache = ResultCache(version_ttl=60)
+        assert cache.current_version("db") is None
+
+        assert cache.version("db", lambda: next(versions)) == 1
+        assert cache.current_version("db") == 1
+        assert cache.version(
+            "db", lambda: next(versions), refresh=True
+        ) == 2
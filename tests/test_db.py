@@ -1,16 +1,35 @@
+import json
 import os
+import time
+from unittest.mock import MagicMock
 
 import pytest
 import snowexsql
 from snowexsql.db import (
     DB_CONNECTION_PROTOCOL,
+    CallRecord,
+    Database,
+    ReplicaRouter,
     db_connection_string,
     db_session_with_credentials,
     get_db,
+    get_engine,
+    get_router,
     load_credentials,
+    partition_statements,
+    partitioned_table,
+    profile,
+    profiled,
+    replica_addresses,
+    _open_session,
 )
+from snowexsql.api import LayerMeasurements, PointMeasurements
+from snowexsql.tables import LayerData, PointData
 from sqlalchemy import Engine, MetaData, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
 
 
 @pytest.fixture(scope="function")
@@ -105,6 +124,20 @@ class TestDBConnectionInfo:
         # On session.close(), all transactions should be gone
         assert session._transaction is None
 
+    @pytest.mark.usefixtures("db_connection_string_patch")
+    def test_get_engine_shared(self):
+        assert get_engine() is get_engine()
+        with db_session_with_credentials() as (engine, _session):
+            assert engine is get_engine()
+
+    @pytest.mark.usefixtures("db_connection_string_patch")
+    def test_get_engine_prepared(self):
+        pytest.importorskip("psycopg")
+        engine = get_engine(prepared=True)
+
+        assert engine.url.drivername == "postgresql+psycopg"
+        assert engine is not get_engine(prepared=False)
+
     @pytest.mark.usefixtures("db_connection_string_patch")
     @pytest.mark.parametrize("return_metadata, expected_objs", [(False, 2), (True, 3)])
     def test_get_metadata(self, return_metadata, expected_objs):
@@ -113,3 +146,231 @@ class TestDBConnectionInfo:
         """
         result = get_db(return_metadata=return_metadata)
         assert len(result) == expected_objs
+
+
+def replica(name, checked_out=0, fails=False):
+    engine = MagicMock(name=name)
+    engine.pool.checkedout.return_value = checked_out
+    if fails:
+        engine.connect.side_effect = OperationalError("", {}, Exception(name))
+    return engine
+
+
+class TestReplicas:
+    @pytest.fixture
+    def credentials_file(self, tmp_path, data_dir, monkeypatch):
+        credentials = load_credentials(data_dir / "credentials.json")
+        credentials["replicas"] = ["replica1:5432", "replica2"]
+        path = tmp_path / "credentials.json"
+        path.write_text(json.dumps(credentials))
+
+        monkeypatch.delenv("SNOWEX_DB_CONNECTION", raising=False)
+        monkeypatch.setenv("SNOWEX_DB_CREDENTIALS", str(path))
+
+    @pytest.mark.usefixtures("credentials_file")
+    def test_addresses_from_file(self):
+        assert replica_addresses() == ["replica1:5432", "replica2"]
+        assert db_connection_string(address="replica2").endswith(
+            "@replica2/test"
+        )
+
+    def test_addresses_from_env(self, monkeypatch):
+        monkeypatch.setenv("SNOWEX_DB_CONNECTION", "user:p@ss@primary/snowex")
+        monkeypatch.setenv("SNOWEX_DB_REPLICAS", "replica1, replica2")
+
+        assert replica_addresses() == ["replica1", "replica2"]
+        assert db_connection_string(address="replica1") == (
+            DB_CONNECTION_PROTOCOL + "user:p@ss@replica1/snowex"
+        )
+
+    def test_round_robin(self):
+        replicas = [replica("a"), replica("b")]
+        router = ReplicaRouter(replica("primary"), replicas)
+
+        assert router.available() == replicas
+        assert router.available() == replicas[::-1]
+
+    def test_least_loaded(self):
+        replicas = [replica("a", 3), replica("b", 1)]
+        router = ReplicaRouter(replica("primary"), replicas, "least_loaded")
+
+        assert router.available() == replicas[::-1]
+
+    def test_failover(self):
+        failing, healthy = replica("a", fails=True), replica("b")
+        router = ReplicaRouter(replica("primary"), [failing, healthy])
+
+        assert router.connect()[0] is healthy
+        # The failed replica is skipped until it is retried
+        assert router.available() == [healthy]
+
+    def test_lost_connection(self):
+        failing, healthy = replica("a"), replica("b")
+        router = ReplicaRouter(replica("primary"), [failing, healthy])
+
+        with pytest.raises(OperationalError):
+            with _open_session(None, router):
+                raise OperationalError(
+                    "", {}, Exception("a"), connection_invalidated=True
+                )
+        assert router.available() == [healthy]
+
+    def test_backoff(self):
+        engine = replica("a")
+        router = ReplicaRouter(
+            replica("primary"), [engine], retry_seconds=10,
+            max_retry_seconds=30
+        )
+
+        waits = []
+        for _ in range(4):
+            router.mark_down(engine)
+            waits.append(router._down[engine] - time.monotonic())
+        assert [round(wait) for wait in waits] == [10, 20, 30, 30]
+
+        router._down.clear()
+        router.connect()
+        router.mark_down(engine)
+        assert round(router._down[engine] - time.monotonic()) == 10
+
+    @pytest.mark.usefixtures("credentials_file")
+    def test_router_reused(self, monkeypatch):
+        router = get_router()
+        monkeypatch.setattr(
+            snowexsql.db, "load_credentials",
+            MagicMock(side_effect=AssertionError("credentials read again"))
+        )
+
+        assert get_router() is router
+        assert router.strategy == "round_robin"
+
+    def test_primary_without_replicas(self):
+        primary = replica("primary")
+        router = ReplicaRouter(primary, [replica("a", fails=True)])
+
+        assert router.connect()[0] is primary
+        assert router.connect()[0] is primary
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            ReplicaRouter(replica("primary"), [], "random")
+
+
+class TestDatabase:
+    @pytest.fixture
+    def credentials(self, data_dir):
+        return load_credentials(data_dir / "credentials.json")
+
+    def test_from_credentials(self, credentials):
+        database = Database(credentials=dict(credentials, address="other"))
+
+        assert database.engine.url.host == "other"
+        assert database.router is None
+        assert "db_builder" not in repr(database)
+
+    def test_ignores_environment(self, data_dir, monkeypatch):
+        monkeypatch.setenv("SNOWEX_DB_CONNECTION", "user:pw@envhost/env")
+        database = Database(data_dir / "credentials.json")
+
+        assert database.engine.url.host == "localhost"
+        assert database.engine.url.database == "test"
+
+    def test_replicas(self, credentials):
+        database = Database(
+            credentials=dict(credentials, replicas=["replica"]),
+            replica_strategy="least_loaded",
+        )
+
+        assert database.router.primary is database.engine
+        assert database.router.strategy == "least_loaded"
+        assert [e.url.host for e in database.router.replicas] == ["replica"]
+
+    def test_bind(self, credentials):
+        database = Database(credentials=credentials)
+        points = PointMeasurements.bind(database)
+
+        assert issubclass(points, PointMeasurements)
+        assert points.__name__ == "PointMeasurements"
+        assert points.DATABASE is database
+        assert PointMeasurements.DATABASE is None
+        assert LayerMeasurements.bind(database).DATABASE is database
+
+
+class TestPartitions:
+    @pytest.mark.parametrize(
+        "table, key", [
+            (PointData.__table__, "RANGE (datetime)"),
+            (LayerData.__table__, "HASH (site_id)"),
+        ]
+    )
+    def test_partitioned_table(self, table, key):
+        partitioned = partitioned_table(table)
+        ddl = str(CreateTable(partitioned).compile(dialect=postgresql.dialect()))
+
+        assert f"PARTITION BY {key}" in ddl
+        assert "id SERIAL" in ddl
+        assert len(partitioned.primary_key.columns) == 2
+        # The mapped table is unchanged
+        assert list(table.primary_key.columns.keys()) == ["id"]
+
+    def test_point_partitions(self):
+        statements = partition_statements(PointData.__table__, years=[2020])
+        assert statements == [
+            "CREATE TABLE public.points_2020 PARTITION OF public.points "
+            "FOR VALUES FROM ('2020-01-01 00:00:00+00') "
+            "TO ('2021-01-01 00:00:00+00')",
+            "CREATE TABLE public.points_default PARTITION OF public.points "
+            "DEFAULT",
+        ]
+
+    def test_layer_partitions(self):
+        statements = partition_statements(LayerData.__table__, modulus=4)
+        assert len(statements) == 4
+        assert statements[-1].endswith("(MODULUS 4, REMAINDER 3)")
+
+
+class TestProfile:
+    def test_queries(self, connection):
+        with profile() as p:
+            connection.execute(text("SELECT 1"))
+
+        assert len(p.queries) == 1
+        assert p.queries[0].statement == "SELECT 1"
+        assert p.queries[0].rows == 1
+        assert p.queries[0].plan is None
+        assert list(p.to_frame()["statement"]) == ["SELECT 1"]
+
+    def test_not_profiling(self, connection):
+        with profile() as p:
+            pass
+        connection.execute(text("SELECT 1"))
+        assert p.queries == []
+
+    def test_explain(self, connection):
+        with profile(explain_over=0) as p:
+            connection.execute(text("SELECT 1"))
+            # The transaction is still usable
+            connection.execute(text("SELECT 2"))
+
+        plan = p.queries[0].plan
+        assert plan[0]["Plan"]["Node Type"] == "Result"
+        assert "Execution Time" in plan[0]
+
+    def test_api_call(self, connection):
+        class Dataset:
+            @classmethod
+            @profiled
+            def from_filter(cls):
+                return connection.execute(text("SELECT 1")).all()
+
+        records = []
+        with profile(callback=records.append) as p:
+            Dataset.from_filter()
+
+        call = p.calls[0]
+        assert call.name == "Dataset.from_filter"
+        assert call.rows == 1
+        assert p.queries[0].call == "Dataset.from_filter"
+        assert call.queries == p.queries
+        # The query is reported before the call it belongs to
+        assert isinstance(records[-1], CallRecord)
@@ -0,0 +1,254 @@
+import shutil
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+
+from snowexsql.ingest import (
+    bulk_load_layers, bulk_load_points, copy_rows, ingest_directory,
+    load_parsed_file, upsert_observations, upsert_sites
+)
+from snowexsql.parsers import read_pit_file
+from snowexsql.tables import (
+    CampaignObservation, Instrument, LayerData, Observer, PointData,
+    PointObservation, Site
+)
+from snowexsql.tables.site import SiteObservers
+
+
+@pytest.fixture
+def points():
+    return gpd.GeoDataFrame(
+        {
+            "value": [94.0, 74.0, 90.0],
+            "datetime": [
+                "2020-02-01 10:00:00+00:00",
+                "2020-02-01 10:05:00+00:00",
+                "2020-02-02 09:00:00+00:00",
+            ],
+            "elevation": [3148.2, 3150.1, 3149.3],
+            "type": "depth",
+            "units": "cm",
+            "observation": "Magnaprobe",
+            "campaign": "Grand Mesa",
+            "instrument": "magnaprobe",
+            "observer": "Catherine",
+            "doi": "some_point_doi",
+        },
+        geometry=gpd.points_from_xy(
+            [747987.6, 747990.0, 747995.1], [4324061.7, 4324065.0, 4324070.2]
+        ),
+        crs="EPSG:26912",
+    )
+
+
+@pytest.fixture
+def layers():
+    return gpd.GeoDataFrame(
+        {
+            "depth": [35.0, 25.0, 15.0],
+            "bottom_depth": [25.0, 15.0, 5.0],
+            "value": ["190", "245", "263"],
+            "type": "density",
+            "units": "kg/m3",
+            "instrument": "density cutter",
+            "site": "5S21",
+            "datetime": "2020-02-01 13:30:00+00:00",
+            "campaign": "Grand Mesa",
+            "observer": "Catherine",
+            "doi": "some_layer_doi",
+        },
+        geometry=gpd.points_from_xy([743281.0] * 3, [4324005.0] * 3),
+        crs="EPSG:26912",
+    )
+
+
+class TestCopyRows:
+    @pytest.mark.parametrize("driver", ["psycopg2", "psycopg"])
+    def test_driver(self, driver):
+        connection = MagicMock()
+        connection.dialect.driver = driver
+        cursor = connection.connection.cursor.return_value
+
+        rows = copy_rows(
+            connection, PointData.__table__,
+            pd.DataFrame({"value": [1.0, 2.0, 3.0]}), ["value"],
+            batch_size=2
+        )
+
+        assert rows == 3
+        if driver == "psycopg":
+            copy = cursor.copy.return_value.__enter__.return_value
+            assert copy.write.call_count == 2
+            assert not cursor.copy_expert.called
+        else:
+            assert cursor.copy_expert.call_count == 2
+
+
+class TestBulkLoadPoints:
+    def test_rows(self, connection, points):
+        assert bulk_load_points(points, connection) == 3
+        assert connection.scalar(select(func.count(PointData.id))) == 3
+
+    def test_observation_per_date(self, connection, points):
+        bulk_load_points(points, connection)
+
+        dates = connection.scalars(
+            select(CampaignObservation.date)
+            .where(CampaignObservation.name == "Magnaprobe")
+            .order_by(CampaignObservation.date)
+        ).all()
+        assert dates == [date(2020, 2, 1), date(2020, 2, 2)]
+
+    def test_reuses_lookups(self, connection, points):
+        bulk_load_points(points, connection)
+        bulk_load_points(points, connection)
+
+        assert connection.scalar(
+            select(func.count(Instrument.id))
+            .where(Instrument.name == "magnaprobe")
+        ) == 1
+        assert connection.scalar(
+            select(func.count(CampaignObservation.id))
+        ) == 2
+
+    def test_empty(self, connection, points):
+        assert bulk_load_points(points.iloc[0:0], connection) == 0
+
+
+class TestBulkLoadLayers:
+    def test_rows(self, connection, layers):
+        assert bulk_load_layers(layers, connection) == 3
+        assert connection.scalar(select(func.count(LayerData.id))) == 3
+
+    def test_single_site(self, connection, layers):
+        bulk_load_layers(layers, connection)
+        bulk_load_layers(layers, connection)
+
+        assert connection.scalars(select(Site.name)).all() == ["5S21"]
+
+
+class TestLoadParsedFile:
+    def test_site_details(self, connection, data_dir):
+        parsed = read_pit_file(data_dir / "site_5S21.csv", doi="doi")
+        load_parsed_file(parsed, connection)
+
+        site = connection.execute(select(Site.name, Site.air_temp)).one()
+        assert site.name == "COGM5S21_20200201"
+        assert site.air_temp == 1.5
+        assert connection.scalars(
+            select(Observer.name).order_by(Observer.name)
+        ).all() == ["Carrie Vuyovich", "Glen Liston"]
+
+    def test_reload_replaces(self, connection, data_dir):
+        parsed = read_pit_file(data_dir / "density.csv", doi="doi")
+
+        assert load_parsed_file(parsed, connection)["layers"] == 4
+        load_parsed_file(parsed, connection)
+
+        assert connection.scalar(select(func.count(LayerData.id))) == 4
+        assert connection.scalar(select(func.count(Site.id))) == 1
+
+
+class TestUpsert:
+    @pytest.fixture
+    def sites(self, data_dir):
+        return read_pit_file(data_dir / "site_5S21.csv", doi="doi").sites
+
+    def test_sites_unchanged(self, connection, sites):
+        assert upsert_sites(connection, sites) == {
+            "inserted": 1, "updated": 0, "unchanged": 0
+        }
+        assert upsert_sites(connection, sites) == {
+            "inserted": 0, "updated": 0, "unchanged": 1
+        }
+
+    def test_sites_updated(self, connection, sites):
+        upsert_sites(connection, sites)
+
+        result = upsert_sites(
+            connection, sites.assign(air_temp=-2.0, observer="Glen Liston")
+        )
+        assert result == {"inserted": 0, "updated": 1, "unchanged": 0}
+        assert connection.scalar(select(Site.air_temp)) == -2.0
+        assert connection.scalar(
+            select(func.count()).select_from(SiteObservers)
+        ) == 1
+
+    def test_sites_without_observers(self, connection, sites):
+        upsert_sites(connection, sites)
+
+        # Profile sheets without a Surveyors row keep the observers
+        upsert_sites(connection, sites.assign(observer=None))
+        assert connection.scalar(
+            select(func.count()).select_from(SiteObservers)
+        ) == 2
+
+    def test_observations(self, connection, points):
+        observations = points.assign(
+            date=[date(2020, 2, 1), date(2020, 2, 1), date(2020, 2, 2)],
+            description="Magnaprobe depths",
+        )
+
+        result = upsert_observations(
+            connection, observations, PointObservation
+        )
+        assert result == {"inserted": 2, "updated": 0, "unchanged": 0}
+
+        result = upsert_observations(
+            connection, observations.assign(description="Corrected"),
+            PointObservation
+        )
+        assert result == {"inserted": 0, "updated": 2, "unchanged": 0}
+
+
+def test_ingest_empty_directory(tmp_path, sqlalchemy_engine):
+    result = ingest_directory(tmp_path, sqlalchemy_engine, doi="doi")
+    assert result["files"] == 0
+    assert result["failed"] == []
+
+
+class SavepointEngine:
+    """
+    Loads each file in a savepoint of the test transaction
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    @contextmanager
+    def begin(self):
+        with self.connection.begin_nested():
+            yield self.connection
+
+
+def test_ingest_directory(tmp_path, data_dir, connection):
+    for name in [
+        "site_5S21.csv", "density.csv", "depths.csv", "smp_log.csv",
+        "S19M1013_5S21_20200201.CSV",
+    ]:
+        shutil.copy(data_dir / name, tmp_path)
+    # Pit sheet without coordinates fails to parse
+    broken = tmp_path / "broken.csv"
+    broken.write_text("# Location,Grand Mesa\n# Site,1N20\n")
+
+    result = ingest_directory(
+        tmp_path, SavepointEngine(connection), doi="doi",
+        campaign="Grand Mesa", workers=2
+    )
+    assert result["files"] == 4
+    assert result["failed"] == [str(broken)]
+    assert result["layers"] == 246
+    assert result["points"] == 10
+    assert result["sites"]["inserted"] == 3
+    # The SMP log names the observer of the SMP profile
+    smp_datetime = datetime(2020, 2, 1, 23, 16, 49, tzinfo=timezone.utc)
+    assert connection.scalar(
+        select(Observer.name)
+        .join(SiteObservers, SiteObservers.observer_id == Observer.id)
+        .join(Site, Site.id == SiteObservers.site_id)
+        .where(Site.datetime == smp_datetime)
+    ) == "HP Marshall"
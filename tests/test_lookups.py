@@ -0,0 +1,82 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select
+
+from snowexsql.lookups import LookupResolver
+from snowexsql.tables import CampaignObservation, Instrument, PointObservation
+
+
+@pytest.fixture
+def resolver():
+    return LookupResolver()
+
+
+class TestLookupResolver:
+    def test_unknown_names(self, connection, resolver):
+        assert resolver.ids(connection, 'instrument', ['unknown']) == {}
+
+    def test_create(self, connection, resolver):
+        ids = resolver.ids(
+            connection, 'instrument', ['pit ruler', 'magnaprobe'],
+            create=True
+        )
+        assert set(ids) == {'pit ruler', 'magnaprobe'}
+        assert connection.scalar(select(func.count(Instrument.id))) == 2
+
+    def test_resolve_column(self, connection, resolver):
+        ids = resolver.resolve(
+            connection, 'type', ['depth', 'depth', None, 'density'],
+            create=True, defaults={'depth': {'units': 'cm'}}
+        )
+        assert ids[0] == ids[1]
+        assert pd.isna(ids[2])
+        assert ids[3] != ids[0]
+
+    def test_duplicate_names(self, connection, resolver):
+        rows = connection.execute(
+            insert(Instrument).returning(Instrument.id),
+            [{'name': 'magnaprobe'}, {'name': 'magnaprobe'}]
+        ).scalars().all()
+
+        assert resolver.ids(connection, 'instrument', ['magnaprobe']) == {
+            'magnaprobe': min(rows)
+        }
+        assert resolver.all_ids(
+            connection, 'instrument', ['magnaprobe', 'unknown']
+        ) == sorted(rows)
+
+    def test_preload(self, connection, resolver):
+        LookupResolver().ids(connection, 'doi', ['some_doi'], create=True)
+
+        resolver.preload(connection, ['doi'])
+        assert 'some_doi' in resolver._ids['doi']
+
+    def test_unknown_lookup(self, connection, resolver):
+        with pytest.raises(ValueError):
+            resolver.ids(connection, 'site', ['5S21'])
+
+    def test_observations(self, connection, resolver):
+        df = pd.DataFrame({
+            'observation': ['GPR', 'GPR', 'GPR'],
+            'date': [date(2020, 2, 1), date(2020, 2, 1), date(2020, 2, 2)],
+            'campaign': 'Grand Mesa',
+            'instrument': 'pulse EKKO',
+            'observer': 'Tate',
+            'doi': 'some_gpr_doi',
+        })
+        ids = resolver.observation_ids(
+            connection, df, PointObservation, create=True
+        )
+
+        assert ids[0] == ids[1]
+        assert ids[2] != ids[0]
+        assert connection.scalar(
+            select(func.count(CampaignObservation.id))
+        ) == 2
+
+        # A second resolver finds the same observations in the database
+        assert list(
+            LookupResolver().observation_ids(connection, df, PointObservation)
+        ) == list(ids)
@@ -0,0 +1,105 @@
+from sqlalchemy import func, select, text
+
+from snowexsql.maintenance import (
+    OVERVIEW_FACTORS, build_raster_overviews, cluster_table, create_indexes,
+    create_raster_overviews, create_tables, index_report,
+    migrate_to_partitions
+)
+from snowexsql.tables import ImageOverview, PointData
+
+
+class TestRasterOverviews:
+    def test_no_images(self, sqlalchemy_engine):
+        result = create_raster_overviews(sqlalchemy_engine)
+        assert result == {factor: 0 for factor in OVERVIEW_FACTORS}
+
+    def test_overview_tiles(self, connection, image_data_factory):
+        image_data_factory.create()
+
+        assert build_raster_overviews(connection, (2, 4)) == {2: 1, 4: 1}
+        # Tiles at 1 m with 4 x 4 pixels
+        assert connection.execute(
+            select(
+                ImageOverview.factor,
+                func.ST_ScaleX(ImageOverview.raster),
+                func.ST_Width(ImageOverview.raster),
+                func.ST_Height(ImageOverview.raster),
+            ).order_by(ImageOverview.factor)
+        ).all() == [(2, 2.0, 2, 2), (4, 4.0, 1, 1)]
+
+    def test_factor_not_dividing_tiles(self, connection, image_data_factory):
+        first = image_data_factory.create()
+        second = image_data_factory.create(
+            upper_left_x=747990, observation=first.observation,
+            measurement_type=first.measurement_type
+        )
+
+        # An 8x overview of the first 4 x 4 tile would cover the second one,
+        # the one of the second tile reaches past the image
+        assert build_raster_overviews(connection, (8,)) == {8: 1}
+        assert connection.scalars(select(ImageOverview.image_id)).all() == [
+            second.id
+        ]
+
+    def test_existing_overviews(self, connection, image_data_factory):
+        image_data_factory.create()
+        build_raster_overviews(connection, (2,))
+
+        assert build_raster_overviews(connection, (2, 4)) == {2: 0, 4: 1}
+
+
+class TestMigrateToPartitions:
+    def test_points(self, connection, point_data_factory):
+        point_data_factory.create()
+
+        assert migrate_to_partitions(
+            connection, PointData.__table__, years=[2020]
+        ) == 1
+        assert connection.scalar(
+            text("SELECT relkind FROM pg_class WHERE relname = 'points'")
+        ) == 'p'
+        assert connection.scalar(select(func.count(PointData.id))) == 1
+
+    def test_partitioned_already(self, connection):
+        migrate_to_partitions(connection, PointData.__table__, years=[2020])
+        assert migrate_to_partitions(connection, PointData.__table__) is None
+
+
+class TestClusterTable:
+    def test_points(self, connection, point_data_factory):
+        point_data_factory.create_batch(3)
+
+        assert cluster_table(connection) == 1
+        assert connection.scalar(
+            text(
+                "SELECT indisclustered FROM pg_index "
+                "WHERE indexrelid = 'public.idx_points_geohash'::regclass"
+            )
+        )
+
+    def test_partitions(self, connection, point_data_factory):
+        point_data_factory.create()
+        migrate_to_partitions(connection, PointData.__table__, years=[2020])
+
+        # One partition for 2020 and the default one
+        assert cluster_table(connection) == 2
+
+
+def test_index_report(sqlalchemy_engine):
+    report = index_report(sqlalchemy_engine)
+
+    tables = [table['table'] for table in report['tables']]
+    assert tables == ['layers', 'points', 'sites']
+    points = [
+        index for index in report['indexes'] if index['table'] == 'points'
+    ]
+    assert 'idx_points_geom_brin' in [index['index'] for index in points]
+    assert all('advice' in index for index in points)
+
+
+def test_create_indexes_complete(sqlalchemy_engine):
+    assert create_indexes(sqlalchemy_engine) == []
+
+
+def test_create_tables_complete(sqlalchemy_engine):
+    assert create_tables(sqlalchemy_engine) == []
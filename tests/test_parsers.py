@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from snowexsql.parsers import (
+    parse_file, read_depth_file, read_pit_file, read_smp_log,
+    read_smp_profile, standardize_name
+)
+
+
+@pytest.mark.parametrize(
+    "name, expected", [
+        ("Specific surface area (m^2/kg)", ("specific_surface_area", "m^2/kg")),
+        ("# Easting [m]", ("easting", "m")),
+        ("density A (kg/m3)", ("density_a", "kg/m3")),
+        ("# Comments:", ("comments", None)),
+    ]
+)
+def test_standardize_name(name, expected):
+    assert standardize_name(name) == expected
+
+
+class TestPitFile:
+    def test_density(self, data_dir):
+        result = read_pit_file(data_dir / "density.csv", doi="doi")
+
+        site = result.sites.iloc[0]
+        assert site["site"] == "COGM1N20_20200205"
+        assert site["datetime"] == pd.Timestamp("2020-02-05 13:30", tz="UTC")
+        assert result.sites.crs.to_epsg() == 26912
+
+        layers = result.layers
+        assert list(layers["type"].unique()) == ["density"]
+        assert len(layers) == 4
+        # Mean of the samples
+        assert layers["value"].iloc[0] == "217.5"
+        assert layers["bottom_depth"].iloc[0] == 25
+
+    def test_stratigraphy_text_values(self, data_dir):
+        result = read_pit_file(data_dir / "stratigraphy.csv", doi="doi")
+        hardness = result.layers[result.layers["type"] == "hand_hardness"]
+        assert hardness["value"].iloc[0] == "F"
+
+    def test_site_details(self, data_dir):
+        result = read_pit_file(data_dir / "site_5S21.csv", doi="doi")
+
+        assert result.layers is None
+        site = result.sites.iloc[0]
+        assert site["observer"] == "Carrie Vuyovich, Glen Liston"
+        assert site["air_temp"] == 1.5
+        assert site["sky_cover"] == "Overcast(complete cover)"
+
+    def test_timezone(self, data_dir):
+        result = read_pit_file(
+            data_dir / "density.csv", doi="doi", timezone="MST"
+        )
+        assert result.sites["datetime"].iloc[0] == pd.Timestamp(
+            "2020-02-05 20:30", tz="UTC"
+        )
+
+
+class TestSMP:
+    def test_log(self, data_dir):
+        result = read_smp_log(data_dir / "smp_log.csv")
+        assert result[("2N12", "0874")] == "Ioanna Merkouriadi"
+
+    def test_profile(self, data_dir):
+        smp_log = read_smp_log(data_dir / "smp_log.csv")
+        result = read_smp_profile(
+            data_dir / "S06M0874_2N12_20200131.CSV",
+            campaign="Grand Mesa", doi="doi", smp_log=smp_log
+        )
+
+        site = result.sites.iloc[0]
+        assert site["site"] == "2N12"
+        assert site["observer"] == "Ioanna Merkouriadi"
+        assert result.layers["depth"].iloc[0] == pytest.approx(0.4)
+        assert set(result.layers["type"]) == {"force"}
+
+    def test_requires_campaign(self, data_dir):
+        with pytest.raises(ValueError):
+            read_smp_profile(
+                data_dir / "S06M0874_2N12_20200131.CSV", doi="doi"
+            )
+
+
+class TestDepthFile:
+    def test_points(self, data_dir):
+        result = read_depth_file(
+            data_dir / "depths.csv", campaign="Grand Mesa", doi="doi"
+        )
+
+        points = result.points
+        assert len(points) == 10
+        assert points["instrument"].iloc[0] == "magnaprobe"
+        assert points["observation"].iloc[0] == "depths magnaprobe"
+        assert points.crs.to_epsg() == 26912
+        assert points.geometry.x.iloc[0] == pytest.approx(747987.6, abs=1)
+
+
+@pytest.mark.parametrize("name", ["gpr.csv", "smp_log.csv"])
+def test_unsupported(data_dir, name):
+    assert parse_file(data_dir / name, doi="doi") is None
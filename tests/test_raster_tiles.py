@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+import pytest
+from rasterio import MemoryFile
+from rasterio.transform import from_origin
+
+from snowexsql import raster_tiles
+from snowexsql.raster_tiles import TileInfo, mosaic_grid, mosaic_tiles
+
+NODATA = -9999
+
+
+def tile_tiff(upper_left_x, upper_left_y, value):
+    """
+    Create a 4x4 GeoTIFF with 1m pixels filled with a single value
+    """
+    with MemoryFile() as tmpfile:
+        with tmpfile.open(
+            driver='GTiff', width=4, height=4, count=1, dtype='float32',
+            nodata=NODATA, crs='EPSG:26912',
+            transform=from_origin(upper_left_x, upper_left_y, 1, 1)
+        ) as dataset:
+            dataset.write(np.full((1, 4, 4), value, dtype='float32'))
+        return tmpfile.read()
+
+
+@pytest.fixture
+def tiles():
+    # Three tiles of a 2x2 tile grid, the upper right tile is missing
+    return [
+        TileInfo(1, 0, 4, 4, 4, 1, -1, 26912, 1, '32BF', NODATA),
+        TileInfo(2, 4, 4, 4, 4, 1, -1, 26912, 1, '32BF', NODATA),
+        TileInfo(3, 0, 8, 4, 4, 1, -1, 26912, 1, '32BF', NODATA),
+    ]
+
+
+@pytest.fixture
+def fetch_tile():
+    tiffs = {
+        1: tile_tiff(0, 4, 1),
+        2: tile_tiff(4, 4, 2),
+        3: tile_tiff(0, 8, 3),
+    }
+    return lambda tile: tiffs[tile.id]
+
+
+class TestMosaicGrid:
+    def test_covers_all_tiles(self, tiles):
+        grid = mosaic_grid(tiles)
+        assert (grid.width, grid.height) == (8, 8)
+        assert (grid.transform.c, grid.transform.f) == (0, 8)
+        assert grid.dtype == 'float32'
+
+    def test_snaps_bounds_to_tile_grid(self, tiles):
+        grid = mosaic_grid(tiles, bounds=(1.5, 1.5, 5.2, 6.1))
+        assert (grid.width, grid.height) == (5, 6)
+        assert (grid.transform.c, grid.transform.f) == (1, 7)
+
+    def test_no_tiles(self):
+        with pytest.raises(ValueError):
+            mosaic_grid([])
+
+
+class TestMosaicTiles:
+    def test_in_memory(self, tiles, fetch_tile):
+        dataset = mosaic_tiles(fetch_tile, tiles, max_workers=3)
+        data = dataset.read(1)
+
+        assert data.shape == (8, 8)
+        assert (data[0:4, 0:4] == 3).all()
+        assert (data[0:4, 4:8] == NODATA).all()
+        assert (data[4:8, 0:4] == 1).all()
+        assert (data[4:8, 4:8] == 2).all()
+
+    def test_to_file(self, tiles, fetch_tile, tmp_path):
+        out_path = tmp_path / 'mosaic.tif'
+        dataset = mosaic_tiles(
+            fetch_tile, tiles, bounds=(1.5, 1.5, 5.2, 6.1), out_path=out_path
+        )
+
+        assert out_path.exists()
+        assert dataset.read(1)[-1, -1] == 2
+        assert dataset.bounds == (1, 1, 6, 7)
+
+    def test_bounded_tiles_in_flight(self, monkeypatch):
+        # A row of 20 tiles with one worker, none may be fetched more than
+        # TILES_IN_FLIGHT_PER_WORKER ahead of the mosaic
+        tiles = [
+            TileInfo(i, 4 * i, 4, 4, 4, 1, -1, 26912, 1, '32BF', NODATA)
+            for i in range(20)
+        ]
+        tiff = tile_tiff(0, 4, 1)
+        placed = []
+        place = raster_tiles._place
+
+        def count_placed(*args):
+            # Writing slower than fetching
+            time.sleep(0.01)
+            placed.append(args)
+            return place(*args)
+
+        def fetch_tile(tile):
+            assert tile.id - len(placed) <= raster_tiles.TILES_IN_FLIGHT_PER_WORKER
+            return tiff
+
+        monkeypatch.setattr(raster_tiles, '_place', count_placed)
+        mosaic_tiles(fetch_tile, tiles, max_workers=1)
+
+        assert len(placed) == len(tiles)
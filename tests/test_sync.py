@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from snowexsql.api import PointMeasurements
+from snowexsql.ingest import record_load, upsert_observations
+from snowexsql.sync import read_state, sync_mirror
+from snowexsql.tables import PointData, PointObservation
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def point_data(point_data_factory, db_session):
+    point_data_factory.create()
+    return db_session.query(PointData).all()
+
+
+@pytest.mark.usefixtures("db_test_session")
+@pytest.mark.usefixtures("db_test_connection")
+class TestSyncMirror:
+    def test_new_mirror(self, tmp_path, point_data):
+        summary = sync_mirror(tmp_path, ["points"])
+
+        assert summary["points"] == {"added": 1, "removed": 0, "rows": 1}
+        assert read_state(tmp_path)["datasets"]["points"] == {
+            "token": point_data[0].id, "updated": 0, "deleted": 0
+        }
+        assert tmp_path.joinpath("points.parquet").exists()
+
+    def test_new_rows(self, tmp_path, point_data, point_data_factory):
+        sync_mirror(tmp_path, ["points"])
+        point_data_factory.create()
+
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 1, "removed": 0, "rows": 2}
+
+    def test_running_load(self, tmp_path, point_data, point_data_factory,
+                          monkeypatch):
+        sync_mirror(tmp_path, ["points"])
+        # Another transaction writes to the points
+        monkeypatch.setattr(
+            PointMeasurements, "committed_token", classmethod(lambda cls: None)
+        )
+        point_data_factory.create()
+
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 1, "removed": 0, "rows": 2}
+        state = read_state(tmp_path)["datasets"]["points"]
+        assert state["token"] == point_data[0].id
+
+        # The rows after the token are read again
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 0, "removed": 0, "rows": 2}
+
+    def test_removed_rows(self, tmp_path, point_data, db_session,
+                          connection):
+        sync_mirror(tmp_path, ["points"])
+        db_session.delete(point_data[0])
+        db_session.flush()
+        record_load(connection, PointData.__table__, deleted=1)
+
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 0, "removed": 1, "rows": 0}
+
+    def test_unrecorded_delete(self, tmp_path, point_data, db_session):
+        sync_mirror(tmp_path, ["points"])
+        db_session.delete(point_data[0])
+        db_session.flush()
+
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 0, "removed": 0, "rows": 1}
+
+        summary = sync_mirror(tmp_path, ["points"], prune=True)
+        assert summary["points"] == {"added": 0, "removed": 1, "rows": 0}
+
+    def test_updated_observation(self, tmp_path, point_data, connection):
+        sync_mirror(tmp_path, ["points"])
+        observation = point_data[0].observation
+        upsert_observations(connection, pd.DataFrame({
+            "observation": [observation.name],
+            "date": [observation.date],
+            "campaign": [observation.campaign.name],
+            "instrument": ["magnaprobe"],
+            "observer": [observation.observer.name],
+            "doi": [observation.doi.doi],
+        }), PointObservation)
+
+        summary = sync_mirror(tmp_path, ["points"])
+        assert summary["points"] == {"added": 1, "removed": 0, "rows": 1}